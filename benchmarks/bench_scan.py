@@ -0,0 +1,209 @@
+"""
+Synthetic-universe benchmark for the scan pipeline.
+
+Each (tickers, years) case runs in its own subprocess inside a fresh temp directory,
+against a FakeProvider with configurable latency and error rate. Every stage is timed
+cold (its cache wiped) and warm (cache populated), with the process's peak RSS so far.
+
+    python benchmarks/bench_scan.py --tickers 500,5000 --years 2,20 --output bench_results.json
+    python benchmarks/bench_scan.py --compare bench_results.json --output new.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# A stage slower than baseline by more than this fraction is reported as a regression
+REGRESSION_THRESHOLD = 0.20
+
+
+def _peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_case(n_tickers, years, latency, error_rate, workers):
+    """
+    Runs every stage for one synthetic universe. Must be called with the cwd set to an
+    empty directory, before any utils module is imported (they bind cache paths on import).
+    """
+    sys.path.insert(0, ROOT)
+    import config
+    config.HISTORY_PERIOD = f"{years}y"
+
+    import pandas as pd
+    from utils.providers import FakeProvider, set_provider
+    from utils.retry import RETRY_POLICY
+    from utils.scanner import run_scan
+    from utils.ema_utils import compute_ema_incremental
+    from utils.ema_signals import get_ema_signals, get_ema_signals_bulk
+    from utils.highs import HIGHS_STATE_FOLDER, check_new_high
+    from utils.ledger_utils import HIGHS_LEDGER, SMA_LEDGER, commit_ledgers, update_highs_ledger, update_sma_ledger
+    from utils.market_data import get_historical_data
+    from utils.price_store import EMA_STORE
+
+    origin = pd.Timestamp.today().normalize() - pd.DateOffset(years=years + 1)
+    set_provider(FakeProvider(latency=latency, error_rate=error_rate, origin=origin))
+    RETRY_POLICY.initial_budget = RETRY_POLICY.budget = max(RETRY_POLICY.initial_budget, n_tickers)
+    tickers = [f"SYN{i:05d}" for i in range(n_tickers)]
+    results = []
+
+    def timed(stage, cache, fn):
+        start = time.perf_counter()
+        fn()
+        results.append({
+            "tickers": n_tickers,
+            "years": years,
+            "stage": stage,
+            "cache": cache,
+            "seconds": round(time.perf_counter() - start, 4),
+            "peak_rss_mb": round(_peak_rss_mb(), 1),
+        })
+
+    def wipe(folder):
+        shutil.rmtree(folder, ignore_errors=True)
+        folder.mkdir(parents=True, exist_ok=True)
+
+    def scan():
+        run_scan(tickers=tickers, workers=workers)
+
+    def ema_update():
+        for t in tickers:
+            compute_ema_incremental(t)
+
+    def history_load():
+        for t in tickers:
+            get_historical_data(t)
+
+    def highs():
+        for t in tickers:
+            check_new_high(t)
+
+    def ledger_updates(run, date):
+        # every pass stages new rows (tickers tagged by `run`): re-adding recorded ones is a no-op
+        for i, t in enumerate(tickers):
+            update_highs_ledger(f"{t}.{run}", t, 100.0 + i, pd.Timestamp(date))
+            update_sma_ledger(f"{t}.{run}", {"SMA20": 2.0, "SMA50": 1.0, "SMA200": 0.5, "CrossoverDate": date})
+        commit_ledgers()
+
+    def reset_ledgers():
+        for ledger in (SMA_LEDGER, HIGHS_LEDGER):
+            if os.path.exists(ledger.file):
+                os.remove(ledger.file)
+            ledger.rollback()
+
+    timed("scan", "cold", scan)
+    timed("scan", "warm", scan)
+
+    timed("history_load", "warm", history_load)
+
+    wipe(EMA_STORE.folder)
+    timed("ema_update", "cold", ema_update)
+    timed("ema_update", "warm", ema_update)
+
+    frames = {t: compute_ema_incremental(t) for t in tickers}
+    timed("ema_signals_bulk", "warm", lambda: get_ema_signals_bulk(frames))
+    timed("ema_signals_per_ticker", "warm", lambda: [get_ema_signals(t) for t in tickers])
+
+    wipe(HIGHS_STATE_FOLDER)
+    timed("highs", "cold", highs)
+    timed("highs", "warm", highs)
+
+    reset_ledgers()
+    timed("ledger", "cold", lambda: ledger_updates("A", "2024-01-02"))  # empty ledgers
+    timed("ledger", "warm", lambda: ledger_updates("B", "2024-01-03"))  # n rows loaded and on disk, n more added
+
+    return results
+
+
+def compare(baseline, current, threshold=REGRESSION_THRESHOLD):
+    """
+    Prints per-stage timing ratios against a baseline report; returns the regressions.
+    """
+    key = lambda r: (r["tickers"], r["years"], r["stage"], r["cache"])
+    before = {key(r): r for r in baseline["results"]}
+    regressions = []
+    for r in current["results"]:
+        old = before.get(key(r))
+        if old is None or old["seconds"] == 0:
+            continue
+        ratio = r["seconds"] / old["seconds"]
+        flag = "🔺" if ratio > 1 + threshold else "  "
+        print(f"{flag} {r['tickers']:>6} x {r['years']:>2}y {r['stage']:<24} {r['cache']:<5} "
+              f"{old['seconds']:>9.3f}s -> {r['seconds']:>9.3f}s ({ratio:.2f}x)")
+        if ratio > 1 + threshold:
+            regressions.append(r)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickers", default="500,5000", help="comma-separated universe sizes")
+    parser.add_argument("--years", default="2,20", help="comma-separated history lengths in years")
+    parser.add_argument("--latency", type=float, default=0.005, help="seconds slept per provider call")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of provider calls that fail")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="baseline report to compare against")
+    parser.add_argument("--case", help=argparse.SUPPRESS)  # internal: "<tickers>:<years>"
+    args = parser.parse_args()
+
+    if args.case:
+        n_tickers, years = map(int, args.case.split(":"))
+        with open(os.devnull, "w") as devnull:
+            stdout, sys.stdout = sys.stdout, devnull
+            try:
+                results = run_case(n_tickers, years, args.latency, args.error_rate, args.workers)
+            finally:
+                sys.stdout = stdout
+        print(json.dumps(results))
+        return
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "latency": args.latency,
+            "error_rate": args.error_rate,
+            "workers": args.workers,
+        },
+        "results": [],
+    }
+    for n_tickers in map(int, args.tickers.split(",")):
+        for years in map(int, args.years.split(",")):
+            print(f"⏱️ Benchmarking {n_tickers} tickers x {years}y ...")
+            with tempfile.TemporaryDirectory(prefix="sma-bench-") as workdir:
+                out = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), "--case", f"{n_tickers}:{years}",
+                     "--latency", str(args.latency), "--error-rate", str(args.error_rate),
+                     "--workers", str(args.workers)],
+                    cwd=workdir, capture_output=True, text=True, check=True,
+                )
+            case_results = json.loads(out.stdout.strip().splitlines()[-1])
+            for r in case_results:
+                print(f"   {r['stage']:<24} {r['cache']:<5} {r['seconds']:>9.3f}s  peak {r['peak_rss_mb']:.0f} MB")
+            report["results"].extend(case_results)
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), report)
+        if regressions:
+            print(f"❌ {len(regressions)} stage(s) regressed by more than {REGRESSION_THRESHOLD:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
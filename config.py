@@ -3,6 +3,10 @@ import os
 # ----------------- Configuration -----------------
 SMA_LEDGER_FILE = "ledger.csv"
 HIGHS_LEDGER_FILE = "highs_ledger.csv"
+METADATA_CACHE_FILE = "metadata_cache.json"
+METRICS_FILE = "metrics.json"  # per-run stage timings and counters
+RUN_JOURNAL_FILE = "scan_journal.jsonl"  # per-ticker progress, for --resume
+SNAPSHOT_FILE = "cache_snapshot.tar.gz"  # packed caches + ledgers restored at the start of CI runs
 
 # Market cap threshold (in USD)
 MIN_MARKET_CAP = 1_000_000_000  # 1B
@@ -12,5 +16,48 @@ EMAIL_SENDER = os.getenv("EMAIL_SENDER")
 EMAIL_RECEIVER = os.getenv("EMAIL_RECEIVER")
 EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
 
+# Alert delivery: one pooled SMTP connection per run, digests per subscriber
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "465"))
+SMTP_SECURITY = os.getenv("SMTP_SECURITY", "ssl")  # ssl | starttls | none
+SMTP_TIMEOUT = 30  # seconds
+SMTP_MAX_RECIPIENTS = 50  # envelope recipients per message when digests are identical
+SUBSCRIBERS_FILE = "subscribers.json"  # falls back to EMAIL_RECEIVER when missing
+
 # Yahoo Finance & S&P500
 SP500_SOURCE = "https://raw.githubusercontent.com/datasets/s-and-p-500-companies/main/data/constituents.csv"
+
+# Universe to scan: a CSV path or URL with a symbol column, or comma-separated symbols
+UNIVERSE_SOURCE = SP500_SOURCE
+UNIVERSE_COLUMN = "Symbol"
+UNIVERSE_CACHE_FOLDER = "universe_cache"  # local copies of URL sources, revalidated daily
+UNIVERSE_CHANGES_FILE = "universe_changes.jsonl"  # constituent adds/removals per new version
+PRUNE_REMOVED_TICKERS = True  # delete cached history/EMA/highs state for removed constituents
+UNIVERSE_MIN_KEEP = 0.8  # a new version with fewer symbols than this share of the cached one is rejected
+PRUNE_MAX_FRACTION = 0.05  # never prune more than this share of the universe in one change
+SHARD_FOLDER = "shard_results"  # per-shard partial results for --shard / --merge
+SCAN_LOCK_FILE = "scan.lock"  # held while a scan runs: one scan (or shard) per working directory
+
+# Local query service over the precomputed signals (python -m utils.query_service)
+QUERY_HOST = "127.0.0.1"
+QUERY_PORT = 8765
+QUERY_REFRESH_SECONDS = 5  # how often stores and ledgers are checked for new commits
+
+# Concurrent scan: worker threads and the shared Yahoo request budget
+SCAN_WORKERS = 8
+YAHOO_RATE_PER_SEC = 4
+YAHOO_BURST = 8
+BULK_CHUNK_SIZE = 100  # tickers per bulk history request
+REBASE_OVERLAP_BARS = 5  # cached bars re-requested on each delta refresh to detect split/dividend re-basing
+REBASE_TOLERANCE = 1e-4  # relative Close difference above which a cached bar disagrees with the provider
+REBASE_LOG_FILE = "rebase_decisions.jsonl"  # one line per overlap check: verified / revised / rebased
+HISTORY_PERIOD = "2y"  # history fetched for a ticker with no cache
+SCAN_CACHE_MB = 512  # cap on history frames held in memory during a scan
+PANEL_BUDGET_MB = 256  # per-chunk memory for float32 panel scans (utils/panel.py)
+
+# Shared retry scheduler: per-item attempts, run-wide retry budget, circuit breaker
+RETRY_MAX_ATTEMPTS = 5
+RETRY_BUDGET = 200
+BREAKER_THRESHOLD = 20  # consecutive transient failures before giving up on the provider
+BACKOFF_BASE = 2
+BACKOFF_MAX = 60  # seconds
@@ -1,9 +1,69 @@
+import argparse
+import cProfile
+from config import METRICS_FILE, UNIVERSE_SOURCE
+from utils import metrics
 from utils.scanner import run_scan
-from utils.email_utils import send_email_alert
+from utils.sharding import merge_shard_results
+from utils.universe import parse_shard
+from utils.alerts import AlertDispatcher, publish_all
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="EMA crossover and 52-week high scan")
+    parser.add_argument("--test", action="store_true", help="scan only the first 15 tickers")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue today's interrupted scan, skipping tickers it already finished")
+    parser.add_argument("--universe", default=UNIVERSE_SOURCE,
+                        help="CSV path or URL with a Symbol column, or comma-separated symbols")
+    parser.add_argument("--shard", type=parse_shard, metavar="i/N",
+                        help="scan only shard i of N and save partial results (no email)")
+    parser.add_argument("--merge", nargs="+", metavar="PATH",
+                        help="merge shard result files/folders into one report and email instead of scanning")
+    parser.add_argument("--metrics", default=METRICS_FILE, help="where to write the run metrics report")
+    parser.add_argument("--profile", metavar="PATH",
+                        help="profile the scan; writes cProfile stats to PATH "
+                             "(PATH.html via pyinstrument when it is installed)")
+    return parser.parse_args()
+
+
+def profiled_scan(path, **scan_args):
+    """
+    Runs the scan under pyinstrument if available, otherwise cProfile.
+    """
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        profiler = cProfile.Profile()
+        result = profiler.runcall(run_scan, **scan_args)
+        profiler.dump_stats(path)
+        print(f"🔬 cProfile stats written to {path}")
+        return result
+
+    profiler = Profiler()
+    profiler.start()
+    try:
+        result = run_scan(**scan_args)
+    finally:
+        profiler.stop()
+    with open(f"{path}.html", "w") as f:
+        f.write(profiler.output_html())
+    print(f"🔬 pyinstrument report written to {path}.html")
+    return result
+
 
 if __name__ == "__main__":
-    print("🚀 Running EMA crossover and 52-week high scan...")
-    ema_list, high_list = run_scan(test_mode=False)
+    args = parse_args()
+    # alerts are routed to subscriber digests while the scan runs (shards leave email to the merge)
+    dispatcher = None if args.shard else AlertDispatcher().start()
+    scan_args = {"test_mode": args.test, "resume": args.resume, "universe": args.universe, "shard": args.shard,
+                 "on_alert": dispatcher.publish if dispatcher else None}
+    if args.merge:
+        ema_list, high_list = merge_shard_results(args.merge)
+        publish_all(dispatcher, ema_list, high_list)
+    elif args.profile:
+        ema_list, high_list = profiled_scan(args.profile, **scan_args)
+    else:
+        ema_list, high_list = run_scan(**scan_args)
     
     for s in ema_list:
         print(
@@ -13,4 +73,11 @@ if __name__ == "__main__":
 
     print("\n🏆 New Highs:", high_list or "None")
 
-    send_email_alert(ema_list, high_list)
+    if args.shard:
+        print(f"🧩 Shard {args.shard[0]}/{args.shard[1]} done; email is sent by the --merge step")
+    else:
+        dispatcher.close()
+
+    report = metrics.write_report(args.metrics)
+    metrics.print_report(report)
+    print(f"📊 Metrics written to {args.metrics}")
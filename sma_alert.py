@@ -1,9 +1,12 @@
 import yfinance as yf
 import pandas as pd
+import numpy as np
 import smtplib
 from email.mime.text import MIMEText
 from datetime import datetime
 import os
+from config import SP500_SOURCE
+from utils.universe import load_universe
 
 # ----------------- Ledger Files -----------------
 SMA_LEDGER_FILE = "ledger.csv"
@@ -22,8 +25,9 @@ def save_ledger(df, file):
     df.to_csv(file, index=False)
 
 # ----------------- Get S&P 500 tickers -----------------
-sp500 = pd.read_csv("https://raw.githubusercontent.com/datasets/s-and-p-500-companies/main/data/constituents.csv")
-tickers = sp500['Symbol'].tolist()
+def get_tickers():
+    # fetched when the scan runs (not at import), through the cached universe loader
+    return load_universe(SP500_SOURCE)
 
 # ----------------- SMA Crossover -----------------
 def update_sma_ledger(ticker, crossover_info):
@@ -57,26 +61,24 @@ def get_sma_signals(ticker):
         data['SMA50'] = data['Close'].rolling(50).mean()
         data['SMA200'] = data['Close'].rolling(200).mean()
 
-        for i in range(-10, 0):
-            today = data.iloc[i]
-            yesterday = data.iloc[i - 1]
-
-            if pd.isna(today['SMA20']) or pd.isna(today['SMA50']) or pd.isna(today['SMA200']):
-                continue
-
-            crossed = yesterday['SMA20'] <= yesterday['SMA50'] and today['SMA20'] > today['SMA50']
-            cond2 = today['SMA50'] > today['SMA200']
-            diff_pct = (today['SMA20'] - today['SMA50']) / today['SMA50'] * 100
-
-            if crossed and cond2 and diff_pct >= 3:
-                crossover_info = {
-                    "SMA20": today['SMA20'],
-                    "SMA50": today['SMA50'],
-                    "SMA200": today['SMA200'],
-                    "CrossoverDate": today.name
-                }
-                update_sma_ledger(ticker, crossover_info)
-                return ticker
+        # Evaluate the last 10 bars at once; NaN SMAs compare False and are skipped
+        recent = data.iloc[-11:]
+        prev, today = recent.iloc[:-1], recent.iloc[1:]
+        crossed = (prev['SMA20'].values <= prev['SMA50'].values) & (today['SMA20'].values > today['SMA50'].values)
+        cond2 = today['SMA50'].values > today['SMA200'].values
+        diff_pct = (today['SMA20'].values - today['SMA50'].values) / today['SMA50'].values * 100
+        hits = np.flatnonzero(crossed & cond2 & (diff_pct >= 3))
+
+        if len(hits):
+            hit = today.iloc[hits[0]]
+            crossover_info = {
+                "SMA20": hit['SMA20'],
+                "SMA50": hit['SMA50'],
+                "SMA200": hit['SMA200'],
+                "CrossoverDate": hit.name
+            }
+            update_sma_ledger(ticker, crossover_info)
+            return ticker
         return None
     except Exception:
         return None
@@ -123,7 +125,7 @@ def get_market_cap(ticker):
 def run_scan():
     sma_signals = []
     new_highs = []
-    for t in tickers:
+    for t in get_tickers():
         cap = get_market_cap(t)
         if cap and cap > 5_000_000_000:
             signal = get_sma_signals(t)
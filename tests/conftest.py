@@ -0,0 +1,22 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# utils modules resolve their cache folders relative to the cwd (and create some on
+# import), so the whole session runs in a scratch directory, never in the checkout
+os.chdir(tempfile.mkdtemp(prefix="sma-alert-tests-"))
+
+
+@pytest.fixture
+def fake_provider():
+    from utils.providers import FakeProvider, get_provider, set_provider
+    previous = get_provider()
+    provider = FakeProvider()
+    set_provider(provider)
+    yield provider
+    set_provider(previous)
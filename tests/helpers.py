@@ -0,0 +1,21 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_python(script, cwd, *args, check=True):
+    """
+    Runs `script` in a fresh interpreter in `cwd` (the caches are module state plus
+    cwd-relative files) and returns the JSON printed on its last line, or the
+    CompletedProcess when `check` is False.
+    """
+    env = dict(os.environ, PYTHONPATH=ROOT, PYTHONDONTWRITEBYTECODE="1")
+    done = subprocess.run([sys.executable, "-c", script, *map(str, args)], cwd=cwd, env=env,
+                          capture_output=True, text=True, timeout=300)
+    if not check:
+        return done
+    assert done.returncode == 0, done.stderr
+    return json.loads(done.stdout.splitlines()[-1])
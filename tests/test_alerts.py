@@ -0,0 +1,147 @@
+import email
+import socketserver
+import threading
+
+import pytest
+
+from utils.alerts import AlertDispatcher, Subscriber
+from utils.email_utils import SmtpPool
+
+
+class SmtpStandIn(socketserver.ThreadingTCPServer):
+    """
+    Minimal localhost SMTP server: records connections and delivered messages, and can
+    drop the connection after `drop_after` messages to exercise the pool's reconnect.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, drop_after=None):
+        super().__init__(("127.0.0.1", 0), SmtpHandler)
+        self.drop_after = drop_after
+        self.connections = 0
+        self.messages = []  # (envelope recipients, parsed message)
+        self.lock = threading.Lock()
+
+
+class SmtpHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        self.reply("220 localhost stand-in")
+        recipients = []
+        while True:
+            line = self.rfile.readline().decode().rstrip("\r\n")
+            command = line.split(" ", 1)[0].upper()
+            if not line or command == "QUIT":
+                self.reply("221 bye")
+                return
+            if command == "RCPT":
+                recipients.append(line.split(":", 1)[1].strip().strip("<>"))
+            if command == "DATA":
+                self.reply("354 end with .")
+                data = b"".join(iter(self.rfile.readline, b".\r\n"))
+                with server.lock:
+                    server.messages.append((recipients, email.message_from_bytes(data)))
+                    dropped = server.drop_after is not None and len(server.messages) == server.drop_after
+                recipients = []
+                self.reply("250 queued")
+                if dropped:
+                    return
+                continue
+            if command == "MAIL":
+                recipients = []
+            self.reply("250 ok")
+
+
+@pytest.fixture
+def smtp_server(request):
+    server = SmtpStandIn(getattr(request, "param", None))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def dispatch(server, subscribers, alerts):
+    pool = SmtpPool("127.0.0.1", server.server_address[1], security="none", user="", password="")
+    dispatcher = AlertDispatcher(subscribers, pool=pool, max_recipients=2).start()
+    for rule, row in alerts:
+        dispatcher.publish(rule, row)
+    return dispatcher.close()
+
+
+def body(message):
+    return message.get_payload(decode=True).decode()
+
+
+SUBSCRIBERS = [
+    Subscriber("a", "a@example.com", frozenset(["AAA", "BBB"])),
+    Subscriber("b", "b@example.com", frozenset(["CCC"])),
+    Subscriber("c", "c@example.com", frozenset(["CCC"])),
+    Subscriber("d", "d@example.com", frozenset(["CCC"])),
+    Subscriber("e", "e@example.com", rules=frozenset(["new_high"])),
+    Subscriber("quiet", "q@example.com", frozenset(["ZZZ"])),
+]
+
+ALERTS = [
+    ("new_high", {"Ticker": "BBB", "Company": "B Corp", "Close": 20.0, "HighDate": "2026-10-16"}),
+    ("ema_crossover", {"ticker": "CCC", "CrossoverDate": "2026-10-01", "CrossoverPrice": 10.0,
+                       "CurrentPrice": 10.7, "PctAbove": 7.0}),
+    ("new_high", {"Ticker": "AAA", "Company": "A Corp", "Close": 10.0, "HighDate": "2026-10-16"}),
+    ("ema_crossover", {"ticker": "BBB", "CrossoverDate": "2026-10-02", "CrossoverPrice": 18.0,
+                       "CurrentPrice": 19.5, "PctAbove": 8.33}),
+]
+
+
+def delivered(server):
+    per_recipient = {}
+    for recipients, message in server.messages:
+        for address in recipients:
+            per_recipient.setdefault(address, []).append(body(message))
+    return per_recipient
+
+
+def test_one_connection_and_one_digest_per_subscriber(smtp_server):
+    stats = dispatch(smtp_server, SUBSCRIBERS, ALERTS)
+
+    assert smtp_server.connections == 1
+    per_recipient = delivered(smtp_server)
+    # every subscriber with matching alerts gets exactly one digest; "quiet" gets none
+    assert sorted(per_recipient) == sorted(s.email for s in SUBSCRIBERS if s.name != "quiet")
+    assert all(len(bodies) == 1 for bodies in per_recipient.values())
+    # b, c and d share one digest, split by max_recipients=2 into two messages
+    assert per_recipient["b@example.com"] == per_recipient["c@example.com"] == per_recipient["d@example.com"]
+    assert stats["messages"] == len(smtp_server.messages) == 4
+    assert "AAA" in per_recipient["a@example.com"][0] and "CCC" not in per_recipient["a@example.com"][0]
+
+
+@pytest.mark.parametrize("smtp_server", [2], indirect=True)
+def test_reconnects_after_dropped_connection(smtp_server):
+    stats = dispatch(smtp_server, SUBSCRIBERS, ALERTS)
+
+    assert smtp_server.connections == 2
+    assert stats["failed"] == 0
+    assert len(smtp_server.messages) == stats["messages"] == 4
+    assert sorted(delivered(smtp_server)) == sorted(s.email for s in SUBSCRIBERS if s.name != "quiet")
+
+
+def test_digest_order_does_not_depend_on_arrival(smtp_server):
+    subscribers = [Subscriber("x", "x@example.com"), Subscriber("y", "y@example.com")]
+    pool = SmtpPool("127.0.0.1", smtp_server.server_address[1], security="none", user="", password="")
+    dispatcher = AlertDispatcher(subscribers, pool=pool).start()
+    for rule, row in ALERTS:
+        dispatcher.publish(rule, row)
+    dispatcher.flush()
+    for rule, row in reversed(ALERTS):
+        dispatcher.publish(rule, row)
+    dispatcher.close()
+
+    first, second = (body(message) for _, message in smtp_server.messages)
+    assert first == second
+    assert first.index("- BBB") < first.index("- CCC")
+    assert first.index("- AAA") < first.index("- BBB (")
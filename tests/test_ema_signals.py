@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+
+from utils import ema_signals
+from utils.ema_signals import get_ema_signals, get_ema_signals_bulk
+from utils.ema_utils import EMA_PERIODS
+from utils.providers import FakeProvider
+
+
+def ema_frame(close):
+    df = pd.DataFrame({"Close": close})
+    for period in EMA_PERIODS:
+        df[f"EMA{period}"] = df["Close"].ewm(span=period, adjust=False).mean()
+    return df
+
+
+def fake_close(ticker, bars=None):
+    close = FakeProvider()._prices(ticker)["Close"]
+    return close if bars is None else close.iloc[:bars]
+
+
+def per_ticker(frames, monkeypatch):
+    """
+    get_ema_signals on each frame (its EMA update stubbed to return the frame).
+    """
+    monkeypatch.setattr(ema_signals, "compute_ema_incremental", lambda ticker: frames[ticker])
+    return [s for s in map(get_ema_signals, frames) if s is not None]
+
+
+def sliding_frames(tickers, step=7, min_bars=150):
+    # every `step`-th end bar of each ticker's history: many windows, many crossovers
+    frames = {}
+    for ticker in tickers:
+        df = ema_frame(fake_close(ticker))
+        for end in range(min_bars, len(df), step):
+            frames[f"{ticker}@{end}"] = df.iloc[:end]
+    return frames
+
+
+def test_bulk_matches_per_ticker_over_fake_histories(monkeypatch):
+    frames = sliding_frames([f"T{i}" for i in range(4)], step=11)
+    expected = per_ticker(frames, monkeypatch)
+    assert len(expected) > 20  # the comparison covers real signals, not just None == None
+    assert get_ema_signals_bulk(frames) == expected
+
+
+def test_short_series_and_empty_frame(monkeypatch):
+    frames = {
+        "EMPTY": ema_frame(pd.Series(dtype=float)),
+        "SPAN": ema_frame(fake_close("S1", 30)),  # shorter than the EMA50/EMA200 spans
+        "WARMUP": ema_frame(fake_close("S2", 199)),  # one bar short of the warm-up check
+    }
+    assert per_ticker(frames, monkeypatch) == []
+    assert get_ema_signals_bulk(frames) == []
+    assert get_ema_signals_bulk({}) == []
+
+
+def test_nan_closes_and_emas(monkeypatch):
+    frames = sliding_frames(["N1", "N2", "N3"], step=11)
+    rng = np.random.default_rng(3)
+    for name, df in list(frames.items()):
+        df = df.copy()
+        rows = rng.choice(len(df), 3, replace=False)
+        rows[0] = len(df) - rng.integers(1, 22)  # at least one NaN inside the lookback window
+        df.iloc[rows, df.columns.get_loc("Close")] = np.nan
+        df.iloc[rows[1:], df.columns.get_loc("EMA50")] = np.nan
+        frames[name] = df
+    assert get_ema_signals_bulk(frames) == per_ticker(frames, monkeypatch)
+
+
+def test_crossover_on_last_bar(monkeypatch):
+    # cut fake histories right on a bullish crossover bar (none earlier in the lookback window)
+    frames = {}
+    for ticker in [f"L{i}" for i in range(10)]:
+        df = ema_frame(fake_close(ticker))
+        crossed = ((df["EMA20"].shift() <= df["EMA50"].shift()) & (df["EMA20"] > df["EMA50"])
+                   & (df["EMA50"] > df["EMA200"])).to_numpy()
+        for i in np.flatnonzero(crossed):
+            if i >= 200 and not crossed[i - 20:i].any():
+                frames[ticker] = df.iloc[:i + 1]
+                break
+    assert len(frames) >= 3
+
+    expected = per_ticker(frames, monkeypatch)
+    assert get_ema_signals_bulk(frames) == expected == []  # 0% above the crossover: outside the band
+    # with a band that includes 0 the crossover on the last bar is reported
+    hits = get_ema_signals_bulk(frames, band=(0, 10))
+    assert [h["ticker"] for h in hits] == list(frames)
+    for hit in hits:
+        assert hit["PctAbove"] == 0.0
+        assert hit["CrossoverDate"] == str(frames[hit["ticker"]].index[-1].date())
+
+
+def test_registry_rule_matches_bulk():
+    # the scanner evaluates crossovers through the indicator registry
+    from utils.indicators import evaluate, frame_arrays
+    frames = sliding_frames(["R1", "R2"], step=9)
+    hits = [evaluate(name, frame_arrays(df), ["ema_crossover"]).get("ema_crossover") for name, df in frames.items()]
+    assert [h for h in hits if h] == get_ema_signals_bulk(frames)
@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import ema_utils
+from utils.ema_utils import EMA_PERIODS, EMA_WINDOW, compute_ema_incremental
+from utils.historical_data import invalidate_derived
+from utils.price_store import EMA_STORE
+from utils.providers import FakeProvider
+
+
+@pytest.fixture
+def history(monkeypatch):
+    """
+    Serves `history.frame` as the ticker's cached price history.
+    """
+    class History:
+        frame = None
+
+    monkeypatch.setattr(ema_utils, "get_historical_data", lambda ticker: History.frame)
+    return History
+
+
+def full_recompute(close):
+    df = pd.DataFrame({"Close": close})
+    for period in EMA_PERIODS:
+        df[f"EMA{period}"] = df["Close"].ewm(span=period, adjust=False).mean()
+    return df.iloc[-EMA_WINDOW:]
+
+
+def assert_matches_full(ticker, frame):
+    window = compute_ema_incremental(ticker)
+    expected = full_recompute(frame["Close"])
+    pd.testing.assert_frame_equal(window, expected, check_freq=False, check_names=False,
+                                  check_index_type=False, rtol=1e-12)
+    assert EMA_STORE.read(ticker).index.is_unique
+
+
+def prices(ticker):
+    return FakeProvider()._prices(ticker).iloc[-900:]
+
+
+def test_incremental_matches_full_recompute_over_deltas(history):
+    frame = prices("EU_DELTA")
+    for end in (400, 401, 406, 426, 427, 700, 900):  # the window is trimmed once it doubles
+        history.frame = frame.iloc[:end]
+        assert_matches_full("EU_DELTA", history.frame)
+
+
+def test_gap_in_history(history):
+    frame = prices("EU_GAP")
+    history.frame = frame.iloc[:400]
+    compute_ema_incremental("EU_GAP")
+    history.frame = pd.concat([frame.iloc[:400], frame.iloc[430:460]])  # a month with no bars
+    assert_matches_full("EU_GAP", history.frame)
+
+
+def test_rebased_history(history):
+    frame = prices("EU_REBASE")
+    history.frame = frame.iloc[:400]
+    compute_ema_incremental("EU_REBASE")
+
+    rebased = frame.iloc[:410].copy()
+    rebased["Close"] *= 0.5  # a 2:1 split re-adjusts the whole history
+    invalidate_derived("EU_REBASE")  # as _append_to_cache does on a rebased overlap
+    history.frame = rebased
+    assert_matches_full("EU_REBASE", rebased)
+
+
+def test_history_behind_state_is_recomputed(history):
+    frame = prices("EU_BEHIND")
+    history.frame = frame.iloc[:400]
+    compute_ema_incremental("EU_BEHIND")
+    history.frame = frame.iloc[:390]  # e.g. the history cache was reloaded shallower
+    assert_matches_full("EU_BEHIND", history.frame)
+
+
+def test_interrupted_update_is_reconciled(history, monkeypatch):
+    frame = prices("EU_CRASH")
+    history.frame = frame.iloc[:400]
+    compute_ema_incremental("EU_CRASH")
+
+    def crash(ticker, row):
+        raise KeyboardInterrupt
+
+    history.frame = frame.iloc[:405]
+    with monkeypatch.context() as patch:
+        patch.setattr(ema_utils, "save_ema_state", crash)
+        with pytest.raises(KeyboardInterrupt):
+            compute_ema_incremental("EU_CRASH")  # window appended, state not saved
+    assert ema_utils.load_ema_state("EU_CRASH")["date"] == str(frame.index[399].date())
+
+    history.frame = frame.iloc[:410]
+    assert_matches_full("EU_CRASH", history.frame)
+    assert ema_utils.load_ema_state("EU_CRASH")["date"] == str(frame.index[409].date())
+    assert np.isclose(ema_utils.load_ema_state("EU_CRASH")["EMA200"],
+                      full_recompute(frame["Close"].iloc[:410])["EMA200"].iloc[-1], rtol=1e-12)
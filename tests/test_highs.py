@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.highs import RollingHigh, is_new_high, new_high_mask
+
+WINDOWS = [1, 2, 3, 20, 252, None]
+
+
+def rolling_max_rule(close, window):
+    """
+    The rule as check_new_high used to apply it: the latest close against the max of the
+    last `window` closes (all of them for None), re-evaluated at every bar.
+    """
+    return np.array([close[i] >= close[0 if window is None else max(0, i - window + 1):i + 1].max()
+                     for i in range(len(close))])
+
+
+def tracker_mask(close, window, restore_every=None):
+    tracker, hits = RollingHigh(window), []
+    for i, value in enumerate(close):
+        if restore_every and i % restore_every == 0:  # as persisted between daily runs
+            tracker = RollingHigh.from_dict(tracker.to_dict())
+        would_be = tracker.peek(value)
+        hit = tracker.update(value)
+        assert would_be == hit, f"peek differs at bar {i}"
+        hits.append(hit)
+    return np.array(hits)
+
+
+def random_closes(seed, n=700, levels=None):
+    rng = np.random.default_rng(seed)
+    close = 50 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+    return np.round(close / levels) * levels if levels else close  # coarse levels make ties common
+
+
+@pytest.mark.parametrize("window", WINDOWS)
+@pytest.mark.parametrize("seed,levels", [(0, None), (1, 5.0), (2, 20.0)])
+def test_tracker_and_mask_match_rolling_max(window, seed, levels):
+    close = random_closes(seed, levels=levels)
+    expected = rolling_max_rule(close, window)
+    assert expected.sum() > 5  # the comparison covers real highs
+    np.testing.assert_array_equal(tracker_mask(close, window), expected)
+    np.testing.assert_array_equal(tracker_mask(close, window, restore_every=37), expected)
+    np.testing.assert_array_equal(new_high_mask(close[None, :], window)[0], expected)
+
+
+@pytest.mark.parametrize("close,window,expected", [
+    ([5, 1, 1, 1], 3, [True, False, False, True]),  # the 5 leaves the window exactly at bar 3
+    ([5, 1, 1, 1], 4, [True, False, False, False]),  # ... and not before
+    ([5, 4, 3, 2, 1], 2, [True, False, False, False, False]),
+    ([1, 3, 3, 2, 3], 2, [True, True, True, False, True]),
+    ([2, 2, 2], None, [True, True, True]),  # ties with the window max count as highs
+])
+def test_window_boundaries_and_ties(close, window, expected):
+    close = np.array(close, dtype=float)
+    assert rolling_max_rule(close, window).tolist() == expected
+    assert tracker_mask(close, window).tolist() == expected
+    assert new_high_mask(close[None, :], window)[0].tolist() == expected
+
+
+@pytest.mark.parametrize("window", WINDOWS)
+def test_panel_with_nan_padding(window):
+    # right-aligned panel: shorter histories are NaN-padded on the left
+    histories = [random_closes(seed, n, levels) for seed, n, levels in [(3, 700, None), (4, 300, 5.0), (5, 30, None)]]
+    panel = np.full((len(histories), 700), np.nan)
+    for row, close in zip(panel, histories):
+        row[-len(close):] = close
+
+    mask = new_high_mask(panel, window)
+    for row, close in zip(mask, histories):
+        assert not row[:-len(close)].any()  # padding never counts as a high
+        np.testing.assert_array_equal(row[-len(close):], rolling_max_rule(close, window))
+    np.testing.assert_array_equal(is_new_high(panel, window),
+                                  [rolling_max_rule(close, window)[-1] for close in histories])
+    for end in (30, 251, 252, 253, 699):  # latest-bar check at and around the window edge
+        expected = [rolling_max_rule(c[:len(c) - (700 - end)], window)[-1]
+                    for c in histories if len(c) > 700 - end]
+        got = is_new_high(panel[:, :end], window)[[len(c) > 700 - end for c in histories]]
+        np.testing.assert_array_equal(got, expected)
@@ -0,0 +1,172 @@
+import pandas as pd
+import pytest
+
+from utils import historical_data
+from utils.historical_data import (
+    HistoryRebased, _append_to_cache, _overlap_start, check_overlap, download_historical_bulk, is_stale,
+    last_cached_date, refresh_universe,
+)
+from utils.price_store import HISTORY_STORE
+from utils.providers import FakeProvider, FixtureProvider, get_provider, set_provider
+from utils.retry import RETRY_POLICY, TransientError
+
+
+class RateLimitedFixtures(FixtureProvider):
+    """
+    FixtureProvider whose bulk answers leave out the `limited` tickers, as yf.download does
+    for a rate-limited ticker, and whose single-ticker fetches of them fail transiently
+    `failures` times before succeeding.
+    """
+
+    def __init__(self, folder, limited=(), failures=1):
+        super().__init__(folder)
+        self.failures = dict.fromkeys(limited, failures)
+        self.requests = []
+
+    def download(self, ticker, period="2y", interval="1d", start=None, **kwargs):
+        self.requests.append(ticker)
+        if self.failures.get(ticker):
+            self.failures[ticker] -= 1
+            raise TransientError("429 Too Many Requests")
+        return super().download(ticker, period=period, interval=interval, start=start)
+
+    def download_many(self, tickers, period="2y", interval="1d", start=None, **kwargs):
+        served = [t for t in tickers if t not in self.failures]
+        frames = {t: FixtureProvider.download(self, t, start=start) for t in served}
+        frames = {t: f for t, f in frames.items() if not f.empty}
+        return pd.concat(frames, axis=1) if frames else pd.DataFrame()
+
+
+@pytest.fixture
+def fixtures(tmp_path, monkeypatch):
+    """
+    Writes `<TICKER>.csv` fixtures (FakeProvider prices cut at `bars`) and installs a
+    RateLimitedFixtures provider over them; retries are not delayed.
+    """
+    monkeypatch.setattr(RETRY_POLICY, "delay", lambda attempt: 0)
+    RETRY_POLICY.reset()
+    previous = get_provider()
+
+    def install(prices, limited=(), failures=1):
+        for ticker, frame in prices.items():
+            frame.to_csv(tmp_path / f"{ticker}.csv")
+        provider = RateLimitedFixtures(tmp_path, limited, failures)
+        set_provider(provider)
+        return provider
+
+    yield install
+    set_provider(previous)
+
+
+def prices(ticker, bars):
+    return FakeProvider()._prices(ticker).iloc[-300:].iloc[:bars]
+
+
+def test_missing_ticker_is_confirmed_and_reported(fixtures):
+    provider = fixtures({"BK_A": prices("BK_A", 250)})
+    results = download_historical_bulk(["BK_A", "BK_GONE"])
+    assert list(results) == ["BK_A"]
+    assert provider.requests == ["BK_GONE"]  # confirmed with one single-ticker fetch
+    assert last_cached_date("BK_GONE") is None
+
+
+def test_rate_limited_ticker_is_retried_not_marked_fresh(fixtures):
+    fixtures({t: prices(t, 250) for t in ("BK_B", "BK_C")})
+    download_historical_bulk(["BK_B", "BK_C"])
+
+    full = {t: prices(t, 260) for t in ("BK_B", "BK_C")}
+    provider = fixtures(full, limited=["BK_C"], failures=1)
+    start = _overlap_start(last_cached_date("BK_B"))
+    results = download_historical_bulk(["BK_B", "BK_C"], start=start)
+
+    assert provider.requests == ["BK_C", "BK_C"]  # transient miss, then the retry round
+    assert sorted(results) == ["BK_B", "BK_C"]
+    for ticker, frame in full.items():
+        assert last_cached_date(ticker) == frame.index[-1]
+        assert HISTORY_STORE.read(ticker, ["Close"])["Close"].tolist() == pytest.approx(frame["Close"].tolist())
+
+
+def test_ticker_that_stays_rate_limited_is_left_stale(fixtures, monkeypatch):
+    monkeypatch.setattr(historical_data, "latest_expected_bar", lambda today=None: pd.Timestamp.max)
+    fixtures({"BK_D": prices("BK_D", 250)})
+    download_historical_bulk(["BK_D"])
+    historical_data._index["BK_D"].pop("checked")  # as if cached on an earlier day
+    fixtures({"BK_D": prices("BK_D", 260)}, limited=["BK_D"], failures=99)
+
+    results = download_historical_bulk(["BK_D"], start=_overlap_start(last_cached_date("BK_D")), max_retries=2)
+    assert results == {}
+    assert last_cached_date("BK_D") == prices("BK_D", 250).index[-1]
+    assert is_stale("BK_D")  # not recorded as checked today
+
+
+
+
+def test_fixture_provider_cold_then_delta(fixtures, tmp_path, monkeypatch):
+    monkeypatch.setattr(historical_data, "latest_expected_bar", lambda today=None: pd.Timestamp.max)
+    fixtures({"FX_A": prices("FX_A", 250), "FX_B": prices("FX_B", 250)})
+    set_provider(FixtureProvider(tmp_path))
+    refresh_universe(["FX_A", "FX_B", "FX_GONE"])
+    assert last_cached_date("FX_GONE") is None
+
+    prices("FX_A", 253).to_csv(tmp_path / "FX_A.csv")  # three new bars; FX_B has none
+    for ticker in ("FX_A", "FX_B"):
+        historical_data._index[ticker].pop("checked")
+    assert is_stale("FX_A") and is_stale("FX_B")
+    refresh_universe(["FX_A", "FX_B"])
+
+    assert len(HISTORY_STORE.read("FX_A")) == 253
+    assert len(HISTORY_STORE.read("FX_B")) == 250
+    assert not is_stale("FX_A") and not is_stale("FX_B")  # both checked today
+
+def test_bad_ticker_does_not_abort_the_chunk(fixtures, monkeypatch):
+    append = historical_data._append_to_cache
+
+    def failing_append(ticker, data):
+        if ticker == "BK_BAD":
+            raise OSError("No space left on device")
+        return append(ticker, data)
+
+    monkeypatch.setattr(historical_data, "_append_to_cache", failing_append)
+    fixtures({t: prices(t, 250) for t in ("BK_BAD", "BK_OK")})
+    assert list(download_historical_bulk(["BK_BAD", "BK_OK"])) == ["BK_OK"]
+    assert last_cached_date("BK_BAD") is None
+
+def delta(ticker, cached=250, bars=260, overlap=5):
+    """
+    Caches `cached` bars of the ticker and returns the delta a refresh would get back:
+    the last `overlap` cached bars plus the new ones.
+    """
+    frame = prices(ticker, bars)
+    _append_to_cache(ticker, frame.iloc[:cached])
+    return frame.iloc[cached - overlap:].copy()
+
+
+def test_overlap_verified():
+    data = delta("OV_SAME")
+    assert check_overlap("OV_SAME", data)[:2] == ("verified", None)
+    assert _append_to_cache("OV_SAME", data) == 10
+
+
+def test_overlap_revised_recent_bar():
+    data = delta("OV_REV")
+    data.iloc[4, data.columns.get_loc("Close")] *= 1.01  # the last cached bar was provisional
+    decision, first, _ = check_overlap("OV_REV", data)
+    assert (decision, first) == ("revised", data.index[4])
+    _append_to_cache("OV_REV", data)
+    stored = HISTORY_STORE.read("OV_REV", ["Close"])["Close"]
+    assert len(stored) == 260
+    assert stored[data.index[4]] == pytest.approx(data["Close"].iloc[4])
+
+
+@pytest.mark.parametrize("columns", [["Close", "Adj Close"], ["Adj Close"]], ids=["split", "dividend"])
+def test_overlap_rebased(columns):
+    ticker = f"OV_{len(columns)}"
+    data = delta(ticker)
+    data[columns] *= 0.98
+    decision, first, details = check_overlap(ticker, data)
+    assert (decision, first) == ("rebased", data.index[0])
+    assert details["ratio"] == pytest.approx(0.98)
+    assert details["column"] == columns[0]
+    with pytest.raises(HistoryRebased):
+        _append_to_cache(ticker, data)
+    assert last_cached_date(ticker) is None  # every cache of the ticker was invalidated
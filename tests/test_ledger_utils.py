@@ -0,0 +1,68 @@
+import pandas as pd
+import pytest
+
+from config import HIGHS_LEDGER_FILE
+from utils import ledger_utils
+from utils.ledger_utils import Ledger, load_ledger, save_ledger
+
+
+@pytest.fixture
+def flushes(tmp_path, monkeypatch):
+    """
+    Runs in a scratch directory holding a highs ledger with AAA and BBB; returns the
+    list of files written by save_ledger.
+    """
+    monkeypatch.chdir(tmp_path)
+    save_ledger(pd.DataFrame([row("AAA", 10.0, "2026-10-01"), row("BBB", 20.0, "2026-10-02")]), HIGHS_LEDGER_FILE)
+    written = []
+    monkeypatch.setattr(ledger_utils, "save_ledger", lambda df, file: (written.append(file), save_ledger(df, file)))
+    return written
+
+
+def row(ticker, close, date):
+    return {"Ticker": ticker, "Company": f"{ticker} Corp", "Close": close, "HighDate": date}
+
+
+def on_disk():
+    df = load_ledger(HIGHS_LEDGER_FILE)
+    return {r["Ticker"]: (r["Close"], str(r["HighDate"].date())) for r in df.to_dict("records")}
+
+
+def test_commit_merges_with_changes_made_on_disk(flushes):
+    scan = Ledger(HIGHS_LEDGER_FILE)
+    scan.upsert("AAA", row("AAA", 11.0, "2026-10-05"))
+    scan.remove("BBB")
+    scan.add("CCC", row("CCC", 30.0, "2026-10-05"))
+    scan.add("DDD", row("DDD", 40.0, "2026-10-05"))
+    assert flushes == []  # everything staged in memory
+
+    other = Ledger(HIGHS_LEDGER_FILE)  # e.g. another shard committing meanwhile
+    other.add("DDD", row("DDD", 41.0, "2026-10-03"))
+    other.add("EEE", row("EEE", 50.0, "2026-10-04"))
+    assert other.commit()
+
+    assert scan.commit()
+    assert flushes == [HIGHS_LEDGER_FILE] * 2  # one write per commit
+    assert on_disk() == {
+        "AAA": (11.0, "2026-10-05"),  # upsert wins
+        "CCC": (30.0, "2026-10-05"),
+        "DDD": (41.0, "2026-10-03"),  # add leaves the committed row alone
+        "EEE": (50.0, "2026-10-04"),  # committed by the other ledger, kept
+    }
+    assert list(load_ledger(HIGHS_LEDGER_FILE)["Ticker"]) == ["DDD", "EEE", "AAA", "CCC"]  # by date, then ticker
+    assert scan.get("EEE")["Close"] == 50.0  # the merged file is the new in-memory state
+
+
+def test_commit_without_changes_does_not_write(flushes):
+    ledger = Ledger(HIGHS_LEDGER_FILE)
+    assert not ledger.add("AAA", row("AAA", 99.0, "2026-10-09"))
+    assert not ledger.commit()
+    assert flushes == []
+
+
+def test_readd_after_remove_replaces_the_file_row(flushes):
+    ledger = Ledger(HIGHS_LEDGER_FILE)
+    ledger.remove("AAA")
+    ledger.add("AAA", row("AAA", 12.0, "2026-10-06"))
+    ledger.commit()
+    assert on_disk()["AAA"] == (12.0, "2026-10-06")
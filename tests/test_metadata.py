@@ -0,0 +1,51 @@
+from datetime import date
+
+from tests.helpers import run_python
+from utils.metadata import EMPTY_INFO_TTL, MetadataCache
+from utils.providers import FakeProvider, set_provider, get_provider
+
+SCAN = """
+import json
+from utils.providers import FakeProvider, set_provider
+
+class Provider(FakeProvider):
+    info_calls = []
+
+    def info(self, ticker):
+        self.info_calls.append(ticker)
+        return {} if ticker.startswith("DEAD") else super().info(ticker)
+
+provider = Provider()
+set_provider(provider)
+from utils.scanner import run_scan
+run_scan(workers=2, tickers=["LIVE", "DEAD1", "DEAD2"])
+print(json.dumps(provider.info_calls))
+"""
+
+
+def test_dead_tickers_are_cached_and_not_scanned(tmp_path):
+    first = run_python(SCAN, tmp_path)
+    assert sorted(first) == ["DEAD1", "DEAD2", "LIVE"]  # one call each, none repeated in scan_ticker
+    assert run_python(SCAN, tmp_path) == []  # the empty answers are cached too
+
+
+class EmptyInfo(FakeProvider):
+    def info(self, ticker):
+        self._sleep()
+        return {}
+
+
+def test_empty_answer_expires_after_its_ttl(tmp_path):
+    previous = get_provider()
+    provider = EmptyInfo()
+    set_provider(provider)
+    try:
+        cache = MetadataCache(tmp_path / "metadata.json")
+        assert cache.refresh_many(["DEAD"]) == {}
+        assert cache.get("DEAD", "marketCap", 0) == 0
+        assert provider.calls == 1
+        assert MetadataCache(tmp_path / "metadata.json").refresh_many(["DEAD"]) == {}
+        assert provider.calls == 1
+        assert not cache.is_fresh("DEAD", "shortName", date.today() + EMPTY_INFO_TTL)
+    finally:
+        set_provider(previous)
@@ -0,0 +1,81 @@
+import pandas as pd
+import pytest
+
+from utils import query_service
+from utils.ema_utils import EMA_PERIODS, read_ema_window
+from utils.indicators import IndicatorContext, ema_crossover, frame_arrays
+from utils.price_store import EMA_STORE, PRICE_COLUMNS, PriceStore
+from utils.providers import FakeProvider
+from utils.query_service import SignalIndex
+
+
+@pytest.fixture
+def history(tmp_path, monkeypatch):
+    store = PriceStore(tmp_path / "history", PRICE_COLUMNS)
+    monkeypatch.setattr(query_service, "HISTORY_STORE", store)
+    return store
+
+
+def latest_high(close, days, latest):
+    # brute force: bars at or above the max of the preceding 251 bars, within `days` of `latest`
+    hit = close >= close.rolling(252, min_periods=1).max()
+    dates = close.index[hit]
+    dates = dates[dates > latest - pd.Timedelta(days=days)]
+    return str(dates[-1].date()) if len(dates) else None
+
+
+def test_highs_come_from_stored_closes(history):
+    provider = FakeProvider()
+    closes = {}
+    for i in range(12):
+        ticker = f"Q{i:02d}"
+        prices = provider._prices(ticker).iloc[: -3 * (i % 3) or None]  # some tickers lag the newest bar
+        history.write(ticker, prices)
+        closes[ticker] = prices["Close"]
+    latest = max(close.index[-1] for close in closes.values())
+
+    index = SignalIndex()
+    index.refresh()
+    for days in (5, 30, 120):
+        expected = {t: latest_high(c, days, latest) for t, c in closes.items()}
+        expected = {t: d for t, d in expected.items() if d is not None}
+        rows = index.highs(days)
+        assert expected or days < 120  # the comparison covers real highs
+        assert {row["Ticker"]: row["HighDate"] for row in rows} == expected
+        assert [row["HighDate"] for row in rows] == sorted(expected.values(), reverse=True)
+
+
+def test_highs_follow_store_updates(history):
+    prices = FakeProvider()._prices("QUP")
+    prices = prices.iloc[: int(prices["Close"].to_numpy().argmax()) + 1]  # ends on its all-time high
+    history.write("QUP", prices.iloc[:-1])
+    index = SignalIndex()
+    index.refresh()
+
+    history.append("QUP", prices.iloc[-1:])
+    assert index.refresh() == 1
+    assert index.highs(1) == [{"Ticker": "QUP", "Company": "QUP", "HighDate": str(prices.index[-1].date()),
+                               "Close": round(float(prices["Close"].iloc[-1]), 2)}]
+
+
+@pytest.mark.parametrize("band", [(0, 5), (-10, 0), (-100, 100)])
+def test_crossovers_match_the_scan_rule(tmp_path, monkeypatch, history, band):
+    monkeypatch.chdir(tmp_path)  # a scratch EMA store
+    provider = FakeProvider()
+    for i in range(80):
+        close = provider._prices(f"X{i:02d}")[["Close"]]
+        end = len(close) - 3 * i  # different end dates; the first few too short to be eligible
+        df = close.iloc[end - 190 - 5 * i:end].copy()
+        for period in EMA_PERIODS:
+            df[f"EMA{period}"] = df["Close"].ewm(span=period, adjust=False).mean()
+        EMA_STORE.write(f"X{i:02d}", df)
+
+    index = SignalIndex()
+    index.refresh()
+    expected = []
+    for ticker in EMA_STORE.tickers():
+        hit = ema_crossover(IndicatorContext(ticker, frame_arrays(read_ema_window(ticker))), band=band)
+        if hit:
+            expected.append((ticker, hit["CrossoverDate"], hit["PctAbove"]))
+    assert expected
+    assert [(s["ticker"], s["CrossoverDate"], s["PctAbove"]) for s in index.crossovers(band)] == expected
@@ -0,0 +1,69 @@
+import json
+
+from tests.helpers import run_python
+
+# One scan in a fresh interpreter: argv[1] is the number of journaled tickers after which
+# the process dies (0 = never), argv[2] "resume" to pass resume=True.
+SCAN = """
+import json, os, sys, threading
+from config import HIGHS_LEDGER_FILE, SMA_LEDGER_FILE
+from utils.providers import FakeProvider, set_provider
+set_provider(FakeProvider())
+from utils import journal
+from utils.scanner import run_scan
+
+crash_after = int(sys.argv[1])
+record, start = journal.RunJournal.record, journal.RunJournal.start
+replayed = []
+recording = threading.Lock()
+
+def record_then_crash(self, ticker, stages, **results):
+    with recording:  # no other worker journals between the last record and the exit
+        record(self, ticker, stages, **results)
+        if len(self.entries) == crash_after:
+            os._exit(3)  # no cleanup: the lock, journal and uncommitted ledgers stay as they are
+
+def start_and_track(self, tickers, resume=False):
+    finished = start(self, tickers, resume)
+    replayed.extend(finished)
+    return finished
+
+journal.RunJournal.record = record_then_crash
+journal.RunJournal.start = start_and_track
+lock = open("scan.lock").read() if os.path.exists("scan.lock") else None
+ema_signals, new_highs = run_scan(workers=4, tickers=[f"R{i:02d}" for i in range(60)],
+                                  resume=sys.argv[2] == "resume")
+ledgers = {f: open(f).read() for f in (HIGHS_LEDGER_FILE, SMA_LEDGER_FILE) if os.path.exists(f)}
+print(json.dumps({"ema": ema_signals, "highs": new_highs, "ledgers": ledgers, "replayed": replayed,
+                  "stale_lock": lock, "lock_left": os.path.exists("scan.lock")}, default=float))
+"""
+
+
+def test_resume_after_crash_matches_uninterrupted_run(tmp_path):
+    clean, crashed = tmp_path / "clean", tmp_path / "crashed"
+    clean.mkdir()
+    crashed.mkdir()
+    expected = run_python(SCAN, clean, 0, "fresh")
+
+    died = run_python(SCAN, crashed, 36, "fresh", check=False)
+    assert died.returncode == 3, died.stderr
+    resumed = run_python(SCAN, crashed, 0, "resume")
+
+    replayed = set(resumed["replayed"])
+    assert len(replayed) == 36
+    # signals on both sides of the crash, so replayed and rescanned tickers are both compared
+    tickers = {row["Ticker"] for row in expected["highs"]} | {row["ticker"] for row in expected["ema"]}
+    assert tickers & replayed and tickers - replayed
+    assert resumed["ema"] == expected["ema"]
+    assert resumed["highs"] == expected["highs"]
+    assert resumed["ledgers"] == expected["ledgers"]
+
+
+def test_stale_lock_is_taken_over(tmp_path):
+    died = run_python(SCAN, tmp_path, 5, "fresh", check=False)
+    assert died.returncode == 3, died.stderr
+    resumed = run_python(SCAN, tmp_path, 0, "resume")
+
+    assert json.loads(resumed["stale_lock"])["pid"]  # the crashed run's lock was still there
+    assert not resumed["lock_left"]
+    assert len(resumed["replayed"]) == 5
@@ -0,0 +1,57 @@
+import pytest
+
+from config import YAHOO_BURST, YAHOO_RATE_PER_SEC
+from tests.helpers import run_python
+
+# Each scan runs in a fresh interpreter and working directory: the caches are module
+# state plus cwd-relative files, and both runs must start equally cold.
+SCAN = """
+import json, sys
+from config import YAHOO_BURST, YAHOO_RATE_PER_SEC
+from utils.providers import FakeProvider, set_provider
+from utils.rate_limiter import TokenBucket
+provider = FakeProvider(latency=0.02, limiter=TokenBucket(YAHOO_RATE_PER_SEC, YAHOO_BURST))
+set_provider(provider)
+from utils.scanner import run_scan
+ema_signals, new_highs = run_scan(workers=int(sys.argv[1]), tickers=[f"T{i:02d}" for i in range(24)])
+with open("highs_ledger.csv") as f:
+    ledger = f.read()
+print(json.dumps({"ema": ema_signals, "highs": new_highs, "ledger": ledger, "calls": provider.call_times},
+                 default=float))
+"""
+
+
+def scan(tmp_path, workers):
+    cwd = tmp_path / f"workers-{workers}"
+    cwd.mkdir()
+    return run_python(SCAN, cwd, workers)
+
+
+def max_over_rate(times, rate, burst):
+    """
+    Largest number of calls in any interval beyond what a (rate, burst) bucket allows.
+    """
+    times = sorted(times)
+    return max((j - i + 1) - (burst + rate * (times[j] - times[i]))
+               for i in range(len(times)) for j in range(i, len(times)))
+
+
+@pytest.fixture(scope="module")
+def runs(tmp_path_factory):
+    tmp_path = tmp_path_factory.mktemp("scan")
+    return scan(tmp_path, 1), scan(tmp_path, 8)
+
+
+def test_parallel_scan_matches_sequential(runs):
+    sequential, parallel = runs
+    assert parallel["highs"]  # the comparison covers real results
+    assert parallel["ema"] == sequential["ema"]
+    assert parallel["highs"] == sequential["highs"]
+    assert parallel["ledger"] == sequential["ledger"]
+
+
+def test_parallel_scan_respects_rate_limit(runs):
+    _, parallel = runs
+    calls = parallel["calls"]
+    assert len(calls) > 2 * YAHOO_BURST  # enough calls to drain the burst
+    assert max_over_rate(calls, YAHOO_RATE_PER_SEC, YAHOO_BURST) <= 1  # one token of timing slack
@@ -0,0 +1,88 @@
+import io
+import os
+import shutil
+import tarfile
+from pathlib import Path
+
+import pytest
+
+from config import HIGHS_LEDGER_FILE, METADATA_CACHE_FILE
+from utils.price_store import EMA_STORE, HISTORY_STORE, STORE_FOLDER
+from utils.providers import FakeProvider
+from utils.snapshot import MANIFEST, _files, group_of, pack, restore
+
+TICKERS = [f"S{i:02d}" for i in range(8)]
+
+
+@pytest.fixture
+def caches(tmp_path, monkeypatch):
+    """
+    Local caches for TICKERS in a scratch working directory, packed into snapshot.tar.gz.
+    Returns {path: bytes} of every packed file.
+    """
+    monkeypatch.chdir(tmp_path)
+    provider = FakeProvider()
+    for ticker in TICKERS:
+        prices = provider._prices(ticker).iloc[-300:]
+        HISTORY_STORE.write(ticker, prices)
+        EMA_STORE.write(ticker, prices[["Close"]].assign(EMA20=1.0, EMA50=2.0, EMA200=3.0))
+    Path(METADATA_CACHE_FILE).write_text('{"S00": {}}')
+    Path(HIGHS_LEDGER_FILE).write_text("Ticker,Company,Close,HighDate\n")
+    pack("snapshot.tar.gz")
+    return {str(p): p.read_bytes() for p in _files()}
+
+
+def wipe():
+    shutil.rmtree(STORE_FOLDER)
+    os.remove(METADATA_CACHE_FILE)
+    os.remove(HIGHS_LEDGER_FILE)
+
+
+def assert_restored(report, files):
+    for group in report["restored"]:
+        for name, data in files.items():
+            if group_of(name) == group:
+                assert Path(name).read_bytes() == data
+
+
+def test_truncated_snapshot_restores_the_intact_groups(caches):
+    data = Path("snapshot.tar.gz").read_bytes()
+    Path("snapshot.tar.gz").write_bytes(data[: len(data) // 2])
+    wipe()
+
+    report = restore("snapshot.tar.gz")
+    groups = {group_of(name) for name in caches}
+    assert report["restored"] and report["damaged"]
+    assert set(report["restored"]) | set(report["damaged"]) == groups
+    assert_restored(report, caches)
+    for kind, name in report["damaged"]:  # nothing half-installed
+        assert not (STORE_FOLDER / kind / name).exists() if kind != "file" else not Path(name).exists()
+    assert not Path(".snapshot_restore").exists()
+
+
+def test_manifest_mismatch_skips_only_that_group(caches):
+    damaged = str(STORE_FOLDER / "history" / "S03" / "Close.f8")
+    with tarfile.open("snapshot.tar.gz", "r:gz") as src, tarfile.open("tampered.tar.gz", "w:gz") as dst:
+        for member in src:
+            data = src.extractfile(member).read()
+            if member.name == damaged:
+                data = data[:-8] + bytes(8)  # one close changed, same size
+            dst.addfile(member, io.BytesIO(data))
+    local = HISTORY_STORE.read("S03")
+    HISTORY_STORE.write("S03", local.iloc[:100])  # the local copy must survive the failed restore
+
+    report = restore("tampered.tar.gz")
+    assert report["damaged"] == [("history", "S03")]
+    assert len(report["restored"]) == len({group_of(name) for name in caches}) - 1
+    assert_restored(report, caches)
+    assert len(HISTORY_STORE.read("S03")) == 100
+
+
+def test_unreadable_manifest_restores_nothing(caches):
+    with tarfile.open("snapshot.tar.gz", "r:gz") as src, tarfile.open("no-manifest.tar.gz", "w:gz") as dst:
+        for member in src:
+            if member.name != MANIFEST:
+                dst.addfile(member, src.extractfile(member))
+    wipe()
+    assert restore("no-manifest.tar.gz") == {"restored": [], "damaged": []}
+    assert not STORE_FOLDER.exists() or not any(STORE_FOLDER.rglob("*.f8"))
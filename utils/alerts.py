@@ -0,0 +1,193 @@
+"""
+Alert dispatch alongside the scan.
+
+Signals are published to an AlertDispatcher as soon as they are found; a background
+thread routes each one to every subscriber whose filter matches (watchlist, rules,
+minimum % above crossover) and collects a digest per subscriber. On flush, digests go
+out over a single pooled SMTP connection, and subscribers with identical digests share
+one message (up to SMTP_MAX_RECIPIENTS envelope recipients), so hundreds of recipients
+cost a handful of sends rather than hundreds of logins.
+
+subscribers.json:
+    [{"name": "tech", "email": "a@example.com", "tickers": ["AAPL", "MSFT"],
+      "rules": ["ema_crossover"], "min_pct": 7}, ...]
+"""
+import json
+import os
+import queue
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+from config import SMTP_MAX_RECIPIENTS, SUBSCRIBERS_FILE
+from utils import metrics
+from utils.email_utils import SmtpPool, build_message, format_summary
+
+# tickers / rules of None mean "all"; send_empty sends "No new signals today." digests
+Subscriber = namedtuple("Subscriber", ["name", "email", "tickers", "rules", "min_pct", "send_empty"],
+                        defaults=(None, None, None, False))
+
+_FLUSH = object()
+_STOP = object()
+
+
+def load_subscribers(path=SUBSCRIBERS_FILE):
+    """
+    Subscribers from `path`, or the single EMAIL_RECEIVER (all alerts, always mailed) without it.
+    """
+    if os.path.exists(path):
+        with open(path) as f:
+            entries = json.load(f)
+        return [Subscriber(
+            name=e.get("name", e["email"]),
+            email=e["email"],
+            tickers=frozenset(e["tickers"]) if e.get("tickers") else None,
+            rules=frozenset(e["rules"]) if e.get("rules") else None,
+            min_pct=e.get("min_pct"),
+            send_empty=e.get("send_empty", False),
+        ) for e in entries]
+    receiver = os.getenv("EMAIL_RECEIVER")
+    return [Subscriber("default", receiver, send_empty=True)] if receiver else []
+
+
+def matches(subscriber, rule, ticker, row):
+    if subscriber.tickers is not None and ticker not in subscriber.tickers:
+        return False
+    if subscriber.rules is not None and rule not in subscriber.rules:
+        return False
+    if subscriber.min_pct is not None and "PctAbove" in row and row["PctAbove"] < subscriber.min_pct:
+        return False
+    return True
+
+
+def format_digest(alerts):
+    """
+    The email summary for one subscriber's (rule, ticker, row) alerts.
+    """
+    ema_list = [{**row, "ticker": ticker} for rule, ticker, row in alerts if rule == "ema_crossover"]
+    high_list = [{**row, "Ticker": ticker} for rule, ticker, row in alerts if rule == "new_high"]
+    other = [(rule, ticker, row) for rule, ticker, row in alerts if rule not in ("ema_crossover", "new_high")]
+    summary = format_summary(ema_list, high_list) if ema_list or high_list or not other else ""
+    if other:
+        summary += "\n🔔 **Other Signals**\n\n"
+        for rule, ticker, row in other:
+            details = ", ".join(f"{k}: {v}" for k, v in row.items() if k not in ("rule", "ticker", "Ticker"))
+            summary += f"- {ticker} {rule}: {details}\n"
+    return summary
+
+
+class AlertDispatcher:
+    """
+    Routes published alerts to per-subscriber digests on a background thread and sends
+    them over one SmtpPool: at close(), on flush(), and every `flush_interval` seconds if set
+    (for long-running streams). Use as a context manager or call start() / close().
+    """
+
+    def __init__(self, subscribers=None, pool=None, subject_prefix="📊 Market Summary", flush_interval=None,
+                 max_recipients=SMTP_MAX_RECIPIENTS):
+        self.subscribers = load_subscribers() if subscribers is None else list(subscribers)
+        self.pool = pool or SmtpPool()
+        self.subject_prefix = subject_prefix
+        self.flush_interval = flush_interval
+        self.max_recipients = max_recipients
+        self.sender = os.getenv("EMAIL_SENDER") or "alerts@localhost"
+        self.stats = {"alerts": 0, "routed": 0, "messages": 0, "recipients": 0, "failed": 0}
+        self._digests = [[] for _ in self.subscribers]
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="alert-dispatcher", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def publish(self, rule, row):
+        """
+        Thread-safe; returns immediately. `row` is a signal dict with a ticker/Ticker key.
+        """
+        self._queue.put((rule, row))
+
+    def handle(self, alert):
+        """
+        Streamer handler: streaming alerts carry their own rule name.
+        """
+        self.publish(alert["rule"], alert)
+
+    def flush(self):
+        self._queue.put(_FLUSH)
+
+    def close(self):
+        """
+        Sends the final digests, waits for them and closes the SMTP connection.
+        """
+        self._queue.put(_STOP)
+        self._thread.join()
+        self.pool.close()
+        print(f"📬 [alerts.py] {self.stats['routed']} alerts to {len(self.subscribers)} subscribers: "
+              f"{self.stats['messages']} messages, {self.stats['failed']} failed")
+        return self.stats
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _run(self):
+        last_flush = time.monotonic()
+        while True:
+            timeout = None
+            if self.flush_interval:
+                timeout = max(0.0, self.flush_interval - (time.monotonic() - last_flush))
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = _FLUSH
+            if item is _STOP:
+                self._send(final=True)
+                return
+            if item is _FLUSH:
+                self._send(final=False)
+                last_flush = time.monotonic()
+                continue
+            self._route(*item)
+
+    def _route(self, rule, row):
+        ticker = row.get("ticker") or row.get("Ticker")
+        self.stats["alerts"] += 1
+        for digest, subscriber in zip(self._digests, self.subscribers):
+            if matches(subscriber, rule, ticker, row):
+                digest.append((rule, ticker, row))
+                self.stats["routed"] += 1
+
+    def _send(self, final):
+        # subscribers with the same digest share a message
+        recipients_by_body = {}
+        for i, subscriber in enumerate(self.subscribers):
+            # routing order follows scan completion; sort so identical digests render identically
+            alerts, self._digests[i] = sorted(self._digests[i], key=lambda alert: (alert[0], str(alert[1]))), []
+            if alerts or (final and subscriber.send_empty):
+                recipients_by_body.setdefault(format_digest(alerts), []).append(subscriber.email)
+        if not recipients_by_body:
+            return
+
+        subject = f"{self.subject_prefix} – {datetime.now().strftime('%Y-%m-%d')}"
+        with metrics.timer("email"):
+            for body, recipients in recipients_by_body.items():
+                for start in range(0, len(recipients), self.max_recipients):
+                    chunk = recipients[start:start + self.max_recipients]
+                    to = chunk[0] if len(chunk) == 1 else "undisclosed-recipients:;"
+                    try:
+                        self.pool.send(build_message(subject, body, self.sender, to), chunk)
+                        self.stats["messages"] += 1
+                        self.stats["recipients"] += len(chunk)
+                    except Exception as e:
+                        self.stats["failed"] += 1
+                        metrics.incr("emails_failed")
+                        print(f"❌ [alerts.py] Failed to send digest to {len(chunk)} recipients: {e}")
+
+
+def publish_all(dispatcher, ema_list, high_list):
+    for row in ema_list:
+        dispatcher.publish("ema_crossover", row)
+    for row in high_list:
+        dispatcher.publish("new_high", row)
@@ -0,0 +1,177 @@
+"""
+Vectorized backtest of the live signal rules over the cached price history.
+
+Every trading day of every ticker is evaluated at once: the EMA crossover rule runs the
+same kernel as get_ema_signals_bulk over a sliding window of each day's last LOOKBACK
+bars, and the new-high rule reuses new_high_mask. Tickers are spread across a process
+pool; each worker memory-maps its tickers straight from the price store.
+
+    python -m utils.backtest --years 10 --workers 8 --output backtest_signals.csv
+"""
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from utils.ema_signals import LOOKBACK, MIN_BARS, PCT_BAND, find_crossovers
+from utils.ema_utils import EMA_PERIODS
+from utils.highs import HIGH_WINDOWS, new_high_mask
+from utils.price_store import HISTORY_STORE
+
+# Forward returns are measured this many bars after the signal close
+HORIZONS = (5, 20, 60)
+
+
+def _ema(close, span):
+    return pd.Series(close).ewm(span=span, adjust=False).mean().to_numpy()
+
+
+def ema_signal_bars(close, lookback=LOOKBACK, band=PCT_BAND):
+    """
+    Replays the EMA crossover rule on every bar of one ticker.
+    Returns (signal, crossover) bar indices: the first day each crossover entered the band.
+    """
+    n = lookback + 1
+    if len(close) < max(n, MIN_BARS):
+        return np.empty(0, dtype=int), np.empty(0, dtype=int)
+
+    ema20, ema50, ema200 = (_ema(close, span) for span in EMA_PERIODS)
+    windows = [sliding_window_view(a, n) for a in (close, ema20, ema50, ema200)]
+    first, _ = find_crossovers(*windows, lookback, band)
+
+    # window k ends on bar k + lookback; only days with MIN_BARS of history are scanned live
+    day = np.arange(len(first)) + lookback
+    keep = (first >= 0) & (day >= MIN_BARS - 1)
+    day, crossover = day[keep], day[keep] - lookback + 1 + first[keep]
+    _, idx = np.unique(crossover, return_index=True)
+    return day[idx], crossover[idx]
+
+
+def high_signal_bars(close, window=HIGH_WINDOWS["52w"]):
+    """
+    Bars that close at or above the previous `window` bars, once a full window exists.
+    """
+    mask = new_high_mask(close[None, :], window)[0]
+    if window is not None:
+        mask[: window - 1] = False
+    return np.flatnonzero(mask)
+
+
+def forward_stats(close, bars, horizons=HORIZONS):
+    """
+    Forward returns for each horizon plus the max drawdown over the longest one.
+    Returns NaN where the history ends before the horizon.
+    """
+    entry = close[bars]
+    stats = {}
+    for h in horizons:
+        exit_bar = bars + h
+        ret = np.full(len(bars), np.nan)
+        ok = exit_bar < len(close)
+        ret[ok] = close[exit_bar[ok]] / entry[ok] - 1
+        stats[f"Ret{h}d"] = ret
+
+    longest = max(horizons)
+    padded = np.concatenate([close[1:], np.full(longest, np.nan)])
+    path = sliding_window_view(padded, longest)[bars]
+    with np.errstate(invalid="ignore"):
+        stats["MaxDrawdown"] = np.minimum(np.fmin.reduce(path, axis=1) / entry - 1, 0)
+    return stats
+
+
+def backtest_ticker(ticker, dates, close, since=None, horizons=HORIZONS):
+    """
+    All EMA-crossover and new-high signals for one ticker, with forward stats.
+    `since` (a Timestamp) drops signals before it; the EMAs still warm up on the full history.
+    """
+    close = np.asarray(close, dtype=float)
+    dates = pd.DatetimeIndex(np.asarray(dates, dtype="datetime64[ns]"))
+    ema_bars, crossover_bars = ema_signal_bars(close)
+    high_bars = high_signal_bars(close)
+
+    frames = []
+    for rule, bars, crossover in [("ema_crossover", ema_bars, crossover_bars), ("new_high", high_bars, None)]:
+        if since is not None:
+            recent = dates[bars] >= since
+            bars = bars[recent]
+            crossover = crossover[recent] if crossover is not None else None
+        if len(bars) == 0:
+            continue
+        frames.append(pd.DataFrame({
+            "Ticker": ticker,
+            "Rule": rule,
+            "SignalDate": dates[bars],
+            "CrossoverDate": dates[crossover] if crossover is not None else pd.NaT,
+            "EntryPrice": close[bars],
+            **forward_stats(close, bars, horizons),
+        }))
+    return frames
+
+
+def _backtest_chunk(tickers, since, horizons):
+    frames = []
+    for ticker, arrays in HISTORY_STORE.read_universe(tickers).items():
+        frames.extend(backtest_ticker(ticker, arrays["Date"], arrays["Close"], since, horizons))
+    return pd.concat(frames, ignore_index=True) if frames else None
+
+
+def summarize(signals, horizons=HORIZONS):
+    """
+    Per-rule signal counts, hit rates (share of positive forward returns), mean returns and drawdowns.
+    """
+    rows = []
+    for rule, group in signals.groupby("Rule"):
+        row = {"Rule": rule, "Signals": len(group), "Tickers": group["Ticker"].nunique()}
+        for h in horizons:
+            ret = group[f"Ret{h}d"].dropna()
+            row[f"HitRate{h}d"] = round((ret > 0).mean(), 4) if len(ret) else np.nan
+            row[f"MeanRet{h}d"] = round(ret.mean(), 4) if len(ret) else np.nan
+        row["AvgDrawdown"] = round(group["MaxDrawdown"].mean(), 4)
+        row["WorstDrawdown"] = round(group["MaxDrawdown"].min(), 4)
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def run_backtest(tickers=None, years=None, workers=None, horizons=HORIZONS):
+    """
+    Backtests the cached universe (default: every ticker in the history store).
+    Tickers are split into chunks across `workers` processes (1 runs inline).
+    Returns (signals, summary) DataFrames.
+    """
+    tickers = list(tickers) if tickers is not None else HISTORY_STORE.tickers()
+    since = pd.Timestamp.today().normalize() - pd.DateOffset(years=years) if years else None
+    workers = workers or os.cpu_count()
+
+    # several chunks per worker so one slow chunk doesn't leave the others idle
+    size = max(1, -(-len(tickers) // (workers * 4)))
+    chunks = [tickers[i:i + size] for i in range(0, len(tickers), size)]
+    print(f"🧪 [backtest.py] Backtesting {len(tickers)} tickers in {len(chunks)} chunks on {workers} workers")
+
+    if workers == 1:
+        parts = [_backtest_chunk(chunk, since, horizons) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_backtest_chunk, chunks, [since] * len(chunks), [horizons] * len(chunks)))
+
+    parts = [p for p in parts if p is not None]
+    if not parts:
+        return pd.DataFrame(), pd.DataFrame()
+    signals = pd.concat(parts, ignore_index=True).sort_values(["SignalDate", "Ticker"], ignore_index=True)
+    return signals, summarize(signals, horizons)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest the EMA crossover and new-high rules")
+    parser.add_argument("--years", type=int, help="only count signals from the last N years")
+    parser.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    parser.add_argument("--output", default="backtest_signals.csv", help="per-signal CSV")
+    args = parser.parse_args()
+
+    signals, summary = run_backtest(years=args.years, workers=args.workers)
+    if signals.empty:
+        print("⚠️ [backtest.py] No signals; is the price store populated?")
+    else:
+        signals.to_csv(args.output, index=False)
+        print(summary.to_string(index=False))
+        print(f"✅ [backtest.py] {len(signals)} signals written to {args.output}")
@@ -0,0 +1,77 @@
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from config import SCAN_CACHE_MB
+from utils import metrics
+
+
+class DataContext:
+    """
+    Scan-scoped LRU of loaded history frames, capped at `max_bytes`.
+    Each ticker is loaded and cleaned once and the same frame is handed to every stage
+    (stages must treat it as read-only); release() drops it once the ticker is done.
+    """
+
+    def __init__(self, max_bytes=SCAN_CACHE_MB * 2**20):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.peak_bytes = 0
+        self._frames = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, ticker, loader):
+        with self._lock:
+            if ticker in self._frames:
+                self._frames.move_to_end(ticker)
+                metrics.incr("data_context_hits")
+                return self._frames[ticker][0]
+        df = loader(ticker)  # the loader makes the freshness decision (and any refresh)
+        metrics.incr("data_context_misses")
+        if df.empty:
+            return df  # failed loads are retried by the next stage, not cached
+        size = int(df.memory_usage(index=True).sum())
+        with self._lock:
+            if ticker not in self._frames:
+                self._frames[ticker] = (df, size)
+                self.bytes += size
+                self.peak_bytes = max(self.peak_bytes, self.bytes)
+            while self.bytes > self.max_bytes and len(self._frames) > 1:
+                _, (_, evicted) = self._frames.popitem(last=False)
+                self.bytes -= evicted
+                metrics.incr("data_context_evictions")
+        return df
+
+    def release(self, ticker):
+        with self._lock:
+            entry = self._frames.pop(ticker, None)
+            if entry is not None:
+                self.bytes -= entry[1]
+
+    def __len__(self):
+        return len(self._frames)
+
+
+_active = None
+
+
+def active_context():
+    return _active
+
+
+@contextmanager
+def scan_context(max_bytes=SCAN_CACHE_MB * 2**20):
+    """
+    Makes a fresh DataContext the active one for the duration of a scan.
+    """
+    global _active
+    previous, _active = _active, DataContext(max_bytes)
+    try:
+        yield _active
+    finally:
+        print(f"🧠 [data_context.py] Peak frame cache {_active.peak_bytes / 2**20:.1f} MB")
+        _active = previous
+
+
+def release(ticker):
+    if _active is not None:
+        _active.release(ticker)
@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 from utils.ema_utils import compute_ema_incremental
 
@@ -7,7 +8,7 @@ def get_ema_signals(ticker):
     Returns a dictionary with ticker info if 5–10% above crossover, else None.
     """
     df = compute_ema_incremental(ticker)
-    if df.empty or len(df) < 200:
+    if df.empty or len(df) < MIN_BARS:
         return None
 
     for i in range(-20, 0):
@@ -33,3 +34,84 @@ def get_ema_signals(ticker):
                     "EMA200": today["EMA200"],
                 }
     return None
+
+
+LOOKBACK = 20
+PCT_BAND = (5, 10)
+
+# Bars of history the live scanner needs before it evaluates a ticker
+MIN_BARS = 200
+
+
+def _tail_matrix(frames, column, n):
+    """
+    Stacks the last `n` values of `column` from each frame into a (tickers × n) float array.
+    Rows are right-aligned on each ticker's latest bar; shorter series are NaN-padded on the left.
+    """
+    out = np.full((len(frames), n), np.nan)
+    for row, df in enumerate(frames):
+        values = df[column].to_numpy(dtype=float)[-n:]
+        out[row, n - len(values):] = values
+    return out
+
+
+def crossover_mask(ema20, ema50, ema200, lookback=LOOKBACK):
+    """
+    Crossover bars among the last `lookback` columns of right-aligned (tickers × dates)
+    arrays: EMA20 crossed above EMA50 from the previous bar while EMA50 > EMA200.
+    """
+    today = slice(-lookback, None)
+    yesterday = slice(-lookback - 1, -1)
+    with np.errstate(invalid="ignore"):
+        crossed = (ema20[:, yesterday] <= ema50[:, yesterday]) & (ema20[:, today] > ema50[:, today])
+        return crossed & (ema50[:, today] > ema200[:, today])
+
+
+def find_crossovers(close, ema20, ema50, ema200, lookback=LOOKBACK, band=PCT_BAND):
+    """
+    Vectorized crossover kernel over right-aligned (tickers × dates) arrays.
+    For each ticker, finds the first of the last `lookback` bars where EMA20 crossed above
+    EMA50 while EMA50 > EMA200 and the latest close is within `band` % of that bar's close.
+    Returns (first, pct): the hit's offset into the last `lookback` columns (-1 if none)
+    and the rounded pct-above matrix for those columns.
+    NaN EMAs compare False, which skips the same bars the per-ticker loop skips.
+    """
+    today = slice(-lookback, None)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        pct = np.round((close[:, -1:] - close[:, today]) / close[:, today] * 100, 2)
+        hit = crossover_mask(ema20, ema50, ema200, lookback) & (pct >= band[0]) & (pct <= band[1])
+    first = np.where(hit.any(axis=1), hit.argmax(axis=1), -1)
+    return first, pct
+
+
+def get_ema_signals_bulk(frames, lookback=LOOKBACK, band=PCT_BAND):
+    """
+    Whole-universe version of get_ema_signals.
+    Takes {ticker: EMA DataFrame} (as returned by compute_ema_incremental) and returns the
+    same signal dicts, in input order, from a single pass of the vectorized kernel.
+    """
+    eligible = {t: df for t, df in frames.items() if not df.empty and len(df) >= 200}
+    if not eligible:
+        return []
+
+    tickers, dfs = list(eligible), list(eligible.values())
+    n = lookback + 1
+    close, ema20, ema50, ema200 = (_tail_matrix(dfs, col, n) for col in ["Close", "EMA20", "EMA50", "EMA200"])
+    first, pct = find_crossovers(close, ema20, ema50, ema200, lookback, band)
+
+    signals = []
+    for row in np.flatnonzero(first >= 0):
+        col = 1 + first[row]
+        df = dfs[row]
+        crossover_price = close[row, col]
+        signals.append({
+            "ticker": tickers[row],
+            "CrossoverDate": str(df.index[len(df) - n + col].date()),
+            "CrossoverPrice": round(crossover_price, 2),
+            "CurrentPrice": round(close[row, -1], 2),
+            "PctAbove": pct[row, first[row]],
+            "EMA20": ema20[row, col],
+            "EMA50": ema50[row, col],
+            "EMA200": ema200[row, col],
+        })
+    return signals
@@ -1,49 +1,104 @@
+import json
+import os
 import pandas as pd
-from pathlib import Path
 from utils.market_data import get_historical_data
-
-EMA_FOLDER = Path("ema_data")
-EMA_FOLDER.mkdir(exist_ok=True)
+from utils.price_store import EMA_STORE
 
 EMA_PERIODS = [20, 50, 200]
 
+# Recent Close/EMA rows kept on disk for signal detection (>= 200 for the warm-up
+# check in get_ema_signals). The file is trimmed back once it doubles.
+EMA_WINDOW = 260
+
+
+def _state_file(ticker):
+    return EMA_STORE.folder / ticker / "state.json"
+
+
+def load_ema_state(ticker):
+    """
+    Returns {"date", "EMA20", "EMA50", "EMA200"} for the last processed bar, or None.
+    """
+    file_path = _state_file(ticker)
+    if not file_path.exists():
+        return None
+    return json.loads(file_path.read_text())
+
+
+def save_ema_state(ticker, row):
+    """
+    Persists the last bar's EMA values; json floats round-trip exactly.
+    """
+    file_path = _state_file(ticker)
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    state = {"date": str(row.name.date())}
+    state.update({f"EMA{p}": float(row[f"EMA{p}"]) for p in EMA_PERIODS})
+    tmp_path = file_path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(state))
+    os.replace(tmp_path, file_path)
+
+
+def advance_ema(state, closes):
+    """
+    Applies new closes to an EMA state in one vectorized pass per period.
+    Each series is seeded with the stored EMA value, which continues the
+    ewm(span, adjust=False) recurrence over the full history bit-for-bit.
+    Returns a DataFrame with Close + EMA columns indexed like `closes`.
+    """
+    df = pd.DataFrame({"Close": closes})
+    for period in EMA_PERIODS:
+        col = f"EMA{period}"
+        seeded = pd.concat([pd.Series([state[col]]), closes.reset_index(drop=True)], ignore_index=True)
+        df[col] = seeded.ewm(span=period, adjust=False).mean().to_numpy()[1:]
+    return df
+
+
+def read_ema_window(ticker):
+    """
+    The stored recent window without touching price history (empty if never computed).
+    """
+    if not EMA_STORE.exists(ticker):
+        return pd.DataFrame()
+    return EMA_STORE.read(ticker).iloc[-EMA_WINDOW:]
+
 
 def compute_ema_incremental(ticker):
     """
-    Loads cached EMA data (if any), updates with new price data, and saves.
-    Returns a DataFrame with Close + EMA20, EMA50, EMA200.
+    Updates the ticker's EMA state with any new price bars and returns the recent window
+    (up to EMA_WINDOW rows) as a DataFrame with Close + EMA20, EMA50, EMA200.
+    The window is appended before the state is saved; the state is checked against the
+    window's last date first, so an interrupted update never appends the same bars twice.
     """
     hist_df = get_historical_data(ticker)
     if hist_df.empty or 'Close' not in hist_df.columns:
         return pd.DataFrame()
 
-    ema_file = EMA_FOLDER / f"{ticker}_ema.csv"
+    state = load_ema_state(ticker)
+    tail = EMA_STORE.last_date(ticker)
+    if state is not None and tail is not None and tail > pd.Timestamp(state["date"]):
+        # an earlier run appended to the window but stopped before saving the state:
+        # the window's last row is the state it would have saved
+        save_ema_state(ticker, EMA_STORE.read(ticker).iloc[-1])
+        state = load_ema_state(ticker)
+    if (state is None or tail is None or pd.Timestamp(state["date"]) != tail
+            or pd.Timestamp(state["date"]) > hist_df.index[-1]):
+        # full recompute (first time, or state out of step with the window): seeds every EMA
+        # from the start of the history
+        df = hist_df[["Close"]].copy()
+        for period in EMA_PERIODS:
+            df[f"EMA{period}"] = df["Close"].ewm(span=period, adjust=False).mean()
+        df = df.iloc[-EMA_WINDOW:]
+        EMA_STORE.write(ticker, df)
+        save_ema_state(ticker, df.iloc[-1])
+        return df
 
-    # Load cached EMA if exists
-    if ema_file.exists():
-        ema_df = pd.read_csv(ema_file, index_col=0, parse_dates=True)
-        last_cached_date = ema_df.index[-1]
-        new_data = hist_df[hist_df.index > last_cached_date]
-        if new_data.empty:
-            return ema_df  # up to date
-        df = pd.concat([ema_df, new_data])
-    else:
-        df = hist_df.copy()
+    new_data = hist_df.loc[hist_df.index > pd.Timestamp(state["date"]), "Close"]
+    if not new_data.empty:
+        # incremental update: O(new bars), appended without rewriting the window
+        new_df = advance_ema(state, new_data)
+        EMA_STORE.append(ticker, new_df)
+        if EMA_STORE.rows(ticker) > 2 * EMA_WINDOW:
+            EMA_STORE.write(ticker, EMA_STORE.read(ticker).iloc[-EMA_WINDOW:])
+        save_ema_state(ticker, new_df.iloc[-1])
 
-    # Compute or update EMAs
-    for period in EMA_PERIODS:
-        col = f"EMA{period}"
-        alpha = 2 / (period + 1)
-        if col in df.columns and ema_file.exists():
-            # incremental update
-            last_ema = df[col].iloc[-len(new_data) - 1] if len(new_data) > 0 else df[col].iloc[-1]
-            for date, row in new_data.iterrows():
-                last_ema = (row["Close"] * alpha) + (last_ema * (1 - alpha))
-                df.loc[date, col] = last_ema
-        else:
-            # full recompute (first time)
-            df[col] = df["Close"].ewm(span=period, adjust=False).mean()
-
-    # Save updated EMA file
-    df.to_csv(ema_file)
-    return df
+    return EMA_STORE.read(ticker).iloc[-EMA_WINDOW:]
@@ -1,7 +1,79 @@
 import os
 import smtplib
+import threading
 from email.mime.text import MIMEText
 from datetime import datetime
+from config import SMTP_HOST, SMTP_PORT, SMTP_SECURITY, SMTP_TIMEOUT
+from utils import metrics
+
+
+class SmtpPool:
+    """
+    One SMTP connection reused for every message of a run: opened (and logged in) on the
+    first send, reopened once if the server has dropped it. Security is ssl, starttls or none;
+    without a password no login is attempted (e.g. a local relay or test server).
+    """
+
+    def __init__(self, host=SMTP_HOST, port=SMTP_PORT, security=SMTP_SECURITY, user=None, password=None,
+                 timeout=SMTP_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.security = security
+        self.user = user if user is not None else os.getenv("EMAIL_SENDER")
+        self.password = password if password is not None else os.getenv("EMAIL_PASSWORD")
+        self.timeout = timeout
+        self._server = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self.security == "ssl":
+            server = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+        else:
+            server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.security == "starttls":
+                server.starttls()
+        if self.password:
+            server.login(self.user, self.password)
+        metrics.incr("smtp_connections")
+        return server
+
+    def send(self, msg, recipients):
+        with self._lock:
+            for attempt in (1, 2):
+                if self._server is None:
+                    self._server = self._connect()
+                try:
+                    self._server.sendmail(msg["From"], recipients, msg.as_string())
+                    metrics.incr("emails_sent")
+                    return
+                except smtplib.SMTPServerDisconnected:
+                    self._server = None
+                    if attempt == 2:
+                        raise
+
+    def close(self):
+        with self._lock:
+            if self._server is not None:
+                try:
+                    self._server.quit()
+                except smtplib.SMTPException:
+                    pass
+                self._server = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def build_message(subject, body, sender, to):
+    msg = MIMEText(body, "plain")
+    msg["Subject"] = subject
+    msg["From"] = sender
+    msg["To"] = to
+    return msg
+
 
 def format_summary(ema_list, high_list):
     """
@@ -47,15 +119,11 @@ def send_email_alert(ema_list, high_list, subject_prefix="📊 Market Summary",
 
     subject = f"{subject_prefix} – {datetime.now().strftime('%Y-%m-%d')}"
 
-    msg = MIMEText(body, "plain")
-    msg["Subject"] = subject
-    msg["From"] = sender
-    msg["To"] = receiver
+    msg = build_message(subject, body, sender, receiver)
 
     try:
-        with smtplib.SMTP_SSL("smtp.gmail.com", 465) as server:
-            server.login(sender, password)
-            server.sendmail(sender, receiver, msg.as_string())
+        with metrics.timer("email"), SmtpPool(user=sender, password=password) as pool:
+            pool.send(msg, [receiver])
         print(f"✅ Email sent: {subject}")
     except Exception as e:
         print(f"❌ Failed to send email: {e}")
@@ -1,12 +1,135 @@
+import json
+import os
+from collections import deque
+import numpy as np
 import pandas as pd
-import yfinance as yf
 from utils.market_data import get_historical_data
 from utils.ledger_utils import update_highs_ledger
+from utils.metadata import METADATA
+from utils.price_store import HIGHS_STATE_FOLDER
+from utils.retry import is_transient
 
+# Lookback windows in bars; None tracks the all-time high of the cached history
+HIGH_WINDOWS = {"52w": 252, "20d": 20, "all": None}
 
-def check_new_high(ticker):
+
+class RollingHigh:
+    """
+    Running N-bar high over a stream of closes.
+    Keeps a monotonic deque of (bar number, close) with strictly decreasing closes,
+    so each update is O(1) amortized and the window max is always at the front.
+    """
+
+    def __init__(self, window=252, items=(), count=0):
+        self.window = window
+        self.items = deque(tuple(item) for item in items)
+        self.count = count
+
+    @property
+    def high(self):
+        return self.items[0][1] if self.items else np.nan
+
+    def update(self, close):
+        """
+        Pushes one close; returns True if it is at or above every close in the window.
+        """
+        i = self.count
+        self.count += 1
+        while self.items and self.items[-1][1] <= close:
+            self.items.pop()
+        self.items.append((i, close))
+        if self.window is not None:
+            while self.items[0][0] <= i - self.window:
+                self.items.popleft()
+        return self.items[0][0] == i
+
+    def peek(self, close):
+        """
+        Whether `close` would be a new high if pushed next, without pushing it.
+        """
+        for j, high in self.items:  # closes decrease front to back; skip at most one expiring item
+            if self.window is None or j > self.count - self.window:
+                return close >= high
+        return True
+
+    def to_dict(self):
+        return {"window": self.window, "count": self.count, "items": [list(item) for item in self.items]}
+
+    @classmethod
+    def from_dict(cls, state):
+        return cls(state["window"], state["items"], state["count"])
+
+
+def _state_file(ticker):
+    return HIGHS_STATE_FOLDER / f"{ticker}.json"
+
+
+def load_high_state(ticker):
+    file_path = _state_file(ticker)
+    return json.loads(file_path.read_text()) if file_path.exists() else {}
+
+
+def save_high_state(ticker, states):
+    HIGHS_STATE_FOLDER.mkdir(parents=True, exist_ok=True)
+    file_path = _state_file(ticker)
+    tmp_path = file_path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(states))
+    os.replace(tmp_path, file_path)
+
+
+def update_high_state(ticker, closes, window="52w"):
     """
-    Checks if current closing price is a new 52-week (2-year) high.
+    Advances the ticker's rolling-high tracker with any closes after its last date
+    (rebuilding it from `closes` when missing or out of sync) and persists it.
+    Returns True if the latest close is a new high for the window.
+    """
+    states = load_high_state(ticker)
+    state = states.get(window)
+    last_date = closes.index[-1]
+
+    if state and pd.Timestamp(state["date"]) <= last_date:
+        tracker = RollingHigh.from_dict(state["tracker"])
+        new_closes = closes[closes.index > pd.Timestamp(state["date"])]
+        is_high = state["is_high"]
+    else:
+        tracker = RollingHigh(HIGH_WINDOWS[window])
+        new_closes = closes
+        is_high = False
+
+    for close in new_closes.to_numpy(dtype=float):
+        is_high = tracker.update(close)
+
+    states[window] = {"date": str(last_date.date()), "is_high": bool(is_high), "tracker": tracker.to_dict()}
+    save_high_state(ticker, states)
+    return bool(is_high)
+
+
+def new_high_mask(close, window=252):
+    """
+    Vectorized universe-wide evaluation over a (tickers × dates) close panel.
+    Returns a boolean panel marking every bar that is at or above the max of the
+    preceding `window` bars (None = all history). NaN padding never counts as a high.
+    """
+    if window is None:
+        running = np.fmax.accumulate(np.where(np.isnan(close), -np.inf, close), axis=1)
+    else:
+        running = pd.DataFrame(close.T).rolling(window, min_periods=1).max().to_numpy().T
+    with np.errstate(invalid="ignore"):
+        return close >= running
+
+
+def is_new_high(close, window=252):
+    """
+    Latest-bar version of new_high_mask for a right-aligned (tickers × dates) panel.
+    """
+    recent = close if window is None else close[:, -window:]
+    with np.errstate(invalid="ignore"):
+        return recent[:, -1] >= np.fmax.reduce(recent, axis=1)
+
+
+def check_new_high(ticker, window="52w"):
+    """
+    Checks if current closing price is a new high for `window` (default 52 weeks).
     Returns a dict with ticker info if new high is detected.
     """
     try:
@@ -14,15 +137,11 @@ def check_new_high(ticker):
         if df.empty or "Close" not in df.columns:
             return None
 
-        df["Close"] = pd.to_numeric(df["Close"], errors="coerce").dropna()
-        max_close = df["Close"].max()
-        close_today = df["Close"].iloc[-1]
-
         # new high condition
-        if close_today >= max_close:
+        if update_high_state(ticker, df["Close"], window):
             date = df.index[-1]
-            info = yf.Ticker(ticker).info
-            name = info.get("shortName", ticker)
+            close_today = df["Close"].iloc[-1]
+            name = METADATA.get(ticker, "shortName", ticker)
             update_highs_ledger(ticker, name, close_today, date)
             return {
                 "Ticker": ticker,
@@ -34,5 +153,7 @@ def check_new_high(ticker):
         return None
 
     except Exception as e:
+        if is_transient(e):
+            raise
         print(f"⚠️ [highs.py] Unexpected error for {ticker}: {e}")
         return None
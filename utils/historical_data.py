@@ -1,94 +1,402 @@
-import yfinance as yf
+import json
+import os
+import threading
+import numpy as np
 import pandas as pd
 import time
-import random
-from pathlib import Path
+from config import (
+    BULK_CHUNK_SIZE, HISTORY_PERIOD, RETRY_MAX_ATTEMPTS, REBASE_OVERLAP_BARS, REBASE_TOLERANCE, REBASE_LOG_FILE,
+)
+from utils import metrics
+from utils.price_store import EMA_STORE, HIGHS_STATE_FOLDER, HISTORY_STORE, PRICE_COLUMNS
+from utils.providers import get_provider
+from utils.retry import RETRY_POLICY, ProviderDownError, call_with_retry, is_transient
 
-HISTORICAL_FOLDER = Path("historical_data")
-HISTORICAL_FOLDER.mkdir(exist_ok=True)
+INDEX_FILE = HISTORY_STORE.folder / "_index.json"
+_INDEX_LOCK = threading.Lock()
+_index = None
+_index_dirty = False
+_LOG_LOCK = threading.Lock()
 
-def download_historical(ticker, period="2y", interval="1d", max_retries=5):
+
+class HistoryRebased(Exception):
+    """
+    The provider re-based a ticker's cached history (split or dividend adjustment).
+    Its caches have been invalidated; reload its history from `start`.
+    """
+
+    def __init__(self, ticker, start):
+        super().__init__(f"{ticker} history re-based; reload from {start}")
+        self.ticker = ticker
+        self.start = start
+
+
+def _clean_prices(data):
+    """
+    Keeps the known price columns as numeric and drops rows without a Close.
+    """
+    if "Close" not in data.columns:
+        raise ValueError(f"Missing 'Close' column. Columns found: {list(data.columns)}")
+    numeric_cols = [c for c in PRICE_COLUMNS if c in data.columns]
+    return data[numeric_cols].apply(pd.to_numeric, errors="coerce").dropna(subset=["Close"])
+
+
+def _load_index():
+    """
+    Freshness index {ticker: {"last_date", "checked"}}; call with _INDEX_LOCK held.
+    """
+    global _index
+    if _index is None:
+        _index = json.loads(INDEX_FILE.read_text()) if INDEX_FILE.exists() else {}
+    return _index
+
+
+def _record(ticker, last_date=None, checked=True):
+    """
+    Updates a ticker's freshness entry in memory; save_index() writes it out.
+    """
+    global _index_dirty
+    with _INDEX_LOCK:
+        entry = _load_index().setdefault(ticker, {})
+        if last_date is not None:
+            entry["last_date"] = str(pd.Timestamp(last_date).date())
+        if checked:
+            entry["checked"] = str(pd.Timestamp.today().date())
+        _index_dirty = True
+
+
+def save_index():
+    """
+    Writes the freshness index if it changed (tmp file + os.replace), once per bulk chunk
+    and at the end of a scan rather than per ticker. A lost update only costs a re-check:
+    last dates fall back to the price store.
+    """
+    global _index_dirty
+    with _INDEX_LOCK:
+        if not _index_dirty:
+            return
+        tmp_path = INDEX_FILE.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(_index, indent=1, sort_keys=True))
+        os.replace(tmp_path, INDEX_FILE)
+        _index_dirty = False
+
+
+def forget(ticker):
+    """
+    Drops a ticker from the freshness index (its store entry is deleted separately).
+    """
+    global _index_dirty
+    with _INDEX_LOCK:
+        if _load_index().pop(ticker, None) is not None:
+            _index_dirty = True
+
+
+def invalidate_derived(ticker):
+    """
+    Deletes the state computed from a ticker's history (EMA window and state, highs tracker),
+    so the next scan recomputes it from the cached prices.
+    """
+    EMA_STORE.delete(ticker)  # the EMA state file lives in the same directory
+    (HIGHS_STATE_FOLDER / f"{ticker}.json").unlink(missing_ok=True)
+
+
+def invalidate(ticker):
+    """
+    Deletes every per-ticker cache: history, EMA window and state, highs state, freshness entry.
+    """
+    HISTORY_STORE.delete(ticker)
+    invalidate_derived(ticker)
+    forget(ticker)
+
+
+def log_decision(ticker, decision, **details):
+    """
+    Appends one overlap-check decision to the rebase log.
+    """
+    metrics.incr(f"rebase.{decision}")
+    entry = {"date": str(pd.Timestamp.today().date()), "ticker": ticker, "decision": decision, **details}
+    with _LOG_LOCK, open(REBASE_LOG_FILE, "a") as f:
+        f.write(json.dumps(entry) + "\n")
+
+
+_DIFF_KEYS = {"Close": "max_diff", "Adj Close": "max_adj_diff"}  # rebase log fields
+
+
+def check_overlap(ticker, data, tolerance=REBASE_TOLERANCE, columns=("Close", "Adj Close")):
+    """
+    Compares the provider's closes and adjusted closes on already-cached dates with the cache
+    (a dividend re-bases only Adj Close, a split both).
+    Returns (decision, first disagreeing date or None, details), where decision is
+    "verified" (every overlapping bar agrees), "revised" (only recent bars differ, e.g. a
+    provisional bar was corrected), "rebased" (the oldest overlapping bar differs too: the
+    whole history was re-adjusted) or "unverifiable" (no cached dates in the response).
+    """
+    columns = [c for c in columns if c in data.columns]
+    cached = HISTORY_STORE.read_columns(ticker, columns)
+    dates = np.asarray(cached["Date"])
+    fresh_dates = pd.DatetimeIndex(data.index).as_unit("ns").asi8
+    pos = np.minimum(np.searchsorted(dates, fresh_dates), len(dates) - 1)
+    common = dates[pos] == fresh_dates
+    if not common.any():
+        return "unverifiable", None, {}
+
+    bad = np.zeros(int(common.sum()), dtype=bool)
+    details = {"overlap": int(common.sum())}
+    for column in columns:
+        old = np.asarray(cached[column])[pos[common]]
+        new = data[column].to_numpy(dtype=float)[common]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            diff = np.abs(new / old - 1)
+        drift = ~((diff <= tolerance) | (np.isnan(old) & np.isnan(new)))
+        details[_DIFF_KEYS[column]] = round(float(np.nanmax(diff, initial=0)), 6)
+        if drift.any() and "ratio" not in details:
+            details["ratio"] = round(float(np.median(new[drift] / old[drift])), 6)
+            details["column"] = column
+        bad |= drift
+    if not bad.any():
+        return "verified", None, details
+    first = data.index[common][bad.argmax()]
+    return ("rebased" if bad[0] else "revised"), first, details
+
+
+def last_cached_date(ticker):
     """
-    Downloads historical stock data with exponential backoff and caching.
-    Handles all known yfinance column naming variants:
-      - 'Close'
-      - 'Close_<TICKER>'
-      - '<TICKER>_Close'
+    Returns the date of the ticker's last cached bar, or None if it has no cache.
     """
+    with _INDEX_LOCK:
+        last = _load_index().get(ticker, {}).get("last_date")
+    if last and HISTORY_STORE.exists(ticker):
+        return pd.Timestamp(last)
+    last = HISTORY_STORE.last_date(ticker)
+    if last is not None:
+        _record(ticker, last, checked=False)
+    return last
+
+
+def latest_expected_bar(today=None):
+    """
+    Most recent business day, i.e. the newest daily bar a fresh cache should hold.
+    """
+    today = pd.Timestamp.today().normalize() if today is None else pd.Timestamp(today)
+    return pd.offsets.BDay().rollback(today)
+
+
+def is_stale(ticker):
+    """
+    True if the ticker's cache is missing or behind the latest expected bar.
+    A ticker already checked today counts as fresh (covers holidays and halted names).
+    """
+    last = last_cached_date(ticker)
+    if last is None:
+        return True
+    with _INDEX_LOCK:
+        checked = _load_index().get(ticker, {}).get("checked")
+    if checked == str(pd.Timestamp.today().date()):
+        return False
+    return last < latest_expected_bar()
+
+
+def _append_to_cache(ticker, data):
+    """
+    Appends rows newer than the last cached bar to the ticker's price store.
+    Rows on already-cached dates (the refresh overlap window) are checked against the cache
+    first: a revised recent bar rewrites the history from that bar and drops the derived EMA
+    and highs state; a re-based history invalidates every cache of the ticker and raises
+    HistoryRebased so the caller reloads it. Returns the number of rows added.
+    """
+    data = data.sort_index()
+    last = last_cached_date(ticker)
+    if last is None:
+        HISTORY_STORE.write(ticker, data)
+        _record(ticker, data.index[-1])
+        print(f"✅ [historical_data.py] Cached new data for {ticker}.")
+        return len(data)
+
+    decision, first_diff, details = check_overlap(ticker, data)
+    log_decision(ticker, decision, **details)
+    if decision == "rebased":
+        start = str(HISTORY_STORE.read(ticker, ["Close"]).index[0].date())  # keep the cached depth
+        invalidate(ticker)
+        print(f"♻️ [historical_data.py] {ticker} history re-based by the provider (ratio {details['ratio']}); "
+              f"caches invalidated, reloading from {start}")
+        raise HistoryRebased(ticker, start)
+    if decision == "revised":
+        cached = HISTORY_STORE.read(ticker)
+        revised = pd.concat([cached[cached.index < first_diff], data[data.index >= first_diff]])
+        HISTORY_STORE.write(ticker, revised)
+        invalidate_derived(ticker)
+        _record(ticker, revised.index[-1])
+        print(f"✏️ [historical_data.py] {ticker} bars revised from {first_diff.date()}; "
+              f"history rewritten, EMA and highs state will be recomputed")
+        return int((data.index > last).sum())
+
+    new_data = data[data.index > last]
+    if new_data.empty:
+        _record(ticker)
+        print(f"ℹ️ [historical_data.py] No new data for {ticker}, using cached.")
+        return 0
+
+    HISTORY_STORE.append(ticker, new_data)
+    _record(ticker, new_data.index[-1])
+    print(f"✅ [historical_data.py] Updated cache for {ticker}: +{len(new_data)} rows")
+    return len(new_data)
+
+
+def split_by_ticker(data):
+    """
+    Splits a (ticker, field) MultiIndex download into {ticker: cleaned frame}.
+    All tickers are stacked, coerced and filtered in one pass before grouping;
+    tickers with no valid Close rows are left out.
+    """
+    if data is None or data.empty:
+        return {}
+    stacked = data.stack(level=0, future_stack=True)
+    stacked.index = stacked.index.set_names(["Date", "Ticker"])
+    stacked = _clean_prices(stacked)
+    return {
+        ticker: frame.droplevel("Ticker")
+        for ticker, frame in stacked.groupby(level="Ticker", sort=False)
+    }
+
+
+def download_historical_bulk(tickers, period=HISTORY_PERIOD, interval="1d", start=None, chunk_size=BULK_CHUNK_SIZE,
+                             max_retries=RETRY_MAX_ATTEMPTS):
+    """
+    Downloads history for many tickers with one provider request per chunk and appends it to the cache.
+    Only tickers that failed transiently (rate limit, timeout) are retried, in later rounds
+    paced by the shared retry policy. A bulk response does not say why a ticker is missing
+    from it (rate limited, no new bars, delisted), so each missing ticker is confirmed with a
+    single-ticker fetch before it is recorded fresh or reported as having no data. Any other
+    per-ticker error is logged and skipped, as in the per-ticker path.
+    Returns {ticker: downloaded DataFrame}; tickers that never succeed are omitted.
+    """
+    provider = get_provider()
+    pending = list(dict.fromkeys(tickers))
+    results = {}
+    reload = {}  # re-based tickers by the date their history has to be reloaded from
+
     for attempt in range(1, max_retries + 1):
-        try:
-            # --- Download from yfinance ---
-            data = yf.download(
-                ticker,
-                period=period,
-                interval=interval,
-                progress=False,
-                auto_adjust=False,
-                group_by="ticker"
-            )
-
-            # --- Handle unexpected Series ---
-            if isinstance(data, pd.Series):
-                data = data.to_frame().T
-
-            # --- Flatten MultiIndex columns ---
-            if isinstance(data.columns, pd.MultiIndex):
-                data.columns = ['_'.join(col).strip() for col in data.columns.values]
-
-            cols_before = list(data.columns)
-
-            # --- Try to normalize prefixes/suffixes ---
-            tkr_upper = ticker.upper()
-            renamed_cols = {}
-
-            for col in cols_before:
-                if col.startswith(tkr_upper + "_"):
-                    renamed_cols[col] = col.replace(tkr_upper + "_", "")
-                elif col.endswith("_" + tkr_upper):
-                    renamed_cols[col] = col.replace("_" + tkr_upper, "")
-
-            if renamed_cols:
-                data = data.rename(columns=renamed_cols)
-
-            # --- Validate ---
-            if "Close" not in data.columns:
-                print(f"⚠️ [historical_data.py] {ticker}: Missing 'Close' column. Columns found: {list(data.columns)}")
-                raise ValueError("Missing 'Close' column")
-
-            # --- Clean numeric columns ---
-            numeric_cols = [c for c in ["Open","High","Low","Close","Adj Close","Volume"] if c in data.columns]
-            data = data[numeric_cols].apply(pd.to_numeric, errors="coerce").dropna(subset=["Close"])
-
-            if data.empty:
-                raise ValueError("No valid price data after cleaning")
-
-            # --- Save or update cached file ---
-            file_path = HISTORICAL_FOLDER / f"{ticker}.csv"
-            if file_path.exists():
+        failed = []
+        for i in range(0, len(pending), chunk_size):
+            chunk = pending[i:i + chunk_size]
+            try:
+                frames = split_by_ticker(provider.download_many(chunk, period=period, interval=interval, start=start))
+                RETRY_POLICY.record_success()
+            except Exception as e:
+                print(f"⚠️ [historical_data.py] Bulk download failed for {len(chunk)} tickers: {e}")
+                if not is_transient(e):
+                    continue
+                RETRY_POLICY.record_failure()
+                failed.extend(chunk)
+                continue
+            for ticker in chunk:
                 try:
-                    cached = pd.read_csv(file_path, index_col=0, parse_dates=True)
-                    new_data = data[~data.index.isin(cached.index)]
-                    if not new_data.empty:
-                        updated = pd.concat([cached, new_data]).sort_index()
-                        updated.to_csv(file_path)
-                        print(f"✅ [historical_data.py] Updated cache for {ticker}: +{len(new_data)} rows")
-                        return updated
-                    else:
-                        print(f"ℹ️ [historical_data.py] No new data for {ticker}, using cached.")
-                        return cached
+                    if ticker in frames:
+                        _append_to_cache(ticker, frames[ticker])
+                        results[ticker] = frames[ticker]
+                        continue
+                    data = download_historical(ticker, period=period, interval=interval, start=start)
+                    if not data.empty:
+                        results[ticker] = data
+                except HistoryRebased as e:
+                    reload.setdefault(e.start, []).append(ticker)
+                except ProviderDownError:
+                    save_index()
+                    raise
                 except Exception as e:
-                    print(f"⚠️ [historical_data.py] Cache read error for {ticker}: {e}. Overwriting.")
-                    data.to_csv(file_path)
-                    return data
-            else:
-                data.to_csv(file_path)
-                print(f"✅ [historical_data.py] Cached new data for {ticker}.")
-                return data
-
-        except Exception as e:
-            wait = 2 ** attempt + random.random()
-            print(f"⚠️ [historical_data.py] Attempt {attempt} failed for {ticker}: {e}. Retrying in {wait:.1f}s...")
-            time.sleep(wait)
-
-    print(f"❌ [historical_data.py] Failed to download {ticker} after {max_retries} attempts")
-    return pd.DataFrame()
+                    if is_transient(e):
+                        failed.append(ticker)
+                    else:  # one bad ticker must not abort the rest of the universe
+                        print(f"❌ [historical_data.py] Could not cache {ticker}: {e}")
+            save_index()
+
+        if not failed:
+            break
+        pending = failed
+        if attempt == max_retries or not RETRY_POLICY.allow_retry():
+            break
+        wait = RETRY_POLICY.delay(attempt)
+        print(f"⚠️ [historical_data.py] Attempt {attempt}: {len(failed)} tickers failed transiently. Retrying in {wait:.1f}s...")
+        time.sleep(wait)
+
+    if failed:
+        print(f"❌ [historical_data.py] Failed to download {len(failed)} tickers after {attempt} attempts: {failed}")
+    for reload_start, group in sorted(reload.items()):
+        print(f"📥 [historical_data.py] Reloading history from {reload_start} for {len(group)} re-based tickers")
+        results.update(download_historical_bulk(group, interval=interval, start=reload_start, chunk_size=chunk_size,
+                                                max_retries=max_retries))
+    return results
+
+
+def download_historical(ticker, period=HISTORY_PERIOD, interval="1d", start=None, max_retries=1):
+    """
+    Downloads historical stock data for one ticker and caches it.
+    With `start`, only bars from that date on are requested; an empty answer means the cache
+    is already current. Returns the downloaded rows (empty if the provider has no data).
+    Transient errors are retried in place up to `max_retries` attempts and then raised, so
+    callers running under the RetryScheduler can requeue the ticker instead of blocking.
+    """
+    try:
+        data = call_with_retry(
+            get_provider().download, ticker, period=period, interval=interval, start=start,
+            max_attempts=max_retries,
+        )
+        if data.empty and start is not None:
+            _record(ticker)
+            return pd.DataFrame()
+        data = _clean_prices(data)
+        if data.empty:
+            raise ValueError("No valid price data after cleaning")
+    except Exception as e:
+        if is_transient(e) or isinstance(e, ProviderDownError):
+            raise
+        print(f"❌ [historical_data.py] No data for {ticker}: {e}")
+        return pd.DataFrame()
+
+    try:
+        _append_to_cache(ticker, data)
+    except HistoryRebased as e:
+        return download_historical(ticker, interval=interval, start=e.start, max_retries=max_retries)
+    return data
+
+
+def _overlap_start(last, bars=REBASE_OVERLAP_BARS):
+    """
+    Start of a delta request: the last `bars` cached business days are re-requested so
+    _append_to_cache can check them against the cache.
+    """
+    return (pd.Timestamp(last) - pd.offsets.BDay(max(bars, 1) - 1)).strftime("%Y-%m-%d")
+
+
+def refresh_historical(ticker):
+    """
+    Brings one ticker's cache up to date, requesting only the overlap window and newer bars.
+    """
+    last = last_cached_date(ticker)
+    if last is None:
+        return download_historical(ticker)
+    return download_historical(ticker, start=_overlap_start(last))
+
+
+def refresh_universe(tickers, chunk_size=BULK_CHUNK_SIZE):
+    """
+    Brings the whole universe up to date in bulk.
+    Uncached tickers get a full download; stale ones are grouped by their last cached bar
+    and fetched from a short overlap window before it, so the cost scales with new bars,
+    not history, while split/dividend re-basing is still caught per ticker.
+    """
+    cold, stale = [], {}
+    for ticker in dict.fromkeys(tickers):
+        last = last_cached_date(ticker)
+        if last is None:
+            cold.append(ticker)
+        elif is_stale(ticker):
+            stale.setdefault(last, []).append(ticker)
+
+    if cold:
+        print(f"📥 [historical_data.py] Full download for {len(cold)} uncached tickers")
+        download_historical_bulk(cold, chunk_size=chunk_size)
+    for last, group in sorted(stale.items()):
+        print(f"📥 [historical_data.py] Delta refresh from {_overlap_start(last)} for {len(group)} tickers")
+        download_historical_bulk(group, start=_overlap_start(last), chunk_size=chunk_size)
+    save_index()  # entries recorded by last_cached_date for tickers that needed no download
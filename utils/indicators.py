@@ -0,0 +1,302 @@
+"""
+Indicator and signal registry with a fused per-ticker pass.
+
+Indicators are registered once by name and computed on demand through an
+IndicatorContext, which memoizes every result by (name, params). Signals only ask the
+context for what they need, so intermediates (EMAs, the running close sum behind every
+SMA, true range, rolling windows) are computed once per ticker no matter how many
+signals use them. Adding a screen is a @signal function, not another pass over the data.
+The scanner evaluates its crossover rule through evaluate() as well, so each rule has a
+single implementation here.
+
+    python -m utils.indicators --signals ema_crossover,rsi_extreme,volume_surge
+"""
+import argparse
+import numpy as np
+import pandas as pd
+from utils.ema_signals import LOOKBACK, MIN_BARS, PCT_BAND, find_crossovers
+from utils.highs import HIGH_WINDOWS, is_new_high
+from utils.price_store import HISTORY_STORE
+
+INDICATORS = {}
+SIGNALS = {}
+
+
+def indicator(name):
+    """
+    Registers fn(ctx, *params) -> array as indicator `name`.
+    """
+    def decorator(fn):
+        INDICATORS[name] = fn
+        return fn
+    return decorator
+
+
+def signal(name):
+    """
+    Registers fn(ctx) -> dict or None as signal `name`.
+    """
+    def decorator(fn):
+        SIGNALS[name] = fn
+        return fn
+    return decorator
+
+
+class IndicatorContext:
+    """
+    One ticker's price arrays plus a memo of every indicator computed from them.
+    """
+
+    def __init__(self, ticker, arrays):
+        self.ticker = ticker
+        self.arrays = arrays
+        self.dates = arrays["Date"]
+        self._memo = {}
+
+    def __len__(self):
+        return len(self.dates)
+
+    def column(self, name):
+        return self.get("column", name)
+
+    def get(self, name, *params):
+        key = (name, params)
+        if key not in self._memo:
+            self._memo[key] = INDICATORS[name](self, *params)
+        return self._memo[key]
+
+    def date(self, i):
+        return str(pd.Timestamp(int(self.dates[i]), unit="ns").date())
+
+
+def frame_arrays(df):
+    """
+    {"Date": int64 ns, column: values} for a Date-indexed frame, the layout of PriceStore.read_columns.
+    """
+    return {"Date": pd.DatetimeIndex(df.index).as_unit("ns").asi8, **{col: df[col].to_numpy() for col in df.columns}}
+
+
+def _ewm(values, **kwargs):
+    return pd.Series(values).ewm(adjust=False, **kwargs).mean().to_numpy()
+
+
+# ----------------- Indicators -----------------
+@indicator("column")
+def _column(ctx, name):
+    return np.asarray(ctx.arrays[name], dtype=float)
+
+
+@indicator("cumsum")
+def _cumsum(ctx, column="Close"):
+    return np.concatenate([[0.0], np.cumsum(ctx.column(column))])
+
+
+@indicator("sma")
+def _sma(ctx, window, column="Close"):
+    # every SMA of a column shares one running sum
+    total = ctx.get("cumsum", column)
+    out = np.full(len(ctx), np.nan)
+    if len(ctx) >= window:
+        out[window - 1:] = (total[window:] - total[:-window]) / window
+    return out
+
+
+@indicator("ema")
+def _ema(ctx, span, column="Close"):
+    # arrays from the EMA store carry the incrementally maintained EMAs of Close
+    if column == "Close" and f"EMA{span}" in ctx.arrays:
+        return ctx.column(f"EMA{span}")
+    return _ewm(ctx.column(column), span=span)
+
+
+@indicator("diff")
+def _diff(ctx, column="Close"):
+    return np.diff(ctx.column(column), prepend=np.nan)
+
+
+@indicator("rsi")
+def _rsi(ctx, period=14):
+    delta = ctx.get("diff")
+    gain = _ewm(np.clip(delta, 0, None), alpha=1 / period)
+    loss = _ewm(np.clip(-delta, 0, None), alpha=1 / period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return 100 - 100 / (1 + gain / loss)
+
+
+@indicator("macd")
+def _macd(ctx, fast=12, slow=26):
+    return ctx.get("ema", fast) - ctx.get("ema", slow)
+
+
+@indicator("macd_signal")
+def _macd_signal(ctx, fast=12, slow=26, span=9):
+    return _ewm(ctx.get("macd", fast, slow), span=span)
+
+
+@indicator("true_range")
+def _true_range(ctx):
+    high, low = ctx.column("High"), ctx.column("Low")
+    prev_close = np.concatenate([[np.nan], ctx.column("Close")[:-1]])
+    return np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+
+
+@indicator("atr")
+def _atr(ctx, period=14):
+    return _ewm(ctx.get("true_range"), alpha=1 / period)
+
+
+@indicator("rolling_high")
+def _rolling_high(ctx, window, column="Close"):
+    return pd.Series(ctx.column(column)).rolling(window, min_periods=1).max().to_numpy()
+
+
+@indicator("rolling_low")
+def _rolling_low(ctx, window, column="Close"):
+    return pd.Series(ctx.column(column)).rolling(window, min_periods=1).min().to_numpy()
+
+
+@indicator("volume_ratio")
+def _volume_ratio(ctx, window=20):
+    # today's volume against the average of the previous `window` days
+    average = ctx.get("sma", window, "Volume")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return ctx.column("Volume")[1:] / average[:-1]
+
+
+# ----------------- Signals -----------------
+@signal("ema_crossover")
+def ema_crossover(ctx, lookback=LOOKBACK, band=PCT_BAND):
+    """
+    Same rule as get_ema_signals: EMA20 crosses EMA50 with EMA50 > EMA200 in the
+    last `lookback` bars and the close now 5-10% above the crossover close.
+    Returns the same fields as get_ema_signals.
+    """
+    if len(ctx) < MIN_BARS:
+        return None
+    n = lookback + 1
+    close, ema20, ema50, ema200 = (a[None, -n:] for a in (
+        ctx.column("Close"), ctx.get("ema", 20), ctx.get("ema", 50), ctx.get("ema", 200)))
+    first, pct = find_crossovers(close, ema20, ema50, ema200, lookback, band)
+    if first[0] < 0:
+        return None
+    col = 1 + first[0]
+    return {
+        "CrossoverDate": ctx.date(len(ctx) - n + col),
+        "CrossoverPrice": round(close[0, col], 2),
+        "CurrentPrice": round(close[0, -1], 2),
+        "PctAbove": pct[0, first[0]],
+        "EMA20": ema20[0, col],
+        "EMA50": ema50[0, col],
+        "EMA200": ema200[0, col],
+    }
+
+
+@signal("sma_crossover")
+def sma_crossover(ctx, lookback=10, min_gap=3):
+    """
+    The sma_alert.py rule: SMA20 crosses SMA50 within the last 10 bars while
+    SMA50 > SMA200, with SMA20 at least 3% above SMA50 on the crossover bar.
+    """
+    if len(ctx) < 200:
+        return None
+    sma20, sma50, sma200 = (ctx.get("sma", w)[-lookback - 1:] for w in (20, 50, 200))
+    with np.errstate(invalid="ignore"):
+        crossed = (sma20[:-1] <= sma50[:-1]) & (sma20[1:] > sma50[1:])
+        gap = (sma20[1:] - sma50[1:]) / sma50[1:] * 100
+        hits = np.flatnonzero(crossed & (sma50[1:] > sma200[1:]) & (gap >= min_gap))
+    if not len(hits):
+        return None
+    i = len(ctx) - lookback + hits[0]
+    return {"CrossoverDate": ctx.date(i), "SMA20": sma20[1 + hits[0]], "SMA50": sma50[1 + hits[0]],
+            "SMA200": sma200[1 + hits[0]]}
+
+
+@signal("new_high")
+def new_high(ctx, window=HIGH_WINDOWS["52w"]):
+    close = ctx.column("Close")
+    if is_new_high(close[None], window)[0]:
+        return {"Close": round(close[-1], 2), "HighDate": ctx.date(-1)}
+    return None
+
+
+@signal("new_low")
+def new_low(ctx, window=HIGH_WINDOWS["52w"]):
+    close = ctx.column("Close")
+    if close[-1] <= ctx.get("rolling_low", window)[-1]:
+        return {"Close": round(close[-1], 2), "LowDate": ctx.date(-1)}
+    return None
+
+
+@signal("rsi_extreme")
+def rsi_extreme(ctx, period=14, low=30, high=70):
+    rsi = ctx.get("rsi", period)[-1]
+    if rsi < low or rsi > high:
+        return {"RSI": round(rsi, 2), "State": "oversold" if rsi < low else "overbought"}
+    return None
+
+
+@signal("macd_cross")
+def macd_cross(ctx):
+    macd, signal_line = ctx.get("macd", 12, 26)[-2:], ctx.get("macd_signal", 12, 26, 9)[-2:]
+    if len(macd) < 2:
+        return None
+    if macd[0] <= signal_line[0] and macd[1] > signal_line[1]:
+        return {"Direction": "bullish", "MACD": round(macd[1], 4)}
+    if macd[0] >= signal_line[0] and macd[1] < signal_line[1]:
+        return {"Direction": "bearish", "MACD": round(macd[1], 4)}
+    return None
+
+
+@signal("volume_surge")
+def volume_surge(ctx, window=20, ratio=2.0):
+    if len(ctx) <= window:
+        return None
+    today = ctx.get("volume_ratio", window)[-1]
+    if today >= ratio:
+        return {"VolumeRatio": round(today, 2), "ATR": round(ctx.get("atr")[-1], 4)}
+    return None
+
+
+# ----------------- Fused evaluation -----------------
+def evaluate(ticker, arrays, signals=None):
+    """
+    Runs the named signals (default: all registered) on one ticker's price arrays
+    in a single context. Returns {signal: result dict} for the signals that fired.
+    """
+    ctx = IndicatorContext(ticker, arrays)
+    if len(ctx) == 0:
+        return {}
+    fired = {}
+    for name in signals or SIGNALS:
+        result = SIGNALS[name](ctx)
+        if result:
+            fired[name] = {"ticker": ticker, **result}
+    return fired
+
+
+def scan_universe(tickers=None, signals=None, store=HISTORY_STORE):
+    """
+    Evaluates signals over the cached universe, reading each ticker's arrays once.
+    Returns {signal: [result dicts in ticker order]}.
+    """
+    tickers = tickers if tickers is not None else store.tickers()
+    results = {name: [] for name in signals or SIGNALS}
+    for ticker in tickers:
+        arrays = store.read_columns(ticker)
+        if arrays is None:
+            continue
+        for name, result in evaluate(ticker, arrays, signals).items():
+            results[name].append(result)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run registered screens over the cached price store")
+    parser.add_argument("--signals", help=f"comma-separated, from: {', '.join(SIGNALS)} (default: all)")
+    args = parser.parse_args()
+
+    names = args.signals.split(",") if args.signals else None
+    for name, hits in scan_universe(signals=names).items():
+        print(f"📋 {name}: {len(hits)}")
+        for hit in hits:
+            print(f"  {hit}")
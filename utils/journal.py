@@ -0,0 +1,86 @@
+import json
+import os
+import threading
+from datetime import date
+from pathlib import Path
+
+
+class RunJournal:
+    """
+    Append-only JSONL log of a scan, written as each ticker finishes, so a run that dies
+    halfway can be resumed. The first line is a header with the run date and universe;
+    each following line records one ticker's completed stages and results, and a final
+    {"complete": true} line marks a finished run. Lines are flushed and fsynced as they
+    are written; a torn last line from a crash is ignored on load.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.run_date = None
+        self.tickers = []
+        self.entries = {}
+        self.complete = False
+        self._file = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if not self.path.exists():
+            return False
+        with open(self.path) as f:
+            lines = f.read().splitlines()
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                break
+            if "run" in record:
+                self.run_date, self.tickers = record["run"], record["tickers"]
+            elif record.get("complete"):
+                self.complete = True
+            else:
+                self.entries[record["ticker"]] = record
+        return self.run_date is not None
+
+    def _write(self, record):
+        with self._lock:
+            self._file.write(json.dumps(record, default=str) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def start(self, tickers, resume=False):
+        """
+        Opens the journal for this run. With `resume`, today's journal is kept and its
+        finished tickers are returned; otherwise (or if it is from another day) a new one
+        is started. Returns {ticker: entry} for tickers that can be skipped.
+        """
+        today = date.today().isoformat()
+        if resume and self._load() and self.run_date == today:
+            print(f"⏯️ [journal.py] Resuming {self.path}: {len(self.entries)} of {len(self.tickers)} tickers done")
+            self._file = open(self.path, "a")
+            return dict(self.entries)
+
+        if resume:
+            print(f"⚠️ [journal.py] No journal from today in {self.path}; starting a fresh run")
+        self.run_date, self.tickers, self.entries, self.complete = today, list(tickers), {}, False
+        self._file = open(self.path, "w")
+        self._write({"run": today, "tickers": self.tickers})
+        return {}
+
+    def record(self, ticker, stages, **results):
+        """
+        Logs a finished ticker. Results must be JSON-serializable (dates are stored as strings).
+        """
+        entry = {"ticker": ticker, "stages": list(stages), **results}
+        self._write(entry)
+        with self._lock:
+            self.entries[ticker] = json.loads(json.dumps(entry, default=str))
+
+    def finish(self):
+        self._write({"complete": True})
+        self.complete = True
+        self.close()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -1,66 +1,176 @@
 import os
+import threading
 import pandas as pd
+from config import SMA_LEDGER_FILE, HIGHS_LEDGER_FILE
 
-# ----------------- Ledger Files -----------------
-SMA_LEDGER_FILE = "ledger.csv"
-HIGHS_LEDGER_FILE = "highs_ledger.csv"
+# ----------------- Ledger Schemas -----------------
+LEDGER_SCHEMAS = {
+    SMA_LEDGER_FILE: (['Ticker', 'SMA20', 'SMA50', 'SMA200', 'CrossoverDate'], 'CrossoverDate'),
+    HIGHS_LEDGER_FILE: (["Ticker", "Company", "Close", "HighDate"], "HighDate"),
+}
 
 # ----------------- Load & Save Ledger -----------------
 def load_ledger(file):
+    columns, date_column = LEDGER_SCHEMAS[file]
     if os.path.exists(file):
-        return pd.read_csv(
-            file,
-            parse_dates=['CrossoverDate'] if 'ledger' in file else ['HighDate']
-        )
+        df = pd.read_csv(file).reindex(columns=columns)
+        df[date_column] = pd.to_datetime(df[date_column], errors="coerce", format="mixed")
+        return df
     else:
-        if 'ledger' in file:
-            return pd.DataFrame(columns=['Ticker', 'SMA20', 'SMA50', 'SMA200', 'CrossoverDate'])
-        else:
-            return pd.DataFrame(columns=["Ticker", "Company", "Close", "HighDate"])
+        return pd.DataFrame(columns=columns)
 
 def save_ledger(df, file):
-    df.to_csv(file, index=False)
+    # Write-then-rename so a crash never leaves a half-written ledger
+    tmp_file = f"{file}.tmp"
+    df.to_csv(tmp_file, index=False)
+    os.replace(tmp_file, file)
+
+
+class Ledger:
+    """
+    In-memory ledger keyed by Ticker.
+    The CSV is read once; upserts and removals are staged in memory and written
+    atomically by commit(), normally once at the end of a scan. Staged changes are
+    also kept as per-ticker operations, so commit() can replay them on the current file
+    instead of overwriting what another process committed in the meantime.
+    """
+
+    def __init__(self, file):
+        self.file = file
+        self.columns, self.date_column = LEDGER_SCHEMAS[file]
+        self._rows = None
+        self._changes = {}  # ticker -> ("upsert" | "add", row) or ("remove", None), in staging order
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._rows is None:
+            df = load_ledger(self.file)
+            self._rows = {row["Ticker"]: row for row in df.to_dict("records")}
+        return self._rows
+
+    def __contains__(self, ticker):
+        with self._lock:
+            return ticker in self._load()
+
+    def get(self, ticker):
+        with self._lock:
+            return self._load().get(ticker)
+
+    def upsert(self, ticker, row):
+        with self._lock:
+            row = {col: row.get(col) for col in self.columns} | {"Ticker": ticker}
+            self._load()[ticker] = row
+            self._changes[ticker] = ("upsert", row)
+
+    def add(self, ticker, row):
+        """
+        Inserts a row only if the ticker is not recorded yet. Returns True if inserted.
+        """
+        with self._lock:
+            if ticker in self._load():
+                return False
+            row = {col: row.get(col) for col in self.columns} | {"Ticker": ticker}
+            self._rows[ticker] = row
+            # re-adding a ticker removed in this session replaces whatever the file holds
+            self._changes[ticker] = ("upsert" if ticker in self._changes else "add", row)
+            return True
+
+    def remove(self, ticker):
+        with self._lock:
+            if self._load().pop(ticker, None) is not None:
+                self._changes[ticker] = ("remove", None)
+
+    def to_frame(self):
+        with self._lock:
+            df = pd.DataFrame(list(self._load().values()), columns=self.columns)
+        df[self.date_column] = pd.to_datetime(df[self.date_column], errors="coerce", format="mixed")
+        return df
+
+    def since(self, date):
+        """
+        Entries whose date column is on or after `date`.
+        """
+        df = self.to_frame()
+        return df[df[self.date_column] >= pd.Timestamp(date)].reset_index(drop=True)
+
+    def commit(self):
+        """
+        Writes staged changes to the CSV in one atomic replace. No-op when nothing changed.
+        The file is re-read first and the staged operations are applied on top of it, so rows
+        committed by another process since this ledger was loaded are kept (an `add` still
+        leaves an existing row alone). Rows are ordered by date then ticker, so the file
+        doesn't depend on worker timing.
+        """
+        with self._lock:
+            if not self._changes:
+                return False
+            rows = {row["Ticker"]: row for row in load_ledger(self.file).to_dict("records")}
+            for ticker, (op, row) in self._changes.items():
+                if op == "remove":
+                    rows.pop(ticker, None)
+                elif op == "upsert" or ticker not in rows:
+                    rows[ticker] = row
+            df = pd.DataFrame(list(rows.values()), columns=self.columns)
+            df[self.date_column] = pd.to_datetime(df[self.date_column], errors="coerce", format="mixed")
+            df = df.sort_values([self.date_column, "Ticker"], kind="stable", ignore_index=True)
+            save_ledger(df, self.file)
+            self._rows = {row["Ticker"]: row for row in df.to_dict("records")}
+            self._changes = {}
+        return True
+
+    def rollback(self):
+        """
+        Discards staged changes; the next access reloads the CSV.
+        """
+        with self._lock:
+            self._rows = None
+            self._changes = {}
+
+    def export_csv(self, path):
+        self.to_frame().to_csv(path, index=False)
+
+
+SMA_LEDGER = Ledger(SMA_LEDGER_FILE)
+HIGHS_LEDGER = Ledger(HIGHS_LEDGER_FILE)
+
+
+def commit_ledgers():
+    """
+    Flushes every ledger touched during the run.
+    """
+    for ledger in (SMA_LEDGER, HIGHS_LEDGER):
+        if ledger.commit():
+            print(f"💾 [ledger_utils.py] Committed {ledger.file}")
 
 # ----------------- SMA Ledger -----------------
 def update_sma_ledger(ticker, crossover_info):
-    ledger = load_ledger(SMA_LEDGER_FILE)
-
+    """
+    Stages the ticker's SMA crossover in SMA_LEDGER (removing it once SMA20 drops below SMA50).
+    Returns SMA_LEDGER; the change reaches the CSV on its next commit().
+    """
     # Remove entry if SMA20 dropped below SMA50
-    if ticker in ledger['Ticker'].values:
-        existing = ledger[ledger['Ticker'] == ticker].iloc[0]
+    if ticker in SMA_LEDGER:
         if crossover_info['SMA20'] < crossover_info['SMA50']:
-            ledger = ledger[ledger['Ticker'] != ticker]
-            save_ledger(ledger, SMA_LEDGER_FILE)
-        return ledger
+            SMA_LEDGER.remove(ticker)
+        return SMA_LEDGER
 
-    new_row = {
-        "Ticker": ticker,
+    SMA_LEDGER.add(ticker, {
         "SMA20": crossover_info['SMA20'],
         "SMA50": crossover_info['SMA50'],
         "SMA200": crossover_info['SMA200'],
         "CrossoverDate": crossover_info['CrossoverDate']
-    }
-
-    new_df = pd.DataFrame([new_row]).dropna(axis=1, how='all')
-    ledger = pd.concat([ledger, new_df], ignore_index=True)
-    save_ledger(ledger, SMA_LEDGER_FILE)
-    return ledger
+    })
+    return SMA_LEDGER
 
 # ----------------- Highs Ledger -----------------
 def update_highs_ledger(ticker, company, close, date):
-    highs_ledger = load_ledger(HIGHS_LEDGER_FILE)
-
-    if ticker in highs_ledger["Ticker"].values:
-        return highs_ledger  # already recorded
-
-    new_row = {
-        "Ticker": ticker,
+    """
+    Stages a new high in HIGHS_LEDGER unless the ticker is already recorded.
+    Returns HIGHS_LEDGER; the change reaches the CSV on its next commit().
+    """
+    HIGHS_LEDGER.add(ticker, {
         "Company": company,
         "Close": close,
         "HighDate": date
-    }
-
-    new_df = pd.DataFrame([new_row]).dropna(axis=1, how="all")
-    highs_ledger = pd.concat([highs_ledger, new_df], ignore_index=True)
-    save_ledger(highs_ledger, HIGHS_LEDGER_FILE)
-    return highs_ledger
+    })  # no-op if already recorded
+    return HIGHS_LEDGER
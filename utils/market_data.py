@@ -1,41 +1,59 @@
-from pathlib import Path
 import pandas as pd
-import yfinance as yf
-from utils.historical_data import download_historical
-
-HISTORICAL_FOLDER = Path("historical_data")
+from utils.historical_data import download_historical, is_stale, refresh_historical
+from utils.price_store import HISTORY_STORE, migrate_ticker
+from utils.metadata import METADATA
+from utils import metrics
+from utils.data_context import active_context
+from utils.retry import is_transient
 
 def get_market_cap(ticker):
     """
-    Retrieves market capitalization from yfinance safely.
+    Retrieves market capitalization from the metadata cache (refreshed from yfinance weekly).
+    Transient provider errors are raised so the scan can requeue the ticker.
     """
     try:
-        info = yf.Ticker(ticker).info
-        if not info:
-            print(f"⚠️ [market_data.py] No info returned for {ticker}")
-            return 0
-        market_cap = info.get("marketCap", 0)
+        market_cap = METADATA.get(ticker, "marketCap", 0)
         if isinstance(market_cap, pd.Series):
             market_cap = market_cap.iloc[-1]
         return float(market_cap or 0)
     except Exception as e:
+        if is_transient(e):
+            raise
         print(f"⚠️ [market_data.py] Error getting market cap for {ticker}: {e}")
         return 0
 
 
 def get_historical_data(ticker):
     """
-    Loads cached historical data for a ticker if available; downloads if missing.
+    Loads cached historical data for a ticker, appending any missing bars first; downloads if missing.
+    Inside a scan the frame comes from the active DataContext, so every stage shares one load.
     """
+    context = active_context()
+    if context is not None:
+        return context.get(ticker, _load_historical)
+    return _load_historical(ticker)
+
+
+def _load_historical(ticker):
     try:
-        file_path = HISTORICAL_FOLDER / f"{ticker}.csv"
-        if file_path.exists():
-            df = pd.read_csv(file_path, index_col=0, parse_dates=True)
-            df['Close'] = pd.to_numeric(df['Close'], errors='coerce')
+        if not HISTORY_STORE.exists(ticker):
+            migrate_ticker(ticker)
+        if HISTORY_STORE.exists(ticker):
+            # counted after the freshness check: a delta-refreshed ticker is not a cache hit
+            if is_stale(ticker):
+                metrics.incr("history_delta_refreshes")
+                refresh_historical(ticker)
+            else:
+                metrics.incr("history_cache_hits")
+            df = HISTORY_STORE.read(ticker)
             df = df.dropna(subset=['Close'])
             return df
         else:
-            return download_historical(ticker)
+            metrics.incr("history_cache_misses")
+            with metrics.timer("history_download"):
+                return download_historical(ticker)
     except Exception as e:
+        if is_transient(e):
+            raise
         print(f"⚠️ [market_data.py] Error loading historical for {ticker}: {e}")
         return pd.DataFrame()
@@ -0,0 +1,119 @@
+import json
+import os
+import threading
+from datetime import date, timedelta
+from pathlib import Path
+from config import METADATA_CACHE_FILE, SCAN_WORKERS
+from utils import metrics
+from utils.providers import get_provider
+from utils.retry import ProviderDownError, RetryScheduler, is_transient
+
+# How long each cached .info field stays valid. One .info call refreshes every field,
+# so the shortest TTL sets the call rate (about once per ticker per week).
+FIELD_TTLS = {
+    "marketCap": timedelta(days=7),
+    "shortName": timedelta(days=90),
+    "sector": timedelta(days=90),
+    "industry": timedelta(days=90),
+    "exchange": timedelta(days=90),
+    "currency": timedelta(days=90),
+}
+
+# An empty or failed (non-transient) .info answer, e.g. for a delisted name, is cached as
+# such for this long, so a dead ticker costs one call per period instead of several per run
+EMPTY_INFO_TTL = timedelta(days=7)
+
+
+class MetadataCache:
+    """
+    On-disk cache of ticker metadata from the provider's .info endpoint.
+    Stored as {ticker: {field: {"value": ..., "at": "YYYY-MM-DD"}}}; each field expires
+    after its own TTL. Fields of an empty answer carry "empty": true and expire after
+    EMPTY_INFO_TTL at the latest. Call save() once the run is done to persist refreshed entries.
+    """
+
+    def __init__(self, path, ttls=FIELD_TTLS):
+        self.path = Path(path)
+        self.ttls = ttls
+        self._entries = None
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._entries is None:
+            self._entries = json.loads(self.path.read_text()) if self.path.exists() else {}
+        return self._entries
+
+    def is_fresh(self, ticker, field, today=None):
+        today = today or date.today()
+        with self._lock:
+            cached = self._load().get(ticker, {}).get(field)
+        if cached is None:
+            return False
+        ttl = self.ttls.get(field, timedelta(0))
+        if cached.get("empty"):
+            ttl = min(ttl, EMPTY_INFO_TTL)
+        return today - date.fromisoformat(cached["at"]) < ttl
+
+    def refresh(self, ticker):
+        """
+        Fetches .info once and stores every tracked field. Transient errors are raised for
+        the caller to retry; an empty answer or any other error is cached as empty.
+        """
+        try:
+            info = get_provider().info(ticker)
+        except Exception as e:
+            if is_transient(e) or isinstance(e, ProviderDownError):
+                raise
+            print(f"⚠️ [metadata.py] No info for {ticker}: {e}")
+            info = {}
+        today = date.today().isoformat()
+        entry = {field: {"value": info.get(field), "at": today} for field in self.ttls}
+        if not info:
+            for cached in entry.values():
+                cached["empty"] = True
+        with self._lock:
+            self._load()[ticker] = entry
+            self._dirty = True
+        return info
+
+    def get(self, ticker, field, default=None):
+        """
+        Returns a cached field, refreshing the ticker first if that field has expired.
+        """
+        if self.is_fresh(ticker, field):
+            metrics.incr("metadata_cache_hits")
+        else:
+            metrics.incr("metadata_cache_misses")
+            self.refresh(ticker)
+        with self._lock:
+            value = self._load()[ticker][field]["value"]
+        return default if value is None else value
+
+    def refresh_many(self, tickers, workers=SCAN_WORKERS, force=False):
+        """
+        Bulk-refreshes every ticker with at least one expired field, then saves.
+        Returns {ticker: exception} for the tickers that could not be refreshed (transient
+        failures, or ProviderDownError once the breaker opened).
+        """
+        stale = [t for t in tickers if force or not all(self.is_fresh(t, f) for f in self.ttls)]
+        failed = {}
+        if stale:
+            print(f"🗂️ [metadata.py] Refreshing metadata for {len(stale)} of {len(tickers)} tickers")
+            _, failed = RetryScheduler(workers).run(stale, self.refresh)
+            for ticker, e in failed.items():
+                print(f"⚠️ [metadata.py] Could not refresh metadata for {ticker}: {e}")
+        self.save()
+        return failed
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+            tmp_path.write_text(json.dumps(self._entries, indent=1, sort_keys=True))
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+
+
+METADATA = MetadataCache(METADATA_CACHE_FILE)
@@ -0,0 +1,99 @@
+import json
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import wraps
+
+# Timers are summed across threads, so a stage run by 8 workers can exceed wall time
+_timers = defaultdict(lambda: {"count": 0, "seconds": 0.0})
+_counters = defaultdict(int)
+_lock = threading.Lock()
+_started = time.perf_counter()
+
+
+@contextmanager
+def timer(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        with _lock:
+            _timers[stage]["count"] += 1
+            _timers[stage]["seconds"] += elapsed
+
+
+def timed(stage):
+    """
+    Decorator form of timer().
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timer(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def incr(counter, n=1):
+    with _lock:
+        _counters[counter] += n
+
+
+def _ratio(hits, misses):
+    total = hits + misses
+    return round(hits / total, 4) if total else None
+
+
+def snapshot():
+    """
+    Current metrics as a plain dict: stage timers, raw counters and derived ratios.
+    """
+    with _lock:
+        timers = {k: {"count": v["count"], "seconds": round(v["seconds"], 4)} for k, v in _timers.items()}
+        counters = dict(_counters)
+    return {
+        "wall_seconds": round(time.perf_counter() - _started, 4),
+        "stages": dict(sorted(timers.items())),
+        "counters": dict(sorted(counters.items())),
+        "derived": {
+            "network_calls": sum(v for k, v in counters.items() if k.startswith("network_calls.")),
+            # a delta refresh had to go to the provider, so it counts against the hit ratio
+            "history_cache_hit_ratio": _ratio(counters.get("history_cache_hits", 0),
+                                              counters.get("history_cache_misses", 0)
+                                              + counters.get("history_delta_refreshes", 0)),
+            "metadata_cache_hit_ratio": _ratio(counters.get("metadata_cache_hits", 0),
+                                               counters.get("metadata_cache_misses", 0)),
+        },
+    }
+
+
+def write_report(path):
+    report = snapshot()
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def print_report(report=None):
+    report = report or snapshot()
+    print(f"⏱️ Run metrics ({report['wall_seconds']:.1f}s wall)")
+    for stage, t in report["stages"].items():
+        print(f"  {stage:<20} {t['seconds']:>9.3f}s  x{t['count']}")
+    for name, value in report["counters"].items():
+        print(f"  {name:<28} {value}")
+    for name, value in report["derived"].items():
+        if isinstance(value, float):
+            print(f"  {name:<28} {value:.1%}")
+        elif value is not None:
+            print(f"  {name:<28} {value}")
+
+
+def reset():
+    global _started
+    with _lock:
+        _timers.clear()
+        _counters.clear()
+        _started = time.perf_counter()
@@ -0,0 +1,221 @@
+"""
+Compact date-aligned panels for universe-wide evaluation.
+
+A Panel holds only the requested columns as float32 (tickers × dates) arrays on one
+shared int64 date axis, NaN where a ticker has no bar, filled straight from the price
+store memory maps (no per-ticker DataFrames). iter_panels streams a universe through
+in chunks sized to a memory budget, so peak memory depends on the budget and the
+history length, not on how many tickers are scanned.
+
+Signals are evaluated on each ticker's own bars: EMAs skip the NaN gaps of the shared
+axis and windows are the last N valid bars per row, as in the per-ticker scan. The only
+difference is float32 closes, which can flip a crossover or band edge on an exact tie.
+
+    python -m utils.panel --budget-mb 256
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from config import PANEL_BUDGET_MB
+from utils.ema_signals import LOOKBACK, MIN_BARS, PCT_BAND, find_crossovers
+from utils.ema_utils import EMA_PERIODS
+from utils.highs import HIGH_WINDOWS, is_new_high
+from utils.price_store import HISTORY_STORE
+
+PANEL_DTYPE = np.float32
+
+# Evaluation temporaries per panel cell on top of the columns themselves: the float64
+# ewm input/output of one span, an int32 rank and the validity mask
+WORK_BYTES_PER_CELL = 21
+
+
+class Panel:
+    """
+    `tickers` × `dates` (int64 ns) arrays for each requested column, in PANEL_DTYPE.
+    """
+
+    def __init__(self, tickers, dates, columns):
+        self.tickers = tickers
+        self.dates = dates
+        self.columns = columns
+
+    def __getitem__(self, column):
+        return self.columns[column]
+
+    def __len__(self):
+        return len(self.tickers)
+
+    @property
+    def nbytes(self):
+        return self.dates.nbytes + sum(values.nbytes for values in self.columns.values())
+
+    def date(self, position):
+        return str(pd.Timestamp(int(self.dates[position]), unit="ns").date())
+
+    def valid(self, column="Close"):
+        return ~np.isnan(self.columns[column])
+
+    def tail(self, column, n):
+        """
+        Each row's last `n` valid values, right-aligned as float64 (see tail_of).
+        """
+        return tail_of(self.columns[column], self.valid(column), n)
+
+
+def tail_of(values, valid, n):
+    """
+    Gathers each row's last `n` valid entries into a right-aligned (rows × n) float64
+    array, NaN-padded on the left, plus their date positions (-1 for padding).
+    """
+    rows = len(values)
+    rank = valid.sum(axis=1, dtype=np.int32)[:, None] - np.cumsum(valid, axis=1, dtype=np.int32)
+    row, col = np.nonzero(valid & (rank < n))
+    slot = n - 1 - rank[row, col]
+    out = np.full((rows, n), np.nan)
+    positions = np.full((rows, n), -1, dtype=np.int64)
+    out[row, slot] = values[row, col]
+    positions[row, slot] = col
+    return out, positions
+
+
+def build_panel(tickers, columns=("Close",), store=HISTORY_STORE, start=None):
+    """
+    Loads `tickers` into one Panel on the union of their dates (from `start` if given).
+    Tickers missing from the store are left out.
+    """
+    universe = store.read_universe(tickers, columns)
+    if start is not None:
+        start = pd.Timestamp(start).value
+        for arrays in universe.values():
+            first = np.searchsorted(arrays["Date"], start)
+            for key in arrays:
+                arrays[key] = arrays[key][first:]
+    names = [t for t in universe if len(universe[t]["Date"])]
+    dates = (np.unique(np.concatenate([universe[t]["Date"] for t in names])) if names
+             else np.empty(0, dtype=np.int64))
+
+    values = {col: np.full((len(names), len(dates)), np.nan, dtype=PANEL_DTYPE) for col in columns}
+    for row, ticker in enumerate(names):
+        arrays = universe[ticker]
+        positions = np.searchsorted(dates, arrays["Date"])
+        for col in columns:
+            values[col][row, positions] = arrays[col]
+    return Panel(names, dates, values)
+
+
+def plan_chunks(tickers, columns=("Close",), budget_mb=PANEL_BUDGET_MB, store=HISTORY_STORE, start=None):
+    """
+    Splits `tickers` into consecutive chunks whose panels plus evaluation temporaries fit
+    the budget. A panel spans the union of its tickers' dates, so the union is tracked as
+    each chunk grows: tickers with staggered histories (IPOs, delistings, other calendars)
+    are sized by the axis they actually produce, not by the longest single history.
+    Tickers missing from the store are left out.
+    """
+    per_cell = np.dtype(PANEL_DTYPE).itemsize * len(columns) + WORK_BYTES_PER_CELL
+    budget = budget_mb * 2**20
+    start = pd.Timestamp(start).value if start is not None else None
+    chunk, dates = [], np.empty(0, dtype=np.int64)
+    for ticker in tickers:
+        ticker_dates = store.read_dates(ticker)
+        if start is not None:
+            ticker_dates = ticker_dates[np.searchsorted(ticker_dates, start):]
+        if not len(ticker_dates):
+            continue
+        union = np.union1d(dates, ticker_dates)
+        if chunk and (len(chunk) + 1) * len(union) * per_cell > budget:
+            yield chunk
+            chunk, union = [], np.asarray(ticker_dates)
+        chunk.append(ticker)
+        dates = union
+    if chunk:
+        yield chunk
+
+
+def iter_panels(tickers=None, columns=("Close",), budget_mb=PANEL_BUDGET_MB, store=HISTORY_STORE, start=None):
+    """
+    Yields consecutive Panels covering `tickers` (default: the whole store) within `budget_mb`.
+    """
+    tickers = store.tickers() if tickers is None else list(tickers)
+    for chunk in plan_chunks(tickers, columns, budget_mb, store, start):
+        yield build_panel(chunk, columns, store, start)
+
+
+def ema_tail(close, valid, span, n):
+    """
+    Last `n` valid-bar values of ewm(span, adjust=False) over each row's own bars.
+    """
+    ema = pd.DataFrame(close.T).ewm(span=span, adjust=False, ignore_na=True).mean().to_numpy().T
+    return tail_of(ema, valid, n)[0]
+
+
+def ema_crossovers(panel, lookback=LOOKBACK, band=PCT_BAND):
+    """
+    get_ema_signals_bulk on a panel: the same signal dicts, in panel order.
+    """
+    close, valid = panel["Close"], panel.valid()
+    n = lookback + 1
+    close_tail, positions = tail_of(close, valid, n)
+    ema20, ema50, ema200 = (ema_tail(close, valid, span, n) for span in EMA_PERIODS)
+    first, pct = find_crossovers(close_tail, ema20, ema50, ema200, lookback, band)
+    first[valid.sum(axis=1) < MIN_BARS] = -1
+
+    signals = []
+    for row in np.flatnonzero(first >= 0):
+        col = 1 + first[row]
+        signals.append({
+            "ticker": panel.tickers[row],
+            "CrossoverDate": panel.date(positions[row, col]),
+            "CrossoverPrice": round(close_tail[row, col], 2),
+            "CurrentPrice": round(close_tail[row, -1], 2),
+            "PctAbove": pct[row, first[row]],
+            "EMA20": ema20[row, col],
+            "EMA50": ema50[row, col],
+            "EMA200": ema200[row, col],
+        })
+    return signals
+
+
+def new_highs(panel, window="52w"):
+    """
+    Tickers whose latest close is a new high for `window`, as {Ticker, Close, HighDate}.
+    """
+    bars = HIGH_WINDOWS[window]
+    close_tail, positions = panel.tail("Close", bars or len(panel.dates))
+    hits = is_new_high(close_tail, None)
+    return [{
+        "Ticker": panel.tickers[row],
+        "Close": round(close_tail[row, -1], 2),
+        "HighDate": panel.date(positions[row, -1]),
+    } for row in np.flatnonzero(hits)]
+
+
+def scan_panels(tickers=None, budget_mb=PANEL_BUDGET_MB, store=HISTORY_STORE, window="52w"):
+    """
+    Crossover and new-high scan over the stored universe, one budget-sized panel at a time.
+    Returns (ema_signals, new_highs) in ticker order.
+    """
+    ema_signals, highs = [], []
+    chunks, peak = 0, 0
+    started = time.monotonic()
+    for panel in iter_panels(tickers, ("Close",), budget_mb, store):
+        ema_signals.extend(ema_crossovers(panel))
+        highs.extend(new_highs(panel, window))
+        chunks, peak = chunks + 1, max(peak, panel.nbytes)
+    print(f"🧮 [panel.py] {chunks} panels (largest {peak / 2**20:.1f} MB) in {time.monotonic() - started:.1f}s")
+    return ema_signals, highs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Memory-bounded crossover and new-high scan of the price store")
+    parser.add_argument("--budget-mb", type=float, default=PANEL_BUDGET_MB)
+    parser.add_argument("--window", default="52w", choices=list(HIGH_WINDOWS))
+    args = parser.parse_args()
+
+    ema_signals, highs = scan_panels(budget_mb=args.budget_mb, window=args.window)
+    print(f"📈 EMA Crossovers: {len(ema_signals)}")
+    for s in ema_signals:
+        print(f"  {s['ticker']} - {s['PctAbove']}% above crossover (Crossed on {s['CrossoverDate']})")
+    print(f"🏆 New Highs: {len(highs)}")
+    for h in highs:
+        print(f"  {h['Ticker']} ${h['Close']} on {h['HighDate']}")
@@ -0,0 +1,203 @@
+import os
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from utils import metrics
+
+STORE_FOLDER = Path("price_store")
+HIGHS_STATE_FOLDER = STORE_FOLDER / "highs"  # per-ticker RollingHigh state (utils/highs.py)
+
+# Legacy per-ticker CSV caches, read only by the migration below
+LEGACY_HISTORY_FOLDER = Path("historical_data")
+LEGACY_EMA_FOLDER = Path("ema_data")
+
+PRICE_COLUMNS = ["Open", "High", "Low", "Close", "Adj Close", "Volume"]
+EMA_COLUMNS = ["Close", "EMA20", "EMA50", "EMA200"]
+
+
+class PriceStore:
+    """
+    Columnar binary store for daily series.
+    Each ticker is a directory holding one raw little-endian array per column
+    (`Date.i8` as int64 nanoseconds, `<column>.f8` as float64), so reads are plain
+    memory maps and appends only touch the end of each file. `Date` is always written
+    last and defines how many rows are valid.
+    """
+
+    def __init__(self, folder, columns):
+        self.folder = Path(folder)
+        self.columns = list(columns)
+        self.folder.mkdir(parents=True, exist_ok=True)
+
+    def _dir(self, ticker):
+        return self.folder / ticker
+
+    def _file(self, ticker, column):
+        return self._dir(ticker) / (f"{column}.i8" if column == "Date" else f"{column}.f8")
+
+    def exists(self, ticker):
+        return self._file(ticker, "Date").exists()
+
+    def tickers(self):
+        return sorted(p.name for p in self.folder.iterdir() if (p / "Date.i8").exists())
+
+    def rows(self, ticker):
+        file_path = self._file(ticker, "Date")
+        return file_path.stat().st_size // 8 if file_path.exists() else 0
+
+    def _map(self, ticker, column, dtype, n):
+        if n == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(self._file(ticker, column), dtype=dtype, mode="r", shape=(n,))
+
+    def signature(self, ticker):
+        """
+        (mtime_ns, size) of the Date file, which changes on every append or rewrite; None if not stored.
+        """
+        try:
+            stat = self._file(ticker, "Date").stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def last_date(self, ticker):
+        """
+        Date of the last stored row, or None. Memory-maps the Date column and touches only its last entry.
+        """
+        n = self.rows(ticker)
+        if n == 0:
+            return None
+        return pd.Timestamp(int(self._map(ticker, "Date", "<i8", n)[-1]), unit="ns")
+
+    def read_dates(self, ticker):
+        """
+        Zero-copy int64 ns Date column (empty if not stored).
+        """
+        n = self.rows(ticker)
+        metrics.incr("bytes_read", 8 * n)
+        return self._map(ticker, "Date", "<i8", n)
+
+    def read_columns(self, ticker, columns=None):
+        """
+        Zero-copy read: returns {"Date": int64 ns, column: float64} memory maps, or None.
+        """
+        n = self.rows(ticker)
+        if n == 0:
+            return None
+        arrays = {"Date": self._map(ticker, "Date", "<i8", n)}
+        for col in columns or self.columns:
+            arrays[col] = self._map(ticker, col, "<f8", n)
+        metrics.incr("bytes_read", 8 * n * len(arrays))
+        return arrays
+
+    def read(self, ticker, columns=None):
+        """
+        Loads a ticker as a DataFrame indexed by Date (empty if not stored).
+        """
+        arrays = self.read_columns(ticker, columns)
+        if arrays is None:
+            return pd.DataFrame()
+        index = pd.DatetimeIndex(np.asarray(arrays.pop("Date")).view("M8[ns]"), name="Date")
+        return pd.DataFrame(arrays, index=index)
+
+    def read_universe(self, tickers, columns=("Close",)):
+        """
+        Zero-copy read of many tickers: {ticker: {"Date": ..., column: ...}}; unknown tickers are skipped.
+        """
+        universe = {}
+        for ticker in tickers:
+            arrays = self.read_columns(ticker, columns)
+            if arrays is not None:
+                universe[ticker] = arrays
+        return universe
+
+    def _encode(self, df):
+        dates = pd.DatetimeIndex(df.index).as_unit("ns").asi8.astype("<i8")
+        values = {
+            col: (pd.to_numeric(df[col], errors="coerce") if col in df.columns else pd.Series(np.nan, index=df.index))
+            .to_numpy(dtype="<f8", na_value=np.nan)
+            for col in self.columns
+        }
+        return dates, values
+
+    def append(self, ticker, df):
+        """
+        Appends rows to the end of every column file.
+        Each column is first cut back to the row count `Date` defines, so bytes left by an
+        append that crashed before its `Date` write never shift later rows off their dates.
+        """
+        if df.empty:
+            return
+        self._dir(ticker).mkdir(parents=True, exist_ok=True)
+        dates, values = self._encode(df)
+        valid_bytes = self.rows(ticker) * 8
+        for col, arr in values.items():
+            file_path = self._file(ticker, col)
+            with open(file_path, "ab") as f:
+                if f.tell() != valid_bytes:
+                    f.truncate(valid_bytes)  # also zero-fills a column that came up short
+                f.write(arr.tobytes())
+        with open(self._file(ticker, "Date"), "ab") as f:
+            f.write(dates.tobytes())
+
+    def write(self, ticker, df):
+        """
+        Replaces a ticker's stored series with `df`.
+        """
+        self._dir(ticker).mkdir(parents=True, exist_ok=True)
+        dates, values = self._encode(df)
+        for col, arr in list(values.items()) + [("Date", dates)]:
+            file_path = self._file(ticker, col)
+            tmp_path = file_path.with_suffix(file_path.suffix + ".tmp")
+            tmp_path.write_bytes(arr.tobytes())
+            os.replace(tmp_path, file_path)
+
+    def delete(self, ticker):
+        directory = self._dir(ticker)
+        if directory.exists():
+            for file_path in directory.iterdir():
+                file_path.unlink()
+            directory.rmdir()
+
+
+HISTORY_STORE = PriceStore(STORE_FOLDER / "history", PRICE_COLUMNS)
+EMA_STORE = PriceStore(STORE_FOLDER / "ema", EMA_COLUMNS)
+
+
+def migrate_ticker(ticker):
+    """
+    Converts one ticker's legacy CSV caches into the binary stores (no-op once migrated).
+    """
+    migrated = False
+    csv_file = LEGACY_HISTORY_FOLDER / f"{ticker}.csv"
+    if csv_file.exists() and not HISTORY_STORE.exists(ticker):
+        df = pd.read_csv(csv_file, index_col=0, parse_dates=True)
+        df["Close"] = pd.to_numeric(df["Close"], errors="coerce")
+        HISTORY_STORE.write(ticker, df.dropna(subset=["Close"]).sort_index())
+        migrated = True
+
+    ema_file = LEGACY_EMA_FOLDER / f"{ticker}_ema.csv"
+    if ema_file.exists() and not EMA_STORE.exists(ticker):
+        EMA_STORE.write(ticker, pd.read_csv(ema_file, index_col=0, parse_dates=True))
+        migrated = True
+    return migrated
+
+
+def migrate_csv_caches():
+    """
+    One-shot migration of every legacy CSV cache into the binary stores.
+    """
+    tickers = {p.stem for p in LEGACY_HISTORY_FOLDER.glob("*.csv")}
+    tickers |= {p.name[: -len("_ema.csv")] for p in LEGACY_EMA_FOLDER.glob("*_ema.csv")}
+    count = 0
+    for ticker in sorted(tickers):
+        try:
+            count += migrate_ticker(ticker)
+        except Exception as e:
+            print(f"⚠️ [price_store.py] Could not migrate {ticker}: {e}")
+    print(f"✅ [price_store.py] Migrated {count} of {len(tickers)} tickers to {STORE_FOLDER}/")
+    return count
+
+
+if __name__ == "__main__":
+    migrate_csv_caches()
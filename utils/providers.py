@@ -0,0 +1,200 @@
+import json
+import threading
+import time
+import zlib
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import yfinance as yf
+from config import YAHOO_RATE_PER_SEC, YAHOO_BURST
+from utils import metrics
+from utils.rate_limiter import TokenBucket
+from utils.retry import TransientError
+
+# Shared by every Yahoo call in the process, whatever thread it comes from
+YAHOO_LIMITER = TokenBucket(YAHOO_RATE_PER_SEC, YAHOO_BURST)
+
+
+class DataProvider:
+    """
+    Interface every data provider implements.
+    info() returns a yfinance-style info dict; download() returns one ticker's OHLCV frame
+    with plain columns; download_many() returns (ticker, field) MultiIndex columns, leaving
+    out tickers it got no data for (whatever the reason).
+    """
+
+    def info(self, ticker):
+        raise NotImplementedError
+
+    def download(self, ticker, period="2y", interval="1d", start=None, **kwargs):
+        raise NotImplementedError
+
+    def download_many(self, tickers, period="2y", interval="1d", start=None, **kwargs):
+        frames = {t: self.download(t, period=period, interval=interval, start=start) for t in tickers}
+        return pd.concat(frames, axis=1) if frames else pd.DataFrame()
+
+
+class YahooProvider(DataProvider):
+    """
+    Live Yahoo Finance data provider. Every request goes through the shared rate limiter.
+    """
+
+    def __init__(self, limiter=None):
+        self.limiter = limiter or YAHOO_LIMITER
+
+    def info(self, ticker):
+        self.limiter.acquire()
+        metrics.incr("network_calls.info")
+        return yf.Ticker(ticker).info
+
+    def download(self, ticker, period="2y", interval="1d", start=None, **kwargs):
+        # yf.download keeps module-level state between calls and is not safe to
+        # run from several threads at once; Ticker.history is.
+        self.limiter.acquire()
+        metrics.incr("network_calls.download")
+        if start is not None:
+            data = yf.Ticker(ticker).history(start=start, interval=interval, auto_adjust=False)
+        else:
+            data = yf.Ticker(ticker).history(period=period, interval=interval, auto_adjust=False)
+        if not data.empty and data.index.tz is not None:
+            data.index = data.index.tz_localize(None)
+        return data.drop(columns=["Dividends", "Stock Splits", "Capital Gains"], errors="ignore")
+
+    def download_many(self, tickers, period="2y", interval="1d", start=None, **kwargs):
+        # One request for the whole chunk; only call this from a single thread.
+        self.limiter.acquire()
+        metrics.incr("network_calls.download_many")
+        span = {"start": start} if start is not None else {"period": period}
+        data = yf.download(
+            list(tickers),
+            interval=interval,
+            progress=False,
+            auto_adjust=False,
+            group_by="ticker",
+            **span,
+        )
+        return data
+
+
+class FakeProvider(DataProvider):
+    """
+    Offline provider returning deterministic random-walk prices per ticker.
+    `latency` (seconds) is slept on every call to mimic network round trips and
+    `error_rate` is the chance that a call fails with a simulated rate limit. With a
+    `limiter` (e.g. a TokenBucket like YAHOO_LIMITER) every call acquires a token first,
+    as YahooProvider does; `call_times` records when each call was let through.
+    """
+
+    ORIGIN = pd.Timestamp("2000-01-03")
+
+    def __init__(self, latency=0.0, market_cap=50_000_000_000, seed=0, error_rate=0.0, origin=ORIGIN,
+                 limiter=None):
+        self.latency = latency
+        self.market_cap = market_cap
+        self.seed = seed
+        self.error_rate = error_rate
+        self.dates = pd.bdate_range(origin, pd.Timestamp.today().normalize(), name="Date")
+        self.limiter = limiter
+        self.calls = 0
+        self.call_times = []
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+
+    def _sleep(self):
+        if self.limiter is not None:
+            self.limiter.acquire()
+        metrics.incr("network_calls.simulated")
+        with self._lock:
+            self.calls += 1
+            self.call_times.append(time.monotonic())
+            failed = self.error_rate and self._rng.random() < self.error_rate
+        if self.latency:
+            time.sleep(self.latency)
+        if failed:
+            raise TransientError("429 Too Many Requests (simulated)")
+
+    def _prices(self, ticker):
+        dates = self.dates
+        rng = np.random.default_rng(zlib.crc32(ticker.encode()) + self.seed)
+        close = 50 * np.exp(np.cumsum(rng.normal(0.0003, 0.02, len(dates))))
+        spread = np.abs(rng.normal(0, 0.01, len(dates))) * close
+        return pd.DataFrame(
+            {
+                "Open": close + rng.normal(0, 0.005, len(dates)) * close,
+                "High": close + spread,
+                "Low": close - spread,
+                "Close": close,
+                "Adj Close": close,
+                "Volume": rng.integers(100_000, 10_000_000, len(dates)).astype(float),
+            },
+            index=dates,
+        )
+
+    def info(self, ticker):
+        self._sleep()
+        return {"marketCap": self.market_cap, "shortName": f"{ticker} Corp"}
+
+    def _history(self, ticker, period, start):
+        data = self._prices(ticker)
+        if start is not None:
+            return data[data.index >= pd.Timestamp(start)]
+        if period == "max":
+            return data
+        unit = period.lstrip("0123456789")
+        n = int(period[: len(period) - len(unit)])
+        offset = {"y": pd.DateOffset(years=n), "mo": pd.DateOffset(months=n), "d": pd.DateOffset(days=n)}[unit]
+        return data[data.index > data.index[-1] - offset]
+
+    def download(self, ticker, period="2y", interval="1d", start=None, **kwargs):
+        self._sleep()
+        return self._history(ticker, period, start)
+
+    def download_many(self, tickers, period="2y", interval="1d", start=None, **kwargs):
+        # A single simulated round trip for the whole chunk
+        self._sleep()
+        return pd.concat({t: self._history(t, period, start) for t in tickers}, axis=1)
+
+
+class FixtureProvider(DataProvider):
+    """
+    Offline provider serving prices from local `<folder>/<TICKER>.csv` fixtures
+    and metadata from an optional `<folder>/info.json` ({ticker: info dict}).
+    Tickers without a fixture come back empty, like a failed download.
+    """
+
+    def __init__(self, folder):
+        self.folder = Path(folder)
+        info_file = self.folder / "info.json"
+        self._info = json.loads(info_file.read_text()) if info_file.exists() else {}
+
+    def info(self, ticker):
+        return self._info.get(ticker, {})
+
+    def download(self, ticker, period="2y", interval="1d", start=None, **kwargs):
+        file_path = self.folder / f"{ticker}.csv"
+        if not file_path.exists():
+            return pd.DataFrame()
+        data = pd.read_csv(file_path, index_col=0, parse_dates=True)
+        if start is not None:
+            data = data[data.index >= pd.Timestamp(start)]
+        return data
+
+    def download_many(self, tickers, period="2y", interval="1d", start=None, **kwargs):
+        frames = {t: self.download(t, period=period, interval=interval, start=start) for t in tickers}
+        frames = {t: f for t, f in frames.items() if not f.empty}
+        return pd.concat(frames, axis=1) if frames else pd.DataFrame()
+
+
+_provider = YahooProvider()
+
+
+def get_provider():
+    return _provider
+
+
+def set_provider(provider):
+    """
+    Swaps the data provider used by the whole pipeline (e.g. a FakeProvider for offline runs).
+    """
+    global _provider
+    _provider = provider
@@ -0,0 +1,307 @@
+"""
+Local HTTP/JSON query service over the precomputed signals.
+
+Queries are answered from in-memory indexes built from the stores and the ledgers:
+per ticker, the latest EMA state plus every crossover bar of the lookback window, so a
+band query only compares closes; the 52-week high bars of the recent stored history; and
+the ledgers as date-sorted rows. A background thread checks every QUERY_REFRESH_SECONDS
+for commits by the scan and reloads only what changed: tickers whose store signature
+moved, ledgers whose file changed.
+
+    python -m utils.query_service
+    GET /crossovers?min=5&max=10     tickers currently in the band above a crossover
+    GET /highs?days=5                new 52-week highs within N days of the latest stored bar
+    GET /ema/AAPL                    EMA state and recent crossovers for a ticker
+    GET /sma                         SMA ledger
+    GET /status                      index sizes and refresh times
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import numpy as np
+import pandas as pd
+from config import QUERY_HOST, QUERY_PORT, QUERY_REFRESH_SECONDS, HIGHS_LEDGER_FILE, SMA_LEDGER_FILE
+from utils.ema_signals import LOOKBACK, MIN_BARS, PCT_BAND, crossover_mask
+from utils.ema_utils import EMA_PERIODS, read_ema_window
+from utils.highs import HIGH_WINDOWS, new_high_mask
+from utils.ledger_utils import LEDGER_SCHEMAS, load_ledger
+from utils.price_store import EMA_STORE, HISTORY_STORE
+
+HIGH_WINDOW = HIGH_WINDOWS["52w"]
+HIGH_RECENT_BARS = 260  # stored bars whose new highs are indexed; bounds the /highs?days= reach
+
+
+def ema_entry(ticker, lookback=LOOKBACK):
+    """
+    Index entry for one ticker: the latest EMA row and the crossover bars
+    (EMA20 crossing above EMA50 with EMA50 > EMA200) among the last `lookback` bars.
+    """
+    df = read_ema_window(ticker)
+    if df.empty:
+        return None
+    recent = df.iloc[-lookback - 1:]
+    hit = crossover_mask(*(recent[f"EMA{p}"].to_numpy()[None, :] for p in EMA_PERIODS), len(recent) - 1)[0]
+    crossovers = [{
+        "CrossoverDate": str(date.date()),
+        "CrossoverPrice": float(row["Close"]),
+        **{f"EMA{p}": float(row[f"EMA{p}"]) for p in EMA_PERIODS},
+    } for date, row in recent.iloc[1:][hit].iterrows()]
+    last = df.iloc[-1]
+    return {
+        "ticker": ticker,
+        "date": str(df.index[-1].date()),
+        "Close": float(last["Close"]),
+        **{f"EMA{p}": float(last[f"EMA{p}"]) for p in EMA_PERIODS},
+        "eligible": len(df) >= MIN_BARS,  # the warm-up check of get_ema_signals
+        "crossovers": crossovers,
+    }
+
+
+def high_entry(ticker, window=HIGH_WINDOW, bars=HIGH_RECENT_BARS):
+    """
+    Index entry for one ticker: the date of its last stored bar and the bars among the
+    last `bars` that closed at a new `window`-bar high, computed from the stored closes.
+    """
+    arrays = HISTORY_STORE.read_columns(ticker, ["Close"])
+    if arrays is None:
+        return None
+    tail = bars + (window or len(arrays["Close"]))
+    close = np.asarray(arrays["Close"][-tail:], dtype=float)
+    dates = np.asarray(arrays["Date"][-tail:]).view("M8[ns]")
+    hit = new_high_mask(close[None, :], window)[0][-bars:]
+    return {
+        "last_date": str(pd.Timestamp(dates[-1]).date()),
+        "highs": [{"HighDate": str(pd.Timestamp(date).date()), "Close": round(float(price), 2)}
+                  for date, price in zip(dates[-bars:][hit], close[-bars:][hit])],
+    }
+
+
+class SignalIndex:
+    """
+    In-memory indexes over the EMA store and ledgers. Readers take a reference to the
+    current dicts; refresh() builds replacements and swaps them in, so queries never lock.
+    """
+
+    def __init__(self, lookback=LOOKBACK):
+        self.lookback = lookback
+        self.ema = {}
+        self.high_bars = {}
+        self.ledgers = {HIGHS_LEDGER_FILE: [], SMA_LEDGER_FILE: []}
+        self._signatures = {}
+        self._history_signatures = {}
+        self._ledger_signatures = {}
+        self.stats = {"refreshes": 0, "tickers_reloaded": 0, "last_refresh_ms": None, "refreshed_at": None}
+        self._refresh_lock = threading.Lock()
+
+    def refresh(self):
+        """
+        Reloads tickers and ledgers changed since the last refresh. Returns the number reloaded.
+        """
+        with self._refresh_lock:
+            started = time.perf_counter()
+            reloaded = self._refresh_ema() + self._refresh_highs() + self._refresh_ledgers()
+            self.stats["refreshes"] += 1
+            self.stats["last_refresh_ms"] = round((time.perf_counter() - started) * 1000, 2)
+            self.stats["refreshed_at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+        return reloaded
+
+    def _refresh_ema(self):
+        current = {t: EMA_STORE.signature(t) for t in EMA_STORE.tickers()}
+        changed = [t for t, sig in current.items() if self._signatures.get(t) != sig]
+        removed = [t for t in self.ema if t not in current]
+        if not changed and not removed:
+            return 0
+        ema = dict(self.ema)
+        for ticker in removed:
+            ema.pop(ticker, None)
+            self._signatures.pop(ticker, None)
+        for ticker in changed:
+            try:
+                entry = ema_entry(ticker, self.lookback)
+            except Exception as e:  # e.g. caught mid-write; retried on the next refresh
+                print(f"⚠️ [query_service.py] Could not index {ticker}: {e}")
+                continue
+            if entry is not None:
+                ema[ticker] = entry
+            self._signatures[ticker] = current[ticker]
+        self.ema = dict(sorted(ema.items()))
+        self.stats["tickers_reloaded"] += len(changed)
+        return len(changed) + len(removed)
+
+    def _refresh_highs(self):
+        current = {t: HISTORY_STORE.signature(t) for t in HISTORY_STORE.tickers()}
+        changed = [t for t, sig in current.items() if self._history_signatures.get(t) != sig]
+        removed = [t for t in self.high_bars if t not in current]
+        if not changed and not removed:
+            return 0
+        high_bars = dict(self.high_bars)
+        for ticker in removed:
+            high_bars.pop(ticker, None)
+            self._history_signatures.pop(ticker, None)
+        for ticker in changed:
+            try:
+                entry = high_entry(ticker)
+            except Exception as e:  # e.g. caught mid-write; retried on the next refresh
+                print(f"⚠️ [query_service.py] Could not index highs of {ticker}: {e}")
+                continue
+            if entry is not None:
+                high_bars[ticker] = entry
+            self._history_signatures[ticker] = current[ticker]
+        self.high_bars = dict(sorted(high_bars.items()))
+        return len(changed) + len(removed)
+
+    def _refresh_ledgers(self):
+        reloaded = 0
+        for file in self.ledgers:
+            try:
+                stat = os.stat(file)
+                signature = (stat.st_mtime_ns, stat.st_size)
+            except FileNotFoundError:
+                signature = None
+            if self._ledger_signatures.get(file, ()) == signature:
+                continue
+            df = load_ledger(file)
+            date_column = LEDGER_SCHEMAS[file][1]
+            df = df.sort_values([date_column, "Ticker"], ascending=[False, True], kind="stable")
+            df[date_column] = pd.to_datetime(df[date_column]).dt.strftime("%Y-%m-%d")  # empty ledgers load as object
+            self.ledgers[file] = json.loads(df.to_json(orient="records"))
+            self._ledger_signatures[file] = signature
+            reloaded += 1
+        return reloaded
+
+    # ----------------- Queries -----------------
+    def crossovers(self, band=PCT_BAND):
+        """
+        The live crossover rule for any band: per ticker, the first crossover of the
+        lookback window with the current close within `band` % above it.
+        """
+        signals = []
+        for entry in self.ema.values():
+            if not entry["eligible"]:
+                continue
+            for crossover in entry["crossovers"]:
+                price = crossover["CrossoverPrice"]
+                pct = round((entry["Close"] - price) / price * 100, 2)
+                if band[0] <= pct <= band[1]:
+                    signals.append({
+                        "ticker": entry["ticker"],
+                        "CrossoverDate": crossover["CrossoverDate"],
+                        "CrossoverPrice": round(price, 2),
+                        "CurrentPrice": round(entry["Close"], 2),
+                        "PctAbove": pct,
+                        **{f"EMA{p}": crossover[f"EMA{p}"] for p in EMA_PERIODS},
+                    })
+                    break
+        return signals
+
+    def highs(self, days=5):
+        """
+        Per ticker, its latest new 52-week high if it falls within `days` calendar days of
+        the newest stored bar, newest first. Company names come from the highs ledger.
+        """
+        high_bars = self.high_bars
+        if not high_bars:
+            return []
+        latest = max(entry["last_date"] for entry in high_bars.values())
+        cutoff = str((pd.Timestamp(latest) - pd.Timedelta(days=days)).date())
+        companies = {row["Ticker"]: row["Company"] for row in self.ledgers[HIGHS_LEDGER_FILE]}
+        rows = [{"Ticker": ticker, "Company": companies.get(ticker, ticker), **entry["highs"][-1]}
+                for ticker, entry in high_bars.items() if entry["highs"] and entry["highs"][-1]["HighDate"] > cutoff]
+        return sorted(rows, key=lambda row: row["HighDate"], reverse=True)  # stable: tickers stay sorted
+
+    def ticker(self, ticker):
+        entry = self.ema.get(ticker)
+        if entry is None:
+            return None
+        highs = self.high_bars.get(ticker, {}).get("highs")
+        high = highs[-1] if highs else None
+        last_bar = HISTORY_STORE.last_date(ticker)  # tail of the Date column only
+        return {**entry, "history_last_date": str(last_bar.date()) if last_bar is not None else None,
+                "high": high}
+
+    def status(self):
+        return {"tickers": len(self.ema), "highs": sum(bool(e["highs"]) for e in self.high_bars.values()),
+                "sma": len(self.ledgers[SMA_LEDGER_FILE]), **self.stats}
+
+
+def _refresh_loop(index, interval, stop):
+    while not stop.wait(interval):
+        try:
+            if index.refresh():
+                print(f"🔄 [query_service.py] Index refreshed in {index.stats['last_refresh_ms']} ms")
+        except Exception as e:
+            print(f"⚠️ [query_service.py] Refresh failed: {e}")
+
+
+def make_handler(index):
+    class QueryHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            started = time.perf_counter()
+            url = urlparse(self.path)
+            params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            parts = [p for p in url.path.split("/") if p]
+            try:
+                status, body = self.route(parts, params)
+            except ValueError as e:
+                status, body = 400, {"error": str(e)}
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.send_header("X-Query-Ms", f"{(time.perf_counter() - started) * 1000:.3f}")
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def route(self, parts, params):
+            if parts == ["crossovers"]:
+                band = (float(params.get("min", PCT_BAND[0])), float(params.get("max", PCT_BAND[1])))
+                return 200, index.crossovers(band)
+            if parts == ["highs"]:
+                return 200, index.highs(int(params.get("days", 5)))
+            if len(parts) == 2 and parts[0] == "ema":
+                entry = index.ticker(parts[1].upper())
+                return (200, entry) if entry else (404, {"error": f"{parts[1]} is not in the EMA store"})
+            if parts == ["sma"]:
+                return 200, index.ledgers[SMA_LEDGER_FILE]
+            if parts == ["status"]:
+                return 200, index.status()
+            return 404, {"error": "unknown endpoint", "endpoints": ["/crossovers", "/highs", "/ema/<ticker>",
+                                                                    "/sma", "/status"]}
+
+        def log_message(self, format, *args):
+            pass  # keep the console for refresh notes
+
+    return QueryHandler
+
+
+def serve(host=QUERY_HOST, port=QUERY_PORT, refresh_seconds=QUERY_REFRESH_SECONDS, index=None):
+    """
+    Builds the index and serves it until interrupted, refreshing it in the background.
+    """
+    index = index or SignalIndex()
+    index.refresh()
+    print(f"📇 [query_service.py] Indexed {len(index.ema)} tickers in {index.stats['last_refresh_ms']} ms")
+    server = ThreadingHTTPServer((host, port), make_handler(index))
+    stop = threading.Event()
+    threading.Thread(target=_refresh_loop, args=(index, refresh_seconds, stop), daemon=True).start()
+    print(f"🌐 [query_service.py] Serving on http://{host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("⏹️ [query_service.py] Stopped")
+    finally:
+        stop.set()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve precomputed signals as JSON over HTTP")
+    parser.add_argument("--host", default=QUERY_HOST)
+    parser.add_argument("--port", type=int, default=QUERY_PORT)
+    parser.add_argument("--refresh-seconds", type=float, default=QUERY_REFRESH_SECONDS)
+    args = parser.parse_args()
+    serve(args.host, args.port, args.refresh_seconds)
@@ -0,0 +1,192 @@
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from utils import metrics
+from config import (
+    RETRY_MAX_ATTEMPTS, RETRY_BUDGET, BREAKER_THRESHOLD, BACKOFF_BASE, BACKOFF_MAX, SCAN_WORKERS,
+)
+
+# Substrings that mark a provider error as worth retrying
+_TRANSIENT_MARKERS = ("rate limit", "too many requests", "429", "timed out", "timeout",
+                      "temporarily", "connection", "503", "502")
+
+
+class TransientError(Exception):
+    """
+    Provider failure that may succeed later (rate limit, timeout, dropped connection).
+    """
+
+
+class ProviderDownError(Exception):
+    """
+    Raised when the circuit breaker is open and no more provider calls should be made.
+    """
+
+
+def is_transient(exc):
+    """
+    Separates retryable provider failures from legitimate answers (delisted, no data, low cap).
+    """
+    if isinstance(exc, (TransientError, TimeoutError, ConnectionError)):
+        return True
+    if isinstance(exc, ProviderDownError):
+        return False
+    text = f"{type(exc).__name__} {exc}".lower()
+    return any(marker in text for marker in _TRANSIENT_MARKERS)
+
+
+class RetryPolicy:
+    """
+    Backoff schedule plus the run-wide state every retry loop shares:
+    a retry budget and a circuit breaker that opens after `breaker_threshold`
+    consecutive transient failures. Both are per run: reset() starts a fresh one.
+    """
+
+    def __init__(self, budget=RETRY_BUDGET, breaker_threshold=BREAKER_THRESHOLD,
+                 backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX):
+        self.initial_budget = budget
+        self.budget = budget
+        self.breaker_threshold = breaker_threshold
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._consecutive_failures = 0
+        self._lock = threading.Lock()
+
+    def reset(self):
+        """
+        Restores the full budget and closes the breaker (called at the start of each scan).
+        """
+        with self._lock:
+            self.budget = self.initial_budget
+            self._consecutive_failures = 0
+
+    @property
+    def is_open(self):
+        return self._consecutive_failures >= self.breaker_threshold
+
+    def delay(self, attempt):
+        return min(self.backoff_max, self.backoff_base ** attempt) + random.random()
+
+    def record_success(self):
+        with self._lock:
+            self._consecutive_failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._consecutive_failures += 1
+            if self._consecutive_failures == self.breaker_threshold:
+                print(f"🛑 [retry.py] Circuit breaker open after {self.breaker_threshold} consecutive provider failures")
+
+    def allow_retry(self):
+        """
+        Consumes one unit of the global budget; False once it is spent or the breaker is open.
+        """
+        with self._lock:
+            if self.is_open or self.budget <= 0:
+                return False
+            self.budget -= 1
+        metrics.incr("retries")
+        return True
+
+    def check(self):
+        if self.is_open:
+            raise ProviderDownError("Circuit breaker open: provider appears to be down")
+
+
+RETRY_POLICY = RetryPolicy()
+
+
+def call_with_retry(fn, *args, max_attempts=RETRY_MAX_ATTEMPTS, policy=None, **kwargs):
+    """
+    Calls fn, retrying transient failures in place with the shared backoff.
+    Non-transient errors are raised immediately.
+    """
+    policy = policy or RETRY_POLICY
+    for attempt in range(1, max_attempts + 1):
+        policy.check()
+        try:
+            result = fn(*args, **kwargs)
+            policy.record_success()
+            return result
+        except Exception as e:
+            if not is_transient(e):
+                raise
+            policy.record_failure()
+            if attempt == max_attempts or not policy.allow_retry():
+                raise
+            wait_s = policy.delay(attempt)
+            print(f"⚠️ [retry.py] Transient error ({e}); attempt {attempt} of {max_attempts}, retrying in {wait_s:.1f}s...")
+            time.sleep(wait_s)
+
+
+class RetryScheduler:
+    """
+    Runs fn(item) over a worker pool without ever sleeping inside a worker.
+    Items failing with a transient error are requeued at the end of the run with a
+    not-before time from the policy's backoff; any other exception is a final answer.
+    When the budget is spent or the breaker opens, the remaining items are given up.
+    """
+
+    def __init__(self, workers=SCAN_WORKERS, max_attempts=RETRY_MAX_ATTEMPTS, policy=None):
+        self.workers = max(1, workers)
+        self.max_attempts = max_attempts
+        self.policy = policy or RETRY_POLICY
+
+    def run(self, items, fn):
+        """
+        Returns (results, failed): {item: result} and {item: last exception}.
+        """
+        queue = deque((item, 1, 0.0) for item in items)
+        results, failed, in_flight = {}, {}, {}
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while queue or in_flight:
+                if self.policy.is_open:
+                    for item, _, _ in queue:
+                        failed[item] = ProviderDownError("Circuit breaker open")
+                    queue.clear()
+
+                # Submit every item whose backoff has elapsed, in queue order
+                now = time.monotonic()
+                for _ in range(len(queue)):
+                    if len(in_flight) >= self.workers:
+                        break
+                    item, attempt, ready_at = queue.popleft()
+                    if ready_at <= now:
+                        in_flight[pool.submit(fn, item)] = (item, attempt)
+                    else:
+                        queue.append((item, attempt, ready_at))
+
+                if not in_flight:
+                    if queue:
+                        time.sleep(max(0.0, min(r for _, _, r in queue) - time.monotonic()))
+                    continue
+
+                timeout = None
+                if queue and len(in_flight) < self.workers:
+                    timeout = max(0.0, min(r for _, _, r in queue) - time.monotonic())
+                done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    item, attempt = in_flight.pop(future)
+                    try:
+                        results[item] = future.result()
+                        self.policy.record_success()
+                    except ProviderDownError as e:
+                        failed[item] = e
+                    except Exception as e:
+                        if not is_transient(e):
+                            self.policy.record_success()
+                            failed[item] = e
+                            continue
+                        self.policy.record_failure()
+                        if attempt < self.max_attempts and self.policy.allow_retry():
+                            ready_at = time.monotonic() + self.policy.delay(attempt)
+                            print(f"⚠️ [retry.py] {item}: transient error ({e}); requeued (attempt {attempt + 1})")
+                            queue.append((item, attempt + 1, ready_at))
+                        else:
+                            failed[item] = e
+
+        return results, failed
@@ -1,57 +1,187 @@
-import time
+from functools import partial
 import pandas as pd
-from config import MIN_MARKET_CAP, SP500_SOURCE
+from config import MIN_MARKET_CAP, UNIVERSE_SOURCE, SCAN_WORKERS, RUN_JOURNAL_FILE
 from utils.market_data import get_market_cap
-from utils.ema_signals import get_ema_signals
+from utils.ema_utils import compute_ema_incremental, read_ema_window
 from utils.highs import check_new_high
+from utils.indicators import evaluate, frame_arrays
+from utils.historical_data import refresh_universe, save_index
+from utils.metadata import METADATA
+from utils.data_context import release, scan_context
+from utils.journal import RunJournal
+from utils.ledger_utils import HIGHS_LEDGER, commit_ledgers, update_highs_ledger
+from utils import metrics
+from utils.retry import RETRY_POLICY, RetryScheduler, is_transient
+from utils.sharding import scan_lock, shard_path, write_shard_results
+from utils.universe import load_universe, select_shard
 
-BACKOFF_BASE = 2
-MAX_RETRIES = 5
+# Registry signals (utils/indicators.py) evaluated on each ticker's EMA window
+SCAN_SIGNALS = ["ema_crossover"]
 
-def run_scan(test_mode=False):
+
+def scan_ticker(ticker, journal=None, on_alert=None):
+    """
+    Runs every per-ticker stage (market cap, EMA update, crossover signal, new high).
+    Returns (ema_signal, high_result); either may be None.
+    Transient provider errors propagate so the RetryScheduler can requeue the ticker;
+    every stage is idempotent, so a rerun after a partial failure is safe.
+    A finished ticker is logged to `journal` (if given) along with its completed stages,
+    and every signal is passed to `on_alert(rule, row)` right away.
+    """
+    try:
+        return _scan_stages(ticker, journal, on_alert)
+    finally:
+        release(ticker)  # all stages done (or requeued): drop the shared frame
+
+
+def _scan_stages(ticker, journal, on_alert):
+    stages = []
+
+    # --- Market Cap Check (a low cap is an answer, not a failure) ---
+    if get_market_cap(ticker) <= MIN_MARKET_CAP:
+        print(f"⚠️ [scanner.py] Skipping {ticker} due to low/missing market cap")
+        if journal:
+            journal.record(ticker, stages)
+        return None, None
+    stages.append("market_cap")
+
+    # --- EMA Update ---
+    ema_df = None
+    try:
+        with metrics.timer("ema_update"):
+            ema_df = compute_ema_incremental(ticker)
+        stages.append("ema")
+    except Exception as e:
+        if is_transient(e):
+            raise
+        print(f"⚠️ [scanner.py] Error updating EMA for {ticker}: {e}")
+
+    # --- EMA Crossover (the registry rule, on the EMA window) ---
+    ema_signal = evaluate_signals(ticker, ema_df)
+
+    # --- 52-Week High ---
+    high_result = None
+    try:
+        with metrics.timer("highs"):
+            high_result = check_new_high(ticker)
+        stages.append("highs")
+    except Exception as e:
+        if is_transient(e):
+            raise
+        print(f"⚠️ [scanner.py] Error processing new high for {ticker}: {e}")
+
+    if journal:
+        # the staged ledger row is journaled too, so a resumed run can replay it
+        journal.record(ticker, stages, high=high_result,
+                       ledger=HIGHS_LEDGER.get(ticker) if high_result else None)
+    if on_alert:
+        if ema_signal:
+            on_alert("ema_crossover", ema_signal)
+        if high_result:
+            on_alert("new_high", high_result)
+    return ema_signal, high_result
+
+
+def evaluate_signals(ticker, ema_df):
+    """
+    The ticker's crossover signal from the SCAN_SIGNALS registry rules, or None.
     """
-    Runs the complete SMA crossover + 52-week high scan.
-    Sequential, with exponential backoff and retry.
+    if ema_df is None or ema_df.empty:
+        return None
+    with metrics.timer("signal_eval"):
+        return evaluate(ticker, frame_arrays(ema_df), SCAN_SIGNALS).get("ema_crossover")
+
+
+def replay_entry(ticker, entry):
+    """
+    Rebuilds scan_ticker's result for a ticker finished by an earlier, interrupted run,
+    re-staging its highs ledger row (a no-op if already present).
+    """
+    if entry.get("ledger"):
+        row = entry["ledger"]
+        update_highs_ledger(ticker, row["Company"], row["Close"], pd.Timestamp(row["HighDate"]))
+    ema_signal = evaluate_signals(ticker, read_ema_window(ticker)) if "ema" in entry["stages"] else None
+    return ema_signal, entry.get("high")
+
+
+def run_scan(test_mode=False, workers=SCAN_WORKERS, tickers=None, resume=False, journal_file=RUN_JOURNAL_FILE,
+             universe=UNIVERSE_SOURCE, shard=None, on_alert=None):
+    """
+    Runs the complete SMA crossover + 52-week high scan over `tickers` (default: loaded
+    from `universe`, the S&P 500 unless configured). With `shard=(i, N)` only the tickers
+    owned by shard i of N are scanned, and the shard's partial results are saved for the merge.
+    Tickers are processed by a pool of `workers` threads under the shared RetryScheduler:
+    transient failures are requeued to the end of the run instead of blocking a worker.
+    Results are returned in universe order regardless of completion order.
+    Progress is journaled to `journal_file`; with `resume`, tickers already finished
+    today are replayed from it instead of rescanned, giving the same signals and ledgers.
+    Every signal is also passed to `on_alert(rule, row)` (e.g. AlertDispatcher.publish) as
+    soon as it is known, so alert delivery runs alongside the scan.
+    The working directory is locked for the run (see sharding.scan_lock), and a shard
+    journals to its own shard-suffixed `journal_file`.
     """
+    if shard:
+        journal_file = shard_path(journal_file, *shard)
+    with scan_lock(shard):
+        return _run_scan(test_mode, workers, tickers, resume, journal_file, universe, shard, on_alert)
+
+
+def _run_scan(test_mode, workers, tickers, resume, journal_file, universe, shard, on_alert):
     print("🚀 Running SMA crossover and 52-week high scan...")
+    RETRY_POLICY.reset()  # each run gets the full retry budget and a closed breaker
 
-    sp500 = pd.read_csv(SP500_SOURCE)
-    tickers = sp500["Symbol"].tolist()
+    if tickers is None:
+        with metrics.timer("universe_fetch"):
+            tickers = load_universe(universe)
     if test_mode:
         tickers = tickers[:15]
+    full_universe = tickers
+    if shard:
+        tickers = select_shard(tickers, *shard)
+        print(f"🧩 [scanner.py] Shard {shard[0]}/{shard[1]}: {len(tickers)} tickers")
+
+    # --- Market cap filter from the metadata cache (stale entries refreshed in bulk) ---
+    # (tickers whose refresh failed transiently are kept and retried by scan_ticker)
+    with metrics.timer("market_cap"):
+        retry = {t for t, e in METADATA.refresh_many(tickers, workers).items() if is_transient(e)}
+        eligible = [t for t in tickers if t in retry or get_market_cap(t) > MIN_MARKET_CAP]
+    print(f"🏦 [scanner.py] {len(eligible)} of {len(tickers)} tickers above market cap threshold")
+    tickers = eligible
+
+    # --- Bring every history cache up to date in bulk (delta only for cached tickers) ---
+    with metrics.timer("history_download"):
+        refresh_universe(tickers)
 
-    ema_signals, new_highs = [], []
+    journal = RunJournal(journal_file)
+    finished = journal.start(tickers, resume)
+    pending = [t for t in tickers if t not in finished]
 
+    with scan_context():
+        results, failed = RetryScheduler(workers).run(pending, partial(scan_ticker, journal=journal, on_alert=on_alert))
+    for ticker, e in failed.items():
+        print(f"❌ [scanner.py] Giving up on {ticker}: {e}")
     for ticker in tickers:
-        # --- Market Cap Check ---
-        attempt, market_cap = 0, None
-        while attempt < MAX_RETRIES:
-            market_cap = get_market_cap(ticker)
-            if market_cap and market_cap > MIN_MARKET_CAP:
-                break
-            wait = BACKOFF_BASE ** attempt
-            print(f"⚠️ [scanner.py] Retry {attempt+1} for {ticker} market cap in {wait}s")
-            time.sleep(wait)
-            attempt += 1
-        else:
-            print(f"⚠️ [scanner.py] Skipping {ticker} due to low/missing market cap")
-            continue
-
-        # --- EMA Signal ---
-        try:
-            ema_result = get_ema_signals(ticker)
-            if ema_result:
-                ema_signals.append(ema_result)
-        except Exception as e:
-            print(f"⚠️ [scanner.py] Error processing SMA for {ticker}: {e}")
-
-        # --- 52-Week High ---
-        try:
-            high_result = check_new_high(ticker)
-            if high_result:
-                new_highs.append(high_result)
-        except Exception as e:
-            print(f"⚠️ [scanner.py] Error processing new high for {ticker}: {e}")
+        if ticker in finished:
+            results[ticker] = replay_entry(ticker, finished[ticker])
+            if on_alert:
+                for rule, row in zip(("ema_crossover", "new_high"), results[ticker]):
+                    if row:
+                        on_alert(rule, row)
+    done = [t for t in tickers if t in results]
+
+    ema_signals = [results[t][0] for t in done if results[t][0]]
+    new_highs = [results[t][1] for t in done if results[t][1]]
+
+    with metrics.timer("ledger_io"):
+        METADATA.save()
+        save_index()
+        commit_ledgers()
+    if shard:
+        write_shard_results(*shard, full_universe, ema_signals, new_highs)
+    if failed:
+        journal.close()  # left open-ended so a --resume run retries the failed tickers
+    else:
+        journal.finish()
 
     print("✅ Scan completed!")
     print(f"📈 EMA Crossovers: {ema_signals}")
@@ -0,0 +1,167 @@
+"""
+Partial results for sharded scans, and the merge that combines them.
+
+Each shard (`main.py --shard i/N`) must run in its own working directory, so shards
+never share a price store, metadata cache, journal or ledger file; scan_lock enforces
+this by refusing to start a second scan in a directory while one is running, and each
+shard journals to its own file. A shard writes SHARD_FOLDER/shard-i-of-N.json with its
+signals and the ledger rows for the tickers it owns. `main.py --merge` then folds every
+shard file into the local ledgers and produces one report and one email.
+"""
+import json
+import os
+from contextlib import contextmanager
+from datetime import date
+from pathlib import Path
+import pandas as pd
+from config import SHARD_FOLDER, SCAN_LOCK_FILE
+from utils.ledger_utils import SMA_LEDGER, HIGHS_LEDGER, commit_ledgers
+from utils.universe import shard_of
+
+LEDGERS = {ledger.file: ledger for ledger in (SMA_LEDGER, HIGHS_LEDGER)}
+
+
+def shard_file(index, count, folder=SHARD_FOLDER):
+    return Path(folder) / f"shard-{index}-of-{count}.json"
+
+
+def shard_path(path, index, count):
+    """
+    `path` with the shard in its name, e.g. scan_journal.jsonl -> scan_journal.shard-2-of-4.jsonl.
+    """
+    path = Path(path)
+    return str(path.with_name(f"{path.stem}.shard-{index}-of-{count}{path.suffix}"))
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+@contextmanager
+def scan_lock(shard=None, lock_file=SCAN_LOCK_FILE):
+    """
+    Holds `lock_file` in the working directory for the duration of a scan. A second scan
+    started in the same directory (another shard, typically) fails fast instead of sharing
+    its caches; a lock left behind by a process that is gone is taken over.
+    """
+    owner = {"shard": f"{shard[0]}/{shard[1]}" if shard else None, "pid": os.getpid()}
+    while True:
+        try:
+            fd = os.open(lock_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                holder = json.loads(Path(lock_file).read_text())
+            except (FileNotFoundError, ValueError):
+                holder = {}
+            if holder.get("pid") and _pid_alive(holder["pid"]):
+                raise RuntimeError(
+                    f"Another scan (shard {holder.get('shard') or 'none'}, pid {holder['pid']}) is running in "
+                    f"{os.getcwd()}; run each shard in its own working directory")
+            print(f"⚠️ [sharding.py] Removing stale {lock_file} left by {holder or 'an unknown process'}")
+            try:
+                os.remove(lock_file)
+            except FileNotFoundError:
+                pass
+    with os.fdopen(fd, "w") as f:
+        f.write(json.dumps(owner))
+    try:
+        yield
+    finally:
+        os.remove(lock_file)
+
+
+def write_shard_results(index, count, universe, ema_signals, new_highs, folder=SHARD_FOLDER):
+    """
+    Saves one shard's output. Ledger rows are limited to tickers this shard owns, which
+    makes the shard authoritative for them at merge time (including removals).
+    """
+    ledgers = {}
+    for file, ledger in LEDGERS.items():
+        df = ledger.to_frame()
+        ledgers[file] = df[[shard_of(t, count) == index for t in df["Ticker"]]].to_dict("records")
+
+    path = shard_file(index, count, folder)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps({
+        "shard": index,
+        "count": count,
+        "date": date.today().isoformat(),
+        "universe": list(universe),
+        "ema_signals": ema_signals,
+        "new_highs": new_highs,
+        "ledgers": ledgers,
+    }, default=str))
+    tmp_path.replace(path)
+    print(f"💾 [sharding.py] Shard {index}/{count} results written to {path}")
+    return path
+
+
+def _shard_files(paths):
+    files = []
+    for path in map(Path, paths):
+        files.extend(sorted(path.glob("shard-*-of-*.json")) if path.is_dir() else [path])
+    return files
+
+
+def merge_shard_results(paths, report_file=None):
+    """
+    Combines shard files (or folders of them) into (ema_signals, new_highs) in universe
+    order, and replaces each shard's owned tickers in the local ledgers before committing.
+    Missing shards are reported; a later file for the same shard wins. The merged
+    report is saved to `report_file` (default SHARD_FOLDER/merged.json).
+    """
+    shards = {}
+    for file in _shard_files(paths):
+        data = json.loads(file.read_text())
+        shards[(data["shard"], data["count"])] = data
+    if not shards:
+        raise FileNotFoundError(f"No shard results found in {list(map(str, paths))}")
+
+    counts = {count for _, count in shards}
+    if len(counts) > 1:
+        raise ValueError(f"Shard files come from different shard counts: {sorted(counts)}")
+    count = counts.pop()
+    missing = sorted(set(range(1, count + 1)) - {index for index, _ in shards})
+    if missing:
+        print(f"⚠️ [sharding.py] Missing results for shard(s) {missing} of {count}")
+
+    universe = list(dict.fromkeys(t for data in shards.values() for t in data["universe"]))
+    position = {t: i for i, t in enumerate(universe)}
+    ema_signals, new_highs = [], []
+    for (index, _), data in sorted(shards.items()):
+        ema_signals.extend(data["ema_signals"])
+        new_highs.extend(data["new_highs"])
+        for file, rows in data["ledgers"].items():
+            ledger = LEDGERS[file]
+            owned = {row["Ticker"]: row for row in rows}
+            for ticker in ledger.to_frame()["Ticker"]:
+                if shard_of(ticker, count) == index and ticker not in owned:
+                    ledger.remove(ticker)
+            for ticker, row in owned.items():
+                ledger.upsert(ticker, row | {ledger.date_column: pd.Timestamp(row[ledger.date_column])})
+
+    ema_signals.sort(key=lambda s: position.get(s["ticker"], len(position)))
+    new_highs.sort(key=lambda h: position.get(h["Ticker"], len(position)))
+    commit_ledgers()
+
+    report_file = Path(report_file or Path(SHARD_FOLDER) / "merged.json")
+    report_file.parent.mkdir(parents=True, exist_ok=True)
+    report_file.write_text(json.dumps({
+        "date": date.today().isoformat(),
+        "count": count,
+        "shards": sorted(index for index, _ in shards),
+        "missing": missing,
+        "ema_signals": ema_signals,
+        "new_highs": new_highs,
+    }, indent=1, default=str))
+    print(f"🔗 [sharding.py] Merged {len(shards)} of {count} shards: "
+          f"{len(ema_signals)} crossovers, {len(new_highs)} new highs")
+    return ema_signals, new_highs
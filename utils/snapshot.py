@@ -0,0 +1,179 @@
+"""
+Single-file snapshot of every local cache, so CI runs start warm.
+
+`pack` writes a gzipped tar whose first member is MANIFEST.json: the SHA-256 and size
+of every file. `restore` streams the archive into a staging folder, checks each file
+against the manifest, and installs it per group: one ticker's history, one ticker's EMA
+window and state, one ticker's highs state, or a single shared file. A group with any
+missing or corrupt file is left out, so a truncated or damaged snapshot only costs
+those tickers a fresh download or recompute; everything else is just delta-refreshed.
+
+    python -m utils.snapshot pack
+    python -m utils.snapshot restore
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import shutil
+import tarfile
+import time
+import zlib
+from pathlib import Path
+from config import (
+    SNAPSHOT_FILE, METADATA_CACHE_FILE, SMA_LEDGER_FILE, HIGHS_LEDGER_FILE, UNIVERSE_CACHE_FOLDER,
+)
+from utils.price_store import STORE_FOLDER
+
+MANIFEST = "MANIFEST.json"
+SNAPSHOT_FORMAT = 1
+
+# Everything a warm run needs: price/EMA/highs stores with the freshness index,
+# metadata, ledgers and the cached universe file
+SNAPSHOT_PATHS = [STORE_FOLDER, METADATA_CACHE_FILE, SMA_LEDGER_FILE, HIGHS_LEDGER_FILE, UNIVERSE_CACHE_FOLDER]
+
+STAGING_FOLDER = Path(".snapshot_restore")
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _files(paths=SNAPSHOT_PATHS):
+    for root in map(Path, paths):
+        if root.is_file():
+            yield root
+        elif root.is_dir():
+            yield from sorted(p for p in root.rglob("*") if p.is_file() and p.suffix != ".tmp")
+
+
+def group_of(path):
+    """
+    Restore unit for a file: ("history", ticker), ("ema", ticker), ("highs", ticker) or ("file", path).
+    """
+    parts = Path(path).parts
+    if len(parts) >= 3 and parts[0] == STORE_FOLDER.name:
+        kind = parts[1]
+        if kind in ("history", "ema") and len(parts) == 4:
+            return kind, parts[2]
+        if kind == "highs" and len(parts) == 3:
+            return kind, Path(parts[2]).stem
+    return "file", str(path)
+
+
+def pack(path=SNAPSHOT_FILE, paths=SNAPSHOT_PATHS):
+    """
+    Writes the snapshot atomically and returns its manifest.
+    """
+    started = time.monotonic()
+    files = list(_files(paths))
+    manifest = {
+        "format": SNAPSHOT_FORMAT,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "files": {str(p): {"sha256": _sha256(p), "size": p.stat().st_size} for p in files},
+    }
+    tmp_path = f"{path}.tmp"
+    with tarfile.open(tmp_path, "w:gz", compresslevel=6) as tar:
+        data = json.dumps(manifest, indent=1).encode()
+        info = tarfile.TarInfo(MANIFEST)
+        info.size = len(data)
+        tar.addfile(info, io.BytesIO(data))
+        for file_path in files:
+            tar.add(file_path, arcname=str(file_path), recursive=False)
+    os.replace(tmp_path, path)
+    size = os.path.getsize(path)
+    print(f"📦 [snapshot.py] Packed {len(files)} files into {path} "
+          f"({size / 2**20:.1f} MB, {time.monotonic() - started:.1f}s)")
+    return manifest
+
+
+def _extract(path, staging):
+    """
+    Streams members into `staging`. Returns (manifest or None, {name: sha256 of extracted data}).
+    Stops quietly at the first unreadable member (e.g. a truncated archive).
+    """
+    manifest, extracted = None, {}
+    try:
+        with tarfile.open(path, "r|gz") as tar:
+            for member in tar:
+                if not member.isfile():
+                    continue
+                data = tar.extractfile(member).read()
+                if member.name == MANIFEST:
+                    manifest = json.loads(data)
+                    continue
+                target = staging / member.name
+                if staging.resolve() not in target.resolve().parents:
+                    continue  # never write outside the staging folder
+                target.parent.mkdir(parents=True, exist_ok=True)
+                target.write_bytes(data)
+                extracted[member.name] = hashlib.sha256(data).hexdigest()
+    except (tarfile.TarError, EOFError, OSError, json.JSONDecodeError, zlib.error) as e:
+        print(f"⚠️ [snapshot.py] Snapshot is damaged after {len(extracted)} files: {e}")
+    return manifest, extracted
+
+
+def restore(path=SNAPSHOT_FILE, staging=STAGING_FOLDER):
+    """
+    Validates the snapshot and installs every intact group over the local caches.
+    Returns {"restored": [...groups], "damaged": [...groups]}; without a readable
+    manifest nothing is restored and the run simply starts cold.
+    """
+    report = {"restored": [], "damaged": []}
+    if not os.path.exists(path):
+        print(f"⚠️ [snapshot.py] No snapshot at {path}; starting cold")
+        return report
+
+    started = time.monotonic()
+    staging = Path(staging)
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+    try:
+        manifest, extracted = _extract(path, staging)
+        if manifest is None or manifest.get("format") != SNAPSHOT_FORMAT:
+            print(f"❌ [snapshot.py] {path} has no usable manifest; starting cold")
+            return report
+
+        groups = {}
+        for name, meta in manifest["files"].items():
+            ok = extracted.get(name) == meta["sha256"]
+            groups.setdefault(group_of(name), []).append((name, ok))
+
+        for group, files in sorted(groups.items()):
+            if not all(ok for _, ok in files):
+                report["damaged"].append(group)
+                continue
+            if group[0] in ("history", "ema"):
+                target_dir = STORE_FOLDER / group[0] / group[1]
+                shutil.rmtree(target_dir, ignore_errors=True)  # never mix files from two versions
+            for name, _ in files:
+                Path(name).parent.mkdir(parents=True, exist_ok=True)
+                os.replace(staging / name, name)
+            report["restored"].append(group)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+    print(f"♻️ [snapshot.py] Restored {len(report['restored'])} groups from {path} "
+          f"in {time.monotonic() - started:.1f}s")
+    if report["damaged"]:
+        tickers = sorted({ticker for kind, ticker in report["damaged"] if kind != "file"})
+        print(f"⚠️ [snapshot.py] Skipped {len(report['damaged'])} damaged groups; "
+              f"{len(tickers)} tickers will be rebuilt: {tickers[:20]}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pack or restore the local cache snapshot")
+    parser.add_argument("action", choices=["pack", "restore"])
+    parser.add_argument("--file", default=SNAPSHOT_FILE)
+    args = parser.parse_args()
+
+    if args.action == "pack":
+        pack(args.file)
+    else:
+        restore(args.file)
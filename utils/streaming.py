@@ -0,0 +1,326 @@
+"""
+Intraday streaming mode.
+
+Bars from a feed are applied to in-memory per-ticker state seeded from the EMA store:
+the latest intraday price is treated as today's provisional daily close, so the daily
+crossover and new-high rules are re-evaluated on every bar in constant time (one EMA
+step per period, a LOOKBACK-sized candidate window, a RollingHigh peek). When a bar for
+a new day arrives, the previous session's last price is rolled in as a completed close.
+Nothing is written to the price or EMA stores; the nightly scan stays the source of truth.
+
+    python -m utils.streaming --replay bars.csv
+    python -m utils.streaming --poll --interval 1m
+"""
+import argparse
+import time
+from collections import deque, namedtuple
+import pandas as pd
+from utils.ema_signals import LOOKBACK, MIN_BARS, PCT_BAND
+from utils.ema_utils import EMA_PERIODS, read_ema_window
+from utils.highs import HIGH_WINDOWS, RollingHigh, load_high_state
+from utils.ledger_utils import HIGHS_LEDGER, commit_ledgers, update_highs_ledger
+from utils.metadata import METADATA
+from utils.price_store import HISTORY_STORE
+from utils.providers import get_provider
+from utils.retry import RETRY_POLICY, ProviderDownError, call_with_retry, is_transient
+
+Bar = namedtuple("Bar", ["ticker", "time", "close"])
+
+COMMIT_INTERVAL = 60  # seconds between ledger commits while streaming
+
+
+class BarFeed:
+    """
+    Interface for bar sources: iterating yields Bar(ticker, time, close) in time order.
+    """
+
+    def __iter__(self):
+        raise NotImplementedError
+
+
+class ReplayFeed(BarFeed):
+    """
+    Replays bars from a CSV with Datetime, Ticker and Close columns.
+    With `speed`, bars are paced at that multiple of real time; otherwise as fast as possible.
+    """
+
+    def __init__(self, path, speed=None):
+        self.path = path
+        self.speed = speed
+
+    def __iter__(self):
+        df = pd.read_csv(self.path, parse_dates=["Datetime"]).sort_values("Datetime", kind="stable")
+        started, first = time.monotonic(), None
+        for t, ticker, close in zip(df["Datetime"], df["Ticker"], df["Close"].astype(float)):
+            if self.speed:
+                first = first or t
+                delay = (t - first).total_seconds() / self.speed - (time.monotonic() - started)
+                if delay > 0:
+                    time.sleep(delay)
+            yield Bar(ticker, t, close)
+
+
+class PollingFeed(BarFeed):
+    """
+    Polls the data provider for today's intraday bars every `poll_seconds`, yielding only bars
+    newer than the last one seen per ticker. Runs until interrupted.
+    Transient provider errors are retried with the shared policy; a chunk that still fails is
+    skipped for that poll and the next poll is backed off. Only ProviderDownError (the circuit
+    breaker) ends the feed.
+    """
+
+    def __init__(self, tickers, interval="1m", poll_seconds=60, chunk_size=100):
+        self.tickers = list(tickers)
+        self.interval = interval
+        self.poll_seconds = poll_seconds
+        self.chunk_size = chunk_size
+        self.seen = {}
+        self.failed_polls = 0  # consecutive polls with a failed chunk
+
+    def poll(self):
+        bars, failed = [], False
+        for start in range(0, len(self.tickers), self.chunk_size):
+            chunk = self.tickers[start:start + self.chunk_size]
+            try:
+                data = call_with_retry(get_provider().download_many, chunk, period="1d", interval=self.interval)
+            except Exception as e:
+                if not is_transient(e):
+                    raise
+                print(f"⚠️ [streaming.py] Skipping {len(chunk)} tickers this poll: {e}")
+                failed = True
+                continue
+            for ticker in chunk:
+                if ticker not in data.columns.get_level_values(0):
+                    continue
+                close = data[ticker]["Close"].dropna()
+                if close.index.tz is not None:
+                    close.index = close.index.tz_localize(None)
+                close = close[close.index > self.seen.get(ticker, pd.Timestamp.min)]
+                if not close.empty:
+                    self.seen[ticker] = close.index[-1]
+                    bars.extend(Bar(ticker, t, float(c)) for t, c in close.items())
+        self.failed_polls = self.failed_polls + 1 if failed else 0
+        return sorted(bars, key=lambda bar: bar.time)
+
+    def __iter__(self):
+        while True:
+            started = time.monotonic()
+            yield from self.poll()
+            wait_s = self.poll_seconds
+            if self.failed_polls:
+                wait_s = max(wait_s, RETRY_POLICY.delay(self.failed_polls))
+                print(f"⏳ [streaming.py] Backing off {wait_s:.0f}s after {self.failed_polls} failed polls")
+            time.sleep(max(0.0, wait_s - (time.monotonic() - started)))
+
+
+def record_replay(tickers, path, period="5d", interval="1m"):
+    """
+    Saves recent intraday bars from the provider as a ReplayFeed CSV.
+    """
+    data = get_provider().download_many(list(tickers), period=period, interval=interval)
+    close = data.xs("Close", axis=1, level=1)
+    if close.index.tz is not None:
+        close.index = close.index.tz_localize(None)
+    bars = close.rename_axis("Datetime").rename_axis("Ticker", axis=1).stack().rename("Close").reset_index()
+    bars.sort_values(["Datetime", "Ticker"]).to_csv(path, index=False)
+    return path
+
+
+def seed_tracker(ticker, last_date, window="52w"):
+    """
+    RollingHigh over the ticker's completed closes through `last_date`: the nightly scan's
+    persisted tracker when it is at that date, else rebuilt from the full price history
+    (the EMA window is too short for the 52w and all-time windows).
+    """
+    state = load_high_state(ticker).get(window)
+    if state and pd.Timestamp(state["date"]) == last_date:
+        return RollingHigh.from_dict(state["tracker"])
+    tracker = RollingHigh(HIGH_WINDOWS[window])
+    history = HISTORY_STORE.read(ticker, ["Close"])
+    if not history.empty:
+        for close in history.loc[:last_date, "Close"].to_numpy(dtype=float):
+            tracker.update(close)
+    return tracker
+
+
+class TickerState:
+    """
+    One ticker's streaming state: committed daily EMAs as of `last_date`, the crossover
+    flags of the last LOOKBACK - 1 completed days, a RollingHigh of completed closes
+    (see seed_tracker), and the current session's provisional close.
+    """
+
+    def __init__(self, df, tracker, lookback=LOOKBACK):
+        self.last_date = df.index[-1]
+        self.ema = {p: float(df[f"EMA{p}"].iloc[-1]) for p in EMA_PERIODS}
+        self.below = self.ema[20] <= self.ema[50]
+        self.bars = len(df)
+
+        flags = ((df["EMA20"].shift() <= df["EMA50"].shift()) & (df["EMA20"] > df["EMA50"])
+                 & (df["EMA50"] > df["EMA200"]))
+        recent = df.iloc[-(lookback - 1):]
+        self.window = deque(zip(recent.index, recent["Close"].astype(float), flags.iloc[-(lookback - 1):]),
+                            maxlen=lookback - 1)
+        self.tracker = tracker
+        self.session = None
+        self.price = None
+
+    def _step(self, close):
+        return {p: self.ema[p] + 2 / (p + 1) * (close - self.ema[p]) for p in EMA_PERIODS}
+
+    def roll(self):
+        """
+        Commits the session's last price as a completed daily close.
+        """
+        ema = self._step(self.price)
+        hit = self.below and ema[20] > ema[50] and ema[50] > ema[200]
+        self.window.append((self.session, self.price, hit))
+        self.below = ema[20] <= ema[50]
+        self.ema = ema
+        self.tracker.update(self.price)
+        self.last_date, self.bars = self.session, self.bars + 1
+
+    def crossover(self, band=PCT_BAND):
+        """
+        The live crossover rule with the provisional close as today's bar:
+        (crossover date, crossover close, pct above) for the first in-band crossover, or None.
+        """
+        if self.bars + 1 < MIN_BARS:
+            return None
+        ema = self._step(self.price)
+        today = self.below and ema[20] > ema[50] and ema[50] > ema[200]
+        for date, close, hit in [*self.window, (self.session, self.price, today)]:
+            if hit:
+                pct = round((self.price - close) / close * 100, 2)
+                if band[0] <= pct <= band[1]:
+                    return date, close, pct
+        return None
+
+    def is_high(self):
+        return self.tracker.peek(self.price)
+
+
+def print_alert(alert):
+    print(f"🔔 [streaming.py] {alert['time']} {alert['ticker']} {alert['rule']}: {alert}")
+
+
+class Streamer:
+    """
+    Applies bars to per-ticker state and fires handlers once per new condition.
+    Crossover alerts are de-duplicated per (ticker, crossover date); new-high alerts per
+    (ticker, session) and against the highs ledger, where they are also recorded.
+    """
+
+    def __init__(self, handlers=(print_alert,), band=PCT_BAND, high_window="52w"):
+        self.handlers = list(handlers)
+        self.band = band
+        self.high_window = high_window
+        self.states = {}
+        self.alerted = set()
+        self.stats = {"bars": 0, "stale_bars": 0, "alerts": 0, "unknown_tickers": 0, "errors": 0}
+
+    def state(self, ticker):
+        if ticker not in self.states:
+            df = read_ema_window(ticker)
+            self.states[ticker] = (TickerState(df, seed_tracker(ticker, df.index[-1], self.high_window))
+                                   if not df.empty else None)
+            if df.empty:
+                self.stats["unknown_tickers"] += 1
+                print(f"⚠️ [streaming.py] No EMA state for {ticker}; run the daily scan first. Ignoring its bars.")
+        return self.states[ticker]
+
+    def _fire(self, key, alert):
+        if key in self.alerted:
+            return
+        self.alerted.add(key)
+        self.stats["alerts"] += 1
+        for handler in self.handlers:
+            handler(alert)
+
+    def process(self, bar):
+        state = self.state(bar.ticker)
+        self.stats["bars"] += 1
+        day = bar.time.normalize()
+        if state is None or day <= state.last_date:
+            self.stats["stale_bars"] += 1
+            return
+        if state.session is not None and day > state.session:
+            state.roll()
+        state.session, state.price = day, bar.close
+
+        hit = state.crossover(self.band)
+        if hit:
+            date, crossover_price, pct = hit
+            self._fire(("ema_crossover", bar.ticker, date), {
+                "rule": "ema_crossover", "ticker": bar.ticker, "time": str(bar.time),
+                "CrossoverDate": str(date.date()), "CrossoverPrice": round(crossover_price, 2),
+                "CurrentPrice": round(bar.close, 2), "PctAbove": pct,
+            })
+
+        if state.is_high() and ("new_high", bar.ticker, day) not in self.alerted:
+            row = HIGHS_LEDGER.get(bar.ticker)
+            if row is not None and pd.Timestamp(row["HighDate"]) == day:
+                self.alerted.add(("new_high", bar.ticker, day))  # already recorded today
+                return
+            try:
+                name = METADATA.get(bar.ticker, "shortName", bar.ticker)
+            except Exception as e:
+                print(f"⚠️ [streaming.py] No name for {bar.ticker}: {e}")
+                name = bar.ticker
+            update_highs_ledger(bar.ticker, name, bar.close, day)
+            self._fire(("new_high", bar.ticker, day), {
+                "rule": "new_high", "ticker": bar.ticker, "time": str(bar.time),
+                "Company": name, "Close": round(bar.close, 2), "HighDate": str(day.date()),
+            })
+
+    def run(self, feed, commit_interval=COMMIT_INTERVAL):
+        """
+        Consumes the feed until it ends (or Ctrl-C, or the provider is down), committing
+        ledgers periodically. A bar that fails to process is logged and skipped.
+        Returns the stats dict with the achieved bars per second.
+        """
+        started = last_commit = time.monotonic()
+        try:
+            for bar in feed:
+                try:
+                    self.process(bar)
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    print(f"⚠️ [streaming.py] Skipping bar {bar}: {e}")
+                if time.monotonic() - last_commit >= commit_interval:
+                    commit_ledgers()
+                    last_commit = time.monotonic()
+        except KeyboardInterrupt:
+            print("⏹️ [streaming.py] Stopped")
+        except ProviderDownError as e:
+            print(f"🛑 [streaming.py] Stopped: {e}")
+        finally:
+            commit_ledgers()
+        elapsed = time.monotonic() - started
+        self.stats["bars_per_sec"] = round(self.stats["bars"] / elapsed) if elapsed else None
+        return self.stats
+
+
+if __name__ == "__main__":
+    from utils.universe import load_universe
+
+    parser = argparse.ArgumentParser(description="Stream intraday bars through the crossover and new-high rules")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--replay", metavar="CSV", help="replay bars from a Datetime,Ticker,Close CSV")
+    source.add_argument("--poll", action="store_true", help="poll the data provider for intraday bars")
+    source.add_argument("--record", metavar="CSV", help="save the last 5 days of 1m bars as a replay file and exit")
+    parser.add_argument("--speed", type=float, help="replay pace as a multiple of real time")
+    parser.add_argument("--interval", default="1m")
+    parser.add_argument("--poll-seconds", type=int, default=60)
+    parser.add_argument("--universe", help="symbols to poll/record (default: configured universe)")
+    args = parser.parse_args()
+
+    if args.replay:
+        feed = ReplayFeed(args.replay, args.speed)
+    else:
+        tickers = load_universe(args.universe) if args.universe else load_universe()
+        if args.record:
+            print(f"💾 [streaming.py] Replay file written to {record_replay(tickers, args.record)}")
+            raise SystemExit
+        feed = PollingFeed(tickers, args.interval, args.poll_seconds)
+    print(f"📡 [streaming.py] Stats: {Streamer().run(feed)}")
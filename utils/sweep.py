@@ -0,0 +1,163 @@
+"""
+Parameter sweep over EMA spans and entry bands for the crossover rule.
+
+Tickers are streamed through in chunks. Per chunk each distinct span is computed once
+on a (tickers × bars) panel, and every (fast, mid, slow, band) combination is scored
+in one broadcast pass over the stacked crossover and trend masks. Peak memory scales
+with chunk_size × bars × combinations, not with the universe.
+Each crossover is scored on its own, so a crossover the live rule would shadow with an
+earlier in-band one in the same window still counts (a few more signals than backtest.py).
+
+    python -m utils.sweep --fast 10,20,30 --mid 50,100 --slow 150,200 --bands 3-8,5-10
+"""
+import argparse
+import itertools
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from utils.ema_signals import LOOKBACK, MIN_BARS
+from utils.price_store import HISTORY_STORE
+
+SWEEP_CHUNK = 100  # tickers per panel
+SWEEP_HORIZON = 20  # bars between entry and exit
+
+
+def close_panel(universe):
+    """
+    Right-aligned (tickers × bars) close panel, NaN-padded on the left, plus each row's padding.
+    """
+    length = max(len(arrays["Close"]) for arrays in universe.values())
+    panel = np.full((len(universe), length), np.nan)
+    pad = np.empty(len(universe), dtype=int)
+    for row, arrays in enumerate(universe.values()):
+        n = len(arrays["Close"])
+        panel[row, length - n:] = arrays["Close"]
+        pad[row] = length - n
+    return panel, pad
+
+
+def ema_panel(close, span):
+    # leading NaNs are skipped, so each row matches ewm over that ticker's own history
+    return pd.DataFrame(close.T).ewm(span=span, adjust=False).mean().to_numpy().T
+
+
+def band_entries(close, pad, band, lookback=LOOKBACK, horizon=SWEEP_HORIZON):
+    """
+    For a crossover on every bar c: whether the close enters `band` % above close[c]
+    within the lookback (valid), and the forward return from that first in-band close.
+    Entries before a ticker has MIN_BARS of history are not valid, as in the live scan.
+    """
+    k, length = close.shape
+    ahead = np.concatenate([close, np.full((k, lookback - 1), np.nan)], axis=1)
+    window = sliding_window_view(ahead, lookback, axis=1)  # window[:, c, j] = close[c + j]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        pct = np.round((window - close[:, :, None]) / close[:, :, None] * 100, 2)
+        in_band = (pct >= band[0]) & (pct <= band[1])
+    entry = np.arange(length) + in_band.argmax(axis=2)
+    valid = in_band.any(axis=2) & (entry - pad[:, None] >= MIN_BARS - 1)
+
+    rows = np.arange(k)[:, None]
+    exit_bar = np.minimum(entry + horizon, length - 1)
+    ret = close[rows, exit_bar] / close[rows, np.minimum(entry, length - 1)] - 1
+    ret[(entry + horizon >= length) | ~valid] = np.nan
+    return valid, ret
+
+
+def sweep_chunk(close, pad, fast, mid, slow, bands, lookback=LOOKBACK, horizon=SWEEP_HORIZON):
+    """
+    Scores every combination on one panel. Returns arrays shaped (fast, mid, slow, band):
+    signal count, signals with a full forward horizon, winners, summed return, tickers with signals.
+    """
+    emas = {span: ema_panel(close, span) for span in sorted(set(fast) | set(mid) | set(slow))}
+    stack = lambda spans: np.stack([emas[s] for s in spans])
+    f, m, s = stack(fast), stack(mid), stack(slow)
+
+    # crossed on bar c: fast <= mid on c-1 and fast > mid on c; NaN compares False
+    with np.errstate(invalid="ignore"):
+        crossed = np.zeros((len(fast), len(mid)) + close.shape, dtype=bool)
+        crossed[..., 1:] = (f[:, None, :, :-1] <= m[None, :, :, :-1]) & (f[:, None, :, 1:] > m[None, :, :, 1:])
+        trend = m[:, None] > s[None, :]
+    signal = crossed[:, :, None] & trend[None]  # (fast, mid, slow, tickers, bars)
+
+    shape = (len(fast), len(mid), len(slow), len(bands))
+    out = {key: np.zeros(shape) for key in ("Signals", "WithReturn", "Winners", "SumRet", "Tickers")}
+    for b, band in enumerate(bands):
+        valid, ret = band_entries(close, pad, band, lookback, horizon)
+        events = signal & valid
+        has_ret = ~np.isnan(ret)
+        out["Signals"][..., b] = events.sum(axis=(-2, -1))
+        out["WithReturn"][..., b] = (events & has_ret).sum(axis=(-2, -1))
+        out["Winners"][..., b] = (events & (np.nan_to_num(ret) > 0)).sum(axis=(-2, -1))
+        out["SumRet"][..., b] = np.tensordot(events, np.nan_to_num(ret), axes=([-2, -1], [0, 1]))
+        out["Tickers"][..., b] = events.any(axis=-1).sum(axis=-1)
+    return out
+
+
+def run_sweep(fast=(20,), mid=(50,), slow=(200,), bands=((5, 10),), tickers=None,
+              chunk_size=SWEEP_CHUNK, lookback=LOOKBACK, horizon=SWEEP_HORIZON, min_signals=1):
+    """
+    Sweeps every fast < mid < slow span combination and entry band over the cached universe.
+    Returns a results table ranked by mean forward return (hit rate breaks ties);
+    combinations with fewer than `min_signals` signals are ranked last.
+    """
+    tickers = list(tickers) if tickers is not None else HISTORY_STORE.tickers()
+    fast, mid, slow, bands = list(fast), list(mid), list(slow), [tuple(b) for b in bands]
+    totals = None
+    for start in range(0, len(tickers), chunk_size):
+        universe = HISTORY_STORE.read_universe(tickers[start:start + chunk_size])
+        if not universe:
+            continue
+        close, pad = close_panel(universe)
+        part = sweep_chunk(close, pad, fast, mid, slow, bands, lookback, horizon)
+        totals = part if totals is None else {key: totals[key] + part[key] for key in totals}
+        print(f"🔁 [sweep.py] {min(start + chunk_size, len(tickers))}/{len(tickers)} tickers")
+    if totals is None:
+        return pd.DataFrame()
+
+    rows = []
+    for (i, fs), (j, ms), (k, ss), (b, band) in itertools.product(
+            enumerate(fast), enumerate(mid), enumerate(slow), enumerate(bands)):
+        if not fs < ms < ss:
+            continue
+        n = totals["WithReturn"][i, j, k, b]
+        rows.append({
+            "Fast": fs, "Mid": ms, "Slow": ss, "BandLow": band[0], "BandHigh": band[1],
+            "Signals": int(totals["Signals"][i, j, k, b]),
+            "Tickers": int(totals["Tickers"][i, j, k, b]),
+            f"HitRate{horizon}d": round(totals["Winners"][i, j, k, b] / n, 4) if n else np.nan,
+            f"MeanRet{horizon}d": round(totals["SumRet"][i, j, k, b] / n, 4) if n else np.nan,
+        })
+    results = pd.DataFrame(rows)
+    if results.empty:
+        return results
+    results["_enough"] = results["Signals"] >= min_signals
+    results = results.sort_values(["_enough", f"MeanRet{horizon}d", f"HitRate{horizon}d"],
+                                  ascending=False, na_position="last")
+    return results.drop(columns="_enough").reset_index(drop=True)
+
+
+def _spans(text):
+    return [int(x) for x in text.split(",")]
+
+
+def _bands(text):
+    return [tuple(float(x) for x in band.split("-")) for band in text.split(",")]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep EMA spans and entry bands for the crossover rule")
+    parser.add_argument("--fast", type=_spans, default=[20])
+    parser.add_argument("--mid", type=_spans, default=[50])
+    parser.add_argument("--slow", type=_spans, default=[200])
+    parser.add_argument("--bands", type=_bands, default=[(5, 10)], help="e.g. 3-8,5-10")
+    parser.add_argument("--chunk-size", type=int, default=SWEEP_CHUNK)
+    parser.add_argument("--horizon", type=int, default=SWEEP_HORIZON)
+    parser.add_argument("--min-signals", type=int, default=30)
+    parser.add_argument("--output", default="sweep_results.csv")
+    args = parser.parse_args()
+
+    results = run_sweep(args.fast, args.mid, args.slow, args.bands, chunk_size=args.chunk_size,
+                        horizon=args.horizon, min_signals=args.min_signals)
+    results.to_csv(args.output, index=False)
+    print(results.head(20).to_string(index=False))
+    print(f"✅ [sweep.py] {len(results)} combinations written to {args.output}")
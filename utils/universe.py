@@ -0,0 +1,173 @@
+import hashlib
+import io
+import json
+import os
+import urllib.error
+import urllib.request
+import zlib
+from datetime import date
+from pathlib import Path
+import pandas as pd
+from config import (
+    UNIVERSE_SOURCE, UNIVERSE_COLUMN, UNIVERSE_CACHE_FOLDER, UNIVERSE_CHANGES_FILE, PRUNE_REMOVED_TICKERS,
+    UNIVERSE_MIN_KEEP, PRUNE_MAX_FRACTION,
+)
+from utils.historical_data import invalidate, save_index
+
+FETCH_TIMEOUT = 30  # seconds
+
+
+def _cache_paths(url, folder=UNIVERSE_CACHE_FOLDER):
+    name = hashlib.sha1(url.encode()).hexdigest()[:12]
+    return Path(folder) / f"{name}.csv", Path(folder) / f"{name}.json"
+
+
+def fetch_cached(url, folder=UNIVERSE_CACHE_FOLDER, today=None, column=UNIVERSE_COLUMN):
+    """
+    Returns (path to a local copy of `url`, previous copy's bytes if it just changed, else None).
+    The copy is revalidated at most once a day with If-None-Match / If-Modified-Since;
+    when the server is unreachable, or sends a body that fails check_body, the cached copy is used as is.
+    """
+    data_file, meta_file = _cache_paths(url, folder)
+    meta = json.loads(meta_file.read_text()) if meta_file.exists() else {}
+    today = (today or date.today()).isoformat()
+    if data_file.exists() and meta.get("checked") == today:
+        return data_file, None
+
+    request = urllib.request.Request(url)
+    if data_file.exists():
+        if meta.get("etag"):
+            request.add_header("If-None-Match", meta["etag"])
+        if meta.get("last_modified"):
+            request.add_header("If-Modified-Since", meta["last_modified"])
+    try:
+        with urllib.request.urlopen(request, timeout=FETCH_TIMEOUT) as response:
+            body = response.read()
+            headers = response.headers
+    except urllib.error.HTTPError as e:
+        if e.code != 304:
+            return _fallback(url, data_file, e)
+        print(f"🌐 [universe.py] {url} unchanged (304)")
+        body, headers = None, e.headers
+    except (urllib.error.URLError, OSError) as e:
+        return _fallback(url, data_file, e)
+
+    previous = None
+    data_file.parent.mkdir(parents=True, exist_ok=True)
+    if body is not None:
+        previous = data_file.read_bytes() if data_file.exists() else None
+        if previous == body:
+            previous = None
+        problem = check_body(body, column, previous)
+        if problem:
+            return _fallback(url, data_file, problem)
+        tmp_file = data_file.with_suffix(".tmp")
+        tmp_file.write_bytes(body)
+        os.replace(tmp_file, data_file)
+    meta.update({
+        "url": url,
+        "checked": today,
+        "etag": headers.get("ETag") or meta.get("etag"),
+        "last_modified": headers.get("Last-Modified") or meta.get("last_modified"),
+    })
+    meta_file.write_text(json.dumps(meta, indent=1))
+    return data_file, previous
+
+
+def _fallback(url, data_file, error):
+    if not data_file.exists():
+        raise RuntimeError(f"Cannot fetch {url} and no cached copy exists: {error}")
+    print(f"⚠️ [universe.py] Using cached copy of {url} (fetch failed: {error})")
+    return data_file, None
+
+
+def _symbols(frame, column):
+    symbols = frame[column].dropna().astype(str).str.strip().tolist()
+    return list(dict.fromkeys(s for s in symbols if s))
+
+
+def check_body(body, column, previous=None, min_keep=UNIVERSE_MIN_KEEP):
+    """
+    Why a fetched version must not replace the cached one (None if it is fine): it does not
+    parse, lacks `column`, or lists far fewer symbols than `previous` (a truncated or error page).
+    """
+    try:
+        frame = pd.read_csv(io.BytesIO(body))
+    except Exception as e:
+        return f"unparseable body ({e})"
+    if column not in frame.columns:
+        return f"no {column!r} column"
+    count = len(_symbols(frame, column))
+    floor = len(_symbols(pd.read_csv(io.BytesIO(previous)), column)) * min_keep if previous else 1
+    if count < floor:
+        return f"only {count} symbols (expected at least {int(floor)})"
+    return None
+
+
+def record_changes(source, old, new, changes_file=UNIVERSE_CHANGES_FILE):
+    """
+    Appends the constituent adds/removals between two versions to the change log.
+    """
+    added = [s for s in new if s not in set(old)]
+    removed = [s for s in old if s not in set(new)]
+    if added or removed:
+        with open(changes_file, "a") as f:
+            f.write(json.dumps({"date": date.today().isoformat(), "source": source,
+                                "added": added, "removed": removed}) + "\n")
+        print(f"📝 [universe.py] Universe changed: +{len(added)} -{len(removed)} ({changes_file})")
+    return added, removed
+
+
+def load_universe(source=UNIVERSE_SOURCE, column=UNIVERSE_COLUMN, prune=PRUNE_REMOVED_TICKERS):
+    """
+    Returns the symbol list from `source`: a list of symbols, a CSV path or URL with a
+    `column` column, or a comma-separated string of symbols. Duplicates are dropped.
+    URL sources go through the local cache; when a new version drops constituents, the
+    change is logged and (with `prune`) the removed tickers' caches are deleted, unless
+    more than PRUNE_MAX_FRACTION of the universe vanished at once.
+    """
+    if isinstance(source, str):
+        if source.startswith(("http://", "https://")):
+            path, previous = fetch_cached(source, column=column)
+            symbols = _symbols(pd.read_csv(path), column)
+            if previous is not None:
+                old = _symbols(pd.read_csv(io.BytesIO(previous)), column)
+                _, removed = record_changes(source, old, symbols)
+                if prune and len(removed) > PRUNE_MAX_FRACTION * len(old):
+                    print(f"⚠️ [universe.py] Not pruning: {len(removed)} of {len(old)} tickers removed at once "
+                          f"(limit {PRUNE_MAX_FRACTION:.0%}); see {UNIVERSE_CHANGES_FILE}")
+                elif prune:
+                    for ticker in removed:
+                        invalidate(ticker)
+                    if removed:
+                        save_index()
+                        print(f"🧹 [universe.py] Pruned caches for {len(removed)} removed tickers")
+            return symbols
+        if os.path.exists(source):
+            return _symbols(pd.read_csv(source), column)
+        symbols = [s.strip() for s in source.split(",")]
+    else:
+        symbols = [str(s).strip() for s in source]
+    return list(dict.fromkeys(s for s in symbols if s))
+
+
+def parse_shard(text):
+    """
+    "i/N" (1-based) -> (i, N).
+    """
+    index, count = (int(x) for x in text.split("/"))
+    if not 1 <= index <= count:
+        raise ValueError(f"Shard must be i/N with 1 <= i <= N, got {text!r}")
+    return index, count
+
+
+def shard_of(ticker, count):
+    """
+    1-based shard that owns `ticker`. Hash-based, so a symbol keeps its shard (and that
+    shard's caches) as the universe changes.
+    """
+    return zlib.crc32(ticker.encode()) % count + 1
+
+
+def select_shard(tickers, index, count):
+    return [t for t in tickers if shard_of(t, count) == index]